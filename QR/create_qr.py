@@ -1,6 +1,14 @@
+import asyncio
+import os
 import qrcode
 
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('QR_WORKERS', 2)), thread_name_prefix='qr')
 
 
 def make_qr(data: str) -> bytes:
@@ -17,3 +25,8 @@ def make_qr(data: str) -> bytes:
     buffer = BytesIO()
     img.save(buffer, format="PNG")
     return buffer.getvalue()
+
+
+async def make_qr_async(data: str) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, make_qr, data)
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+from dotenv import load_dotenv
+from uuid6 import UUID
+
+from QR.create_qr import make_qr_async
+from utils.cache import TTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+QR_CACHE_DIR = os.getenv('QR_CACHE_DIR')
+
+_memory = TTLCache(
+    maxsize=int(os.getenv('QR_CACHE_SIZE', 512)),
+    ttl=float(os.getenv('QR_CACHE_TTL', 86400)),
+)
+_pending: dict[str, asyncio.Future] = {}
+
+
+def book_qr_payload(book_id: UUID) -> str:
+    return f"https://t.me/{os.getenv('BOT_NAME')}?start=book_{book_id}"
+
+
+def location_qr_payload(location_id: UUID) -> str:
+    return f"https://t.me/{os.getenv('BOT_NAME')}?start=location_{location_id}"
+
+
+def payload_hash(payload: str) -> str:
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def get_qr(payload: str) -> bytes:
+    key = payload_hash(payload)
+
+    png = _memory.get(key)
+    if png is not None:
+        return png
+
+    if key in _pending:
+        return await asyncio.shield(_pending[key])
+
+    future = asyncio.get_running_loop().create_future()
+    _pending[key] = future
+    try:
+        png = await _read_from_disk(key)
+        if png is None:
+            png = await make_qr_async(payload)
+            await _write_to_disk(key, png)
+
+        _memory.set(key, png)
+        future.set_result(png)
+        return png
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()
+        raise
+    finally:
+        if not future.done():
+            future.cancel()
+        del _pending[key]
+
+
+def clear_memory_cache() -> None:
+    _memory.clear()
+
+
+async def _read_from_disk(key: str) -> bytes | None:
+    if not QR_CACHE_DIR:
+        return None
+
+    path = os.path.join(QR_CACHE_DIR, f"{key}.png")
+    try:
+        return await asyncio.to_thread(_read_file, path)
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Failed to read cached QR code {path}: {e}")
+        return None
+
+
+async def _write_to_disk(key: str, png: bytes) -> None:
+    if not QR_CACHE_DIR:
+        return
+
+    path = os.path.join(QR_CACHE_DIR, f"{key}.png")
+    try:
+        await asyncio.to_thread(_write_file, path, png)
+    except OSError as e:
+        logger.warning(f"Failed to write cached QR code {path}: {e}")
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def _write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
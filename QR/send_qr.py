@@ -0,0 +1,41 @@
+import logging
+
+from typing import Awaitable, Callable
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, Message
+from uuid6 import UUID
+
+from QR.qr_cache import payload_hash
+from db.database import async_session_factory
+from db.queries.tg_file_crud import TgFileObj
+
+logger = logging.getLogger(__name__)
+
+
+async def answer_qr_photo(
+        message: Message,
+        session: async_session_factory,
+        entity_id: UUID,
+        payload: str,
+        qr_file: Callable[[], Awaitable[BufferedInputFile | None]],
+) -> bool:
+    key = payload_hash(payload)
+
+    file_id = await TgFileObj().read(session=session, entity_id=entity_id, payload_hash=key)
+    if file_id:
+        try:
+            await message.answer_photo(photo=file_id)
+            return True
+        except TelegramBadRequest as e:
+            logger.warning(f"Stored QR file_id rejected for entity {entity_id}, uploading again: {e}")
+            await TgFileObj().remove(session=session, entity_id=entity_id, payload_hash=key)
+
+    photo = await qr_file()
+    if not photo:
+        return False
+
+    sent = await message.answer_photo(photo=photo)
+    if sent.photo:
+        await TgFileObj().create(session=session, entity_id=entity_id, payload_hash=key, file_id=sent.photo[-1].file_id)
+    return True
@@ -0,0 +1,94 @@
+"""Bytes transferred and wall time of BookObj.read per projection profile on 10k books.
+
+Runs against the test database (TEST_POSTGRES_* variables) and truncates every table.
+
+Run from the project root: python -m benchmarks.book_read_profiles [books]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from uuid6 import uuid7
+
+from db.models import Base, Book, Location, City, AppUsers, TelegramUsers, Employees, Roles
+from db.queries.book_crud import BookObj, BOOK_PROFILES
+
+TEST_DATABASE_URL = (
+    f"postgresql+asyncpg://{os.getenv('TEST_POSTGRES_USER')}:{os.getenv('TEST_POSTGRES_PASSWORD')}"
+    f"@{os.getenv('TEST_POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('TEST_POSTGRES_DB')}"
+)
+
+RUNS = 5
+DESCRIPTION = "A practical guide to building and operating reliable software systems. " * 15
+
+
+async def truncate(engine):
+    async with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(text(f'TRUNCATE TABLE "{table.name}" RESTART IDENTITY CASCADE'))
+
+
+async def seed(engine, count: int):
+    async with AsyncSession(engine) as session:
+        tg_user = TelegramUsers(telegram_id="1", username="bench")
+        employee = Employees(full_name="Bench User", email="bench@example.com")
+        role = Roles(name="user")
+        location = Location(city=City.Almaty, room="Room 1")
+        session.add_all([tg_user, employee, role, location])
+        await session.flush()
+
+        app_user = AppUsers(tg_user_id=tg_user.id, employee_id=employee.id, role_id=role.id)
+        session.add(app_user)
+        await session.flush()
+
+        await session.execute(insert(Book), [
+            {
+                'id': uuid7(), 'title': f"Book {i}", 'author': f"Author {i % 500}", 'description': DESCRIPTION,
+                'owner_id': app_user.id, 'location_id': location.id,
+            }
+            for i in range(count)
+        ])
+        await session.commit()
+
+
+async def payload_bytes(engine, profile: str) -> int:
+    query = select(Book).options(*BOOK_PROFILES[profile]).order_by(Book.id)
+    sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})
+    async with engine.connect() as conn:
+        result = await conn.execute(text(f"SELECT sum(pg_column_size(page)) FROM ({sql}) AS page"))
+        return result.scalar_one()
+
+
+async def read_time(engine, profile: str) -> float:
+    timings = []
+    for _ in range(RUNS):
+        async with AsyncSession(engine) as session:
+            started = time.perf_counter()
+            await BookObj().read(session=session, profile=profile)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+async def main(count: int):
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        await truncate(engine)
+        await seed(engine, count)
+        await read_time(engine, 'full')
+
+        for profile in BOOK_PROFILES:
+            size = await payload_bytes(engine, profile)
+            elapsed = await read_time(engine, profile)
+            print(f"{profile:<7} books={count:<6} rows={size / 1024:9.1f} KiB  read={elapsed * 1000:8.1f} ms")
+    finally:
+        await truncate(engine)
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
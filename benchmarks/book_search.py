@@ -0,0 +1,132 @@
+"""Latency of BookObj.search on 100k synthetic books, against a 50 ms budget per query.
+
+Titles mix topic words with filler words; descriptions are drawn from a 20k-word vocabulary, so a topic
+word matches a few thousand books, as in a real catalog. Search cost grows with the number of matching
+rows, since every match is ranked.
+
+Runs against the test database (TEST_POSTGRES_* variables) and truncates every table.
+Typo queries only return results when the pg_trgm extension is installed.
+
+Run from the project root: python -m benchmarks.book_search [books]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from uuid6 import uuid7
+
+from db.models import Base, Book, Location, City, AppUsers, TelegramUsers, Employees, Roles
+from db.queries.book_crud import BookObj
+
+TEST_DATABASE_URL = (
+    f"postgresql+asyncpg://{os.getenv('TEST_POSTGRES_USER')}:{os.getenv('TEST_POSTGRES_PASSWORD')}"
+    f"@{os.getenv('TEST_POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('TEST_POSTGRES_DB')}"
+)
+
+RUNS = 20
+BUDGET_MS = 50
+BATCH = 10000
+WORDS = (
+    "python java rust kotlin data systems design patterns clean code distributed algorithms networks "
+    "security cloud machine learning deep neural compilers databases testing agile architecture linux "
+    "concurrency functional programming web mobile graphics statistics analytics operating refactoring"
+).split()
+SYLLABLES = "ka lo mi ne ru sa to vi ze bo da fu gi he ju".split()
+NAMES = "anna boris carlos diana erik fatima george hana ivan julia kenji lena marco nina oscar".split()
+QUERIES = {
+    'word': "python",
+    'prefix': "progr",
+    'two words': "clean architecture",
+    'author': "julia oscarson",
+    'rare': "compilers graphics",
+    'typo': "pyhton",
+}
+
+
+async def truncate(engine):
+    async with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(text(f'TRUNCATE TABLE "{table.name}" RESTART IDENTITY CASCADE'))
+
+
+async def seed(engine, count: int):
+    rng = random.Random(42)
+    vocabulary = [''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(20000)]
+    async with AsyncSession(engine) as session:
+        tg_user = TelegramUsers(telegram_id="1", username="bench")
+        employee = Employees(full_name="Bench User", email="bench@example.com")
+        role = Roles(name="user")
+        location = Location(city=City.Almaty, room="Room 1")
+        session.add_all([tg_user, employee, role, location])
+        await session.flush()
+
+        app_user = AppUsers(tg_user_id=tg_user.id, employee_id=employee.id, role_id=role.id)
+        session.add(app_user)
+        await session.flush()
+
+        for start in range(0, count, BATCH):
+            await session.execute(insert(Book), [
+                {
+                    'id': uuid7(),
+                    'title': ' '.join(rng.sample(WORDS, 2) + [rng.choice(vocabulary)]).title(),
+                    'author': f"{rng.choice(NAMES).title()} {rng.choice(NAMES).title()}son",
+                    'description': ' '.join(rng.choices(vocabulary, k=30) + [rng.choice(WORDS)]),
+                    'owner_id': app_user.id, 'location_id': location.id,
+                }
+                for _ in range(start, min(start + BATCH, count))
+            ])
+        await session.commit()
+
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE books"))
+
+
+async def matches(engine, terms: str) -> int:
+    async with engine.connect() as conn:
+        query = ' & '.join(f'{word}:*' for word in terms.split())
+        result = await conn.execute(
+            text("SELECT count(*) FROM books WHERE search_vector @@ to_tsquery('simple', :query)"), {'query': query}
+        )
+        return result.scalar_one()
+
+
+async def search_time(engine, terms: str, pages: int = 1) -> tuple[float, float]:
+    timings = []
+    for _ in range(RUNS):
+        async with AsyncSession(engine) as session:
+            cursor = None
+            for _ in range(pages):
+                started = time.perf_counter()
+                books, _, has_next = await BookObj.search(session=session, terms=terms, cursor=cursor)
+                timings.append(time.perf_counter() - started)
+                if not has_next:
+                    break
+                cursor = books[-1].id
+    return statistics.median(timings), statistics.quantiles(timings, n=20)[-1]
+
+
+async def main(count: int):
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        await truncate(engine)
+        await seed(engine, count)
+        await search_time(engine, "warmup")
+
+        for name, terms in QUERIES.items():
+            for pages in (1, 5):
+                median, p95 = await search_time(engine, terms, pages)
+                status = 'ok' if p95 * 1000 < BUDGET_MS else 'SLOW'
+                print(f"{name:<10} pages={pages} books={count:<6} matches={await matches(engine, terms):<6} "
+                      f"median={median * 1000:6.1f} ms  p95={p95 * 1000:6.1f} ms  {status}")
+    finally:
+        await truncate(engine)
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
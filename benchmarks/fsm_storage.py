@@ -0,0 +1,86 @@
+"""Latency of FSM state get/set for the in-memory, write-through and buffered PostgreSQL storages.
+
+Runs against the test database (TEST_POSTGRES_* variables) and truncates every table.
+
+Run from the project root: python -m benchmarks.fsm_storage [users]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from uuid6 import uuid7
+
+from db.models import Base
+from states.main_states import Books
+from states.storage import BufferedStorage, PostgresStateBackend
+
+TEST_DATABASE_URL = (
+    f"postgresql+asyncpg://{os.getenv('TEST_POSTGRES_USER')}:{os.getenv('TEST_POSTGRES_PASSWORD')}"
+    f"@{os.getenv('TEST_POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('TEST_POSTGRES_DB')}"
+)
+
+
+async def truncate(engine):
+    async with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(text(f'TRUNCATE TABLE "{table.name}" RESTART IDENTITY CASCADE'))
+
+
+async def timed(timings: list, call):
+    started = time.perf_counter()
+    await call
+    timings.append(time.perf_counter() - started)
+
+
+async def add_book_flow(storage, key: StorageKey, timings: dict):
+    # Same sequence of storage calls as the add-book dialog in handlers/book_handlers.py
+    await timed(timings['set'], storage.set_state(key, Books.author))
+    for field, value in (('title', "Python"), ('author', "Someone"), ('description', "Description"),
+                         ('owner_id', uuid7()), ('owner', "User A")):
+        await timed(timings['get'], storage.get_state(key))
+        await timed(timings['set'], storage.update_data(key, {field: value}))
+    await timed(timings['get'], storage.get_data(key))
+    await timed(timings['set'], storage.set_state(key, None))
+    await timed(timings['set'], storage.set_data(key, {}))
+
+
+async def measure(storage, users: int) -> dict:
+    timings = {'get': [], 'set': []}
+    keys = [StorageKey(bot_id=1, chat_id=user_id, user_id=user_id) for user_id in range(users)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(add_book_flow(storage, key, timings) for key in keys))
+    await storage.close()
+    elapsed = time.perf_counter() - started
+
+    return {name: (statistics.median(values) * 1000, statistics.quantiles(values, n=20)[-1] * 1000)
+            for name, values in timings.items()} | {'wall_ms': elapsed * 1000}
+
+
+async def main(users: int):
+    engine = create_async_engine(TEST_DATABASE_URL)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    storages = (
+        ("memory", lambda: MemoryStorage()),
+        ("postgres write-through", lambda: BufferedStorage(PostgresStateBackend(session_factory), flush_delay=0)),
+        ("postgres buffered", lambda: BufferedStorage(PostgresStateBackend(session_factory), flush_delay=0.05)),
+    )
+    try:
+        for name, factory in storages:
+            await truncate(engine)
+            stats = await measure(factory(), users)
+            print(f"{name:<23} users={users:<5} get p50={stats['get'][0]:7.3f} ms p95={stats['get'][1]:7.3f} ms  "
+                  f"set p50={stats['set'][0]:7.3f} ms p95={stats['set'][1]:7.3f} ms  wall={stats['wall_ms']:8.1f} ms")
+    finally:
+        await truncate(engine)
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
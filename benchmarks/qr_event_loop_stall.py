@@ -0,0 +1,60 @@
+"""Event-loop stall caused by QR rendering under concurrent book creation.
+
+Run from the project root: python -m benchmarks.qr_event_loop_stall [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from uuid6 import uuid7
+
+from QR.create_qr import make_qr, make_qr_async
+
+TICK = 0.001
+
+
+async def render_inline(data: str) -> bytes:
+    return make_qr(data)
+
+
+async def measure(render, concurrency: int) -> dict:
+    loop = asyncio.get_running_loop()
+    lags = []
+    running = True
+
+    async def ticker():
+        while running:
+            started = loop.time()
+            await asyncio.sleep(TICK)
+            lags.append(max(loop.time() - started - TICK, 0))
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+
+    payloads = [f"https://t.me/bench_bot?start=book_{uuid7()}" for _ in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(render(payload) for payload in payloads))
+    elapsed = time.perf_counter() - started
+
+    running = False
+    await ticker_task
+
+    return {
+        'wall_ms': elapsed * 1000,
+        'max_stall_ms': max(lags) * 1000,
+        'p95_stall_ms': statistics.quantiles(lags, n=20)[-1] * 1000 if len(lags) > 1 else lags[0] * 1000,
+    }
+
+
+async def main(concurrency: int):
+    await make_qr_async("warm-up")
+
+    for name, render in (("inline make_qr", render_inline), ("make_qr_async", make_qr_async)):
+        stats = await measure(render, concurrency)
+        print(f"{name:<16} concurrency={concurrency:<4} wall={stats['wall_ms']:8.1f} ms  "
+              f"max stall={stats['max_stall_ms']:8.1f} ms  p95 stall={stats['p95_stall_ms']:6.1f} ms")
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
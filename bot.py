@@ -4,14 +4,65 @@ import logging
 
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from db.database import async_engine, async_session_factory, log_pool_stats, pool_status
 from handlers import registration_handler, wishlist_handlers, order_handlers, location_handlers
 from handlers.book_handlers import book_router
+from jobs.scheduler import create_scheduler
+from middlewares.db_session import DbSessionMiddleware
+from middlewares.identity import IdentityMiddleware
+from middlewares.rate_limit import RateLimitMiddleware, log_rate_limit_stats
+from middlewares.update_queue import UpdateQueueMiddleware, log_queue_stats
+from states.storage import BufferedStorage, PostgresStateBackend
+from utils.book_index import book_index, refresh_book_index
 
 load_dotenv()
 TOKEN = os.getenv("BOT_TOKEN")
 
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+WEBHOOK_DROP_PENDING_UPDATES = os.getenv('WEBHOOK_DROP_PENDING_UPDATES', 'false').lower() == 'true'
+
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'postgres')
+
+
+def create_storage() -> BaseStorage:
+    if FSM_STORAGE == 'memory':
+        return MemoryStorage()
+    return BufferedStorage(
+        PostgresStateBackend(async_session_factory),
+        flush_delay=float(os.getenv('FSM_FLUSH_DELAY', 0.05)),
+        ttl=float(os.getenv('FSM_STATE_TTL', 86400)),
+    )
+
+
 bot = Bot(token=TOKEN)
-dp = Dispatcher()
+rate_limiter = RateLimitMiddleware(
+    global_rate=float(os.getenv('TG_GLOBAL_RATE', 30)),
+    chat_rate=float(os.getenv('TG_CHAT_RATE', 1)),
+    chat_burst=float(os.getenv('TG_CHAT_BURST', 3)),
+    max_retries=int(os.getenv('TG_MAX_RETRIES', 3)),
+)
+bot.session.middleware(rate_limiter)
+
+# The FSM middleware is registered after the update queue, so state is read inside the user's lock and the semaphore
+dp = Dispatcher(storage=create_storage(), disable_fsm=True)
+update_queue = UpdateQueueMiddleware(
+    max_concurrency=int(os.getenv('MAX_CONCURRENT_UPDATES', 15)),
+    max_user_queue=int(os.getenv('MAX_USER_QUEUED_UPDATES', 10)),
+)
+dp.update.outer_middleware(update_queue)
+dp.update.outer_middleware(DbSessionMiddleware(async_session_factory))
+dp.update.outer_middleware(IdentityMiddleware())
+dp.update.outer_middleware(dp.fsm)
 
 dp.include_router(location_handlers.router)
 dp.include_router(registration_handler.router)
@@ -19,6 +70,78 @@ dp.include_router(wishlist_handlers.router)
 dp.include_router(book_router)
 dp.include_router(order_handlers.router)
 
+background_tasks = set()
+scheduler = create_scheduler(bot, async_session_factory)
+
+
+@dp.startup()
+async def on_startup():
+    pool_stats_interval = float(os.getenv('DB_POOL_STATS_INTERVAL', 60))
+    if pool_stats_interval > 0:
+        background_tasks.add(asyncio.create_task(log_pool_stats(async_engine, pool_stats_interval)))
+        background_tasks.add(asyncio.create_task(log_queue_stats(update_queue, pool_stats_interval)))
+        background_tasks.add(asyncio.create_task(log_rate_limit_stats(rate_limiter, pool_stats_interval)))
+
+    fsm_cleanup_interval = float(os.getenv('FSM_CLEANUP_INTERVAL', 3600))
+    if isinstance(dp.storage, BufferedStorage) and fsm_cleanup_interval > 0:
+        background_tasks.add(asyncio.create_task(dp.storage.run_cleanup(fsm_cleanup_interval)))
+
+    await book_index.load(async_session_factory)
+    book_index_refresh_interval = float(os.getenv('BOOK_INDEX_REFRESH_INTERVAL', 300))
+    if book_index_refresh_interval > 0:
+        background_tasks.add(asyncio.create_task(
+            refresh_book_index(book_index, async_session_factory, book_index_refresh_interval)
+        ))
+
+    scheduler.start()
+
+
+@dp.shutdown()
+async def on_shutdown():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    await dp.storage.close()
+    await async_engine.dispose()
+
+
+async def set_webhook(bot: Bot):
+    await bot.set_webhook(
+        url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        drop_pending_updates=WEBHOOK_DROP_PENDING_UPDATES,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({
+        'status': 'ok',
+        'db_pool': pool_status(async_engine),
+        'updates': update_queue.status(),
+        'outbound': rate_limiter.status(),
+    })
+
+
+def create_webhook_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get('/health', health)
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def run_webhook():
+    if not WEBHOOK_URL or not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_URL and WEBHOOK_SECRET must be set when BOT_MODE=webhook")
+
+    dp.startup.register(set_webhook)
+    print('Bot is running (webhook)...')
+    web.run_app(create_webhook_app(), host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+
 
 async def main():
     print('Bot is running...')
@@ -27,11 +150,14 @@ async def main():
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(main())
-    except KeyboardInterrupt:
-        print('Exit')
-    finally:
-        loop.close()
+    if BOT_MODE == 'webhook':
+        run_webhook()
+    else:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(main())
+        except KeyboardInterrupt:
+            print('Exit')
+        finally:
+            loop.close()
@@ -0,0 +1,29 @@
+import asyncio
+import sys
+
+from db.database import async_session_factory
+from db.queries.book_crud import BookObj
+
+
+async def check_availability(session_factory, fix: bool):
+    async with session_factory() as session:
+        mismatched = await BookObj.check_availability(session=session, fix=fix)
+
+    if mismatched is None:
+        print('Availability check failed, see logs')
+        return 1
+
+    for book_id in mismatched:
+        print(f"Book {book_id}: is_available does not match its orders")
+
+    if not mismatched:
+        print('Book availability is consistent with orders')
+    elif fix:
+        print(f"Rebuilt availability for {len(mismatched)} book(s)")
+    else:
+        print(f"{len(mismatched)} book(s) out of sync, run with --fix to rebuild")
+    return 0 if fix or not mismatched else 1
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(check_availability(async_session_factory, fix='--fix' in sys.argv[1:])))
@@ -1,25 +1,113 @@
+import asyncio
+import logging
 import os
+import time
+from contextvars import ContextVar
 
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.record_wait(time.perf_counter() - started)
+
+
+def pool_status(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    status = {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'idle': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+    }
+
+    stats = getattr(pool, 'stats', None)
+    if stats:
+        status.update(
+            checkouts=stats.checkouts,
+            avg_wait_ms=stats.total_wait / stats.checkouts * 1000 if stats.checkouts else 0.0,
+            max_wait_ms=stats.max_wait * 1000,
+        )
+    return status
+
+
+async def log_pool_stats(engine: AsyncEngine, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        status = pool_status(engine)
+        logger.info(
+            f"DB pool: size={status['size']} checked_out={status['checked_out']} idle={status['idle']} "
+            f"overflow={status['overflow']} checkouts={status.get('checkouts', 0)} "
+            f"avg_wait={status.get('avg_wait_ms', 0):.1f}ms max_wait={status.get('max_wait_ms', 0):.1f}ms"
+        )
+        stats = getattr(engine.pool, 'stats', None)
+        if stats:
+            stats.reset()
+
+
 DATABASE_URL = (
     f"postgresql+asyncpg://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
     f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
-    f"?async_fallback=True"
 )
 
-async_engine = create_async_engine(url=DATABASE_URL)
+ENGINE_OPTIONS = {
+    'poolclass': TimedQueuePool,
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    'connect_args': {
+        'statement_cache_size': int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100)),
+        'command_timeout': float(os.getenv('DB_COMMAND_TIMEOUT', 60)),
+    },
+}
+
+async_engine = create_async_engine(url=DATABASE_URL, **ENGINE_OPTIONS)
+
+async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
 
-async_session_factory = async_sessionmaker(async_engine)
+# Session of the update being handled, set by DbSessionMiddleware so code outside handlers reuses its connection
+current_session: ContextVar[AsyncSession | None] = ContextVar('current_session', default=None)
 
 TEST_DATABASE_URL = (
     f"postgresql+asyncpg://{os.getenv('TEST_POSTGRES_USER')}:{os.getenv('TEST_POSTGRES_PASSWORD')}"
     f"@{os.getenv('TEST_POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('TEST_POSTGRES_DB')}"
-    f"?async_fallback=True"
 )
 
-test_async_engine = create_async_engine(url=TEST_DATABASE_URL)
+test_async_engine = create_async_engine(url=TEST_DATABASE_URL, **ENGINE_OPTIONS)
 test_async_session_factory = async_sessionmaker(test_async_engine, expire_on_commit=False)
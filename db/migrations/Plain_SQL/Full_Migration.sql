@@ -295,4 +295,123 @@ DROP TABLE users;
 
 UPDATE alembic_version SET version_num='d90379c34d5b' WHERE alembic_version.version_num = '5cf5a4f8f0b2';
 
+-- Running upgrade d90379c34d5b -> 3e1f7a9c2b64
+
+ALTER TABLE books DROP COLUMN qr_code;
+
+ALTER TABLE locations DROP COLUMN qr_code;
+
+UPDATE alembic_version SET version_num='3e1f7a9c2b64' WHERE alembic_version.version_num = 'd90379c34d5b';
+
+-- Running upgrade 3e1f7a9c2b64 -> 8b4d2e6f1a93
+
+CREATE TABLE tg_files (
+    id UUID NOT NULL, 
+    entity_id UUID NOT NULL, 
+    payload_hash VARCHAR(64) NOT NULL, 
+    file_id VARCHAR NOT NULL, 
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL, 
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL, 
+    PRIMARY KEY (id), 
+    CONSTRAINT uq_tg_files_entity_payload UNIQUE (entity_id, payload_hash)
+);
+
+UPDATE alembic_version SET version_num='8b4d2e6f1a93' WHERE alembic_version.version_num = '3e1f7a9c2b64';
+
+-- Running upgrade 8b4d2e6f1a93 -> c7a3e5f90d12
+
+CREATE INDEX ix_app_users_tg_user_id ON app_users (tg_user_id);
+
+CREATE INDEX ix_books_location_id ON books (location_id);
+
+CREATE INDEX ix_books_owner_id ON books (owner_id);
+
+CREATE INDEX ix_books_categories_book_id ON books_categories (book_id);
+
+CREATE INDEX ix_orders_active_book_id ON orders (book_id) WHERE status IN ('RESERVED', 'IN_PROCESS');
+
+CREATE INDEX ix_orders_app_user_id ON orders (app_user_id);
+
+CREATE INDEX ix_wishlists_app_user_id ON wishlists (app_user_id);
+
+UPDATE alembic_version SET version_num='c7a3e5f90d12' WHERE alembic_version.version_num = '8b4d2e6f1a93';
+
+-- Running upgrade c7a3e5f90d12 -> e2b9d4c6a817
+
+ALTER TABLE books ADD COLUMN is_available BOOLEAN DEFAULT true NOT NULL;
+
+CREATE INDEX ix_books_available_id ON books (id) WHERE is_available;
+
+UPDATE books SET is_available = false WHERE EXISTS (SELECT 1 FROM orders WHERE orders.book_id = books.id AND orders.status IN ('RESERVED', 'IN_PROCESS'));
+
+UPDATE alembic_version SET version_num='e2b9d4c6a817' WHERE alembic_version.version_num = 'c7a3e5f90d12';
+
+-- Running upgrade e2b9d4c6a817 -> f41a8c2d7e05
+
+UPDATE orders SET status = 'CANCELLED' WHERE id IN (SELECT id FROM (SELECT id, row_number() OVER (PARTITION BY book_id ORDER BY CASE WHEN status = 'IN_PROCESS' THEN 0 ELSE 1 END, id DESC) AS position FROM orders WHERE status IN ('RESERVED', 'IN_PROCESS')) AS active WHERE position > 1);
+
+DROP INDEX ix_orders_active_book_id;
+
+CREATE UNIQUE INDEX ix_orders_active_book_id ON orders (book_id) WHERE status IN ('RESERVED', 'IN_PROCESS');
+
+UPDATE alembic_version SET version_num='f41a8c2d7e05' WHERE alembic_version.version_num = 'e2b9d4c6a817';
+
+-- Running upgrade f41a8c2d7e05 -> a93c1e7d5b28
+
+CREATE TABLE fsm_states (
+    key VARCHAR NOT NULL, 
+    state VARCHAR, 
+    data BYTEA, 
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL, 
+    PRIMARY KEY (key)
+);
+
+CREATE INDEX ix_fsm_states_updated_at ON fsm_states (updated_at);
+
+UPDATE alembic_version SET version_num='a93c1e7d5b28' WHERE alembic_version.version_num = 'f41a8c2d7e05';
+
+-- Running upgrade a93c1e7d5b28 -> 5d8e2a4c9b17
+
+CREATE TABLE order_reminders (
+    order_id UUID NOT NULL, 
+    status VARCHAR(10) NOT NULL, 
+    sent_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL, 
+    PRIMARY KEY (order_id), 
+    FOREIGN KEY(order_id) REFERENCES orders (id) ON DELETE CASCADE
+);
+
+CREATE INDEX ix_orders_status_created_at ON orders (status, created_at);
+
+UPDATE alembic_version SET version_num='5d8e2a4c9b17' WHERE alembic_version.version_num = 'a93c1e7d5b28';
+
+-- Running upgrade 5d8e2a4c9b17 -> 7c1f5b3e9a42
+
+CREATE INDEX ix_employees_full_name_prefix ON employees (lower(full_name) text_pattern_ops);
+
+CREATE INDEX ix_employees_email_prefix ON employees (lower(email) text_pattern_ops);
+
+UPDATE alembic_version SET version_num='7c1f5b3e9a42' WHERE alembic_version.version_num = '5d8e2a4c9b17';
+
+-- Running upgrade 7c1f5b3e9a42 -> b6e3d9f1c284
+
+ALTER TABLE books ADD COLUMN search_vector TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('simple', coalesce(title, '')), 'A') || setweight(to_tsvector('simple', coalesce(author, '')), 'B') || setweight(to_tsvector('simple', coalesce(description, '')), 'C')) STORED;
+
+CREATE INDEX ix_books_search_vector ON books USING gin (search_vector);
+
+DO $$ BEGIN IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN CREATE EXTENSION IF NOT EXISTS pg_trgm; CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops); CREATE INDEX IF NOT EXISTS ix_books_author_trgm ON books USING gin (author gin_trgm_ops); END IF; END $$;
+
+UPDATE alembic_version SET version_num='b6e3d9f1c284' WHERE alembic_version.version_num = '7c1f5b3e9a42';
+
+-- Running upgrade b6e3d9f1c284 -> e4a7c2b8d619
+
+CREATE INDEX ix_books_categories_category_book_id ON books_categories (category, book_id);
+
+UPDATE alembic_version SET version_num='e4a7c2b8d619' WHERE alembic_version.version_num = 'b6e3d9f1c284';
+
+-- Running upgrade e4a7c2b8d619 -> 9f2c6a1e4b37
+
+CREATE INDEX ix_orders_status_id ON orders (status, id);
+
+UPDATE alembic_version SET version_num='9f2c6a1e4b37' WHERE alembic_version.version_num = 'e4a7c2b8d619';
+
 COMMIT;
@@ -1,10 +1,11 @@
+import asyncio
 import os
 import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from logging.config import fileConfig
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 from db.database import DATABASE_URL, TEST_DATABASE_URL
 from db.models import *
@@ -49,22 +50,27 @@ def run_migrations_offline() -> None:
 
 
 def run_migrations_online() -> None:
-    def do_online_migration(url):
-        connectable = engine_from_config(
+    def do_online_migration(connection):
+        context.configure(
+            connection=connection, target_metadata=target_metadata
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+    async def run_async_migrations(url):
+        connectable = async_engine_from_config(
             config.get_section(config.config_ini_section, {}),
             poolclass=pool.NullPool,
             url=url
         )
 
-        with connectable.connect() as connection:
-            context.configure(
-                connection=connection, target_metadata=target_metadata
-            )
+        async with connectable.connect() as connection:
+            await connection.run_sync(do_online_migration)
 
-            with context.begin_transaction():
-                context.run_migrations()
+        await connectable.dispose()
 
-    do_online_migration(db_url)
+    asyncio.run(run_async_migrations(db_url))
 
 
 if context.is_offline_mode():
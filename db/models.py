@@ -2,9 +2,10 @@ import enum
 import uuid6
 
 from typing import Optional
-from sqlalchemy import ForeignKey, String, Enum, Boolean, DateTime, func, LargeBinary, text
+from sqlalchemy import ForeignKey, String, Enum, Boolean, DateTime, func, text, UniqueConstraint, Index, \
+    LargeBinary, Computed
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 
 
 class Base(DeclarativeBase):
@@ -31,7 +32,8 @@ class AppUsers(Base):
     tg_user_id: Mapped[uuid6.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("tg_users.id"),
-        nullable=False
+        nullable=False,
+        index=True
     )
     employee_id: Mapped[uuid6.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -72,6 +74,16 @@ class Employees(Base):
     app_user: Mapped["AppUsers"] = relationship(back_populates="employee")
 
 
+Index(
+    'ix_employees_full_name_prefix', func.lower(Employees.full_name).label('lower_full_name'),
+    postgresql_ops={'lower_full_name': 'text_pattern_ops'}
+)
+Index(
+    'ix_employees_email_prefix', func.lower(Employees.email).label('lower_email'),
+    postgresql_ops={'lower_email': 'text_pattern_ops'}
+)
+
+
 class Roles(Base):
     __tablename__ = 'roles'
 
@@ -135,6 +147,10 @@ class Category(str, enum.Enum):
 
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        Index('ix_books_available_id', 'id', postgresql_where=text('is_available')),
+        Index('ix_books_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id: Mapped[uuid6.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid6.uuid7)
     title: Mapped[str] = mapped_column(String, nullable=False)
@@ -143,15 +159,27 @@ class Book(Base):
     owner_id: Mapped[uuid6.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("app_users.id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True
     )
     location_id: Mapped[uuid6.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("locations.id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True
     )
     created: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
-    qr_code: Mapped[LargeBinary] = mapped_column(LargeBinary, nullable=True)
+    is_available: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True, server_default=text('true'))
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'C')",
+            persisted=True
+        ),
+        deferred=True
+    )
 
     owner: Mapped["AppUsers"] = relationship(back_populates="books")
     location: Mapped["Location"] = relationship(back_populates="books")
@@ -161,12 +189,16 @@ class Book(Base):
 
 class BookCategory(Base):
     __tablename__ = "books_categories"
+    __table_args__ = (
+        Index('ix_books_categories_category_book_id', 'category', 'book_id'),
+    )
 
     id: Mapped[uuid6.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid6.uuid7)
     book_id: Mapped[uuid6.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("books.id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True
     )
     category: Mapped[Category] = mapped_column(
         Enum(Category, native_enum=False),
@@ -183,7 +215,8 @@ class WishList(Base):
     app_user_id: Mapped[uuid6.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("app_users.id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True
     )
     book_title: Mapped[str] = mapped_column(String, nullable=False)
     author: Mapped[str] = mapped_column(String, nullable=False)
@@ -200,14 +233,26 @@ class OrderStatus(str, enum.Enum):
     CANCELLED = "Cancelled"
 
 
+ACTIVE_ORDER_STATUSES = (OrderStatus.RESERVED, OrderStatus.IN_PROCESS)
+
+
 class Order(Base):
     __tablename__ = 'orders'
+    __table_args__ = (
+        Index(
+            'ix_orders_active_book_id', 'book_id', unique=True,
+            postgresql_where=text("status IN ('RESERVED', 'IN_PROCESS')")
+        ),
+        Index('ix_orders_status_created_at', 'status', 'created_at'),
+        Index('ix_orders_status_id', 'status', 'id'),
+    )
 
     id: Mapped[uuid6.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid6.uuid7)
     app_user_id: Mapped[uuid6.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("app_users.id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True
     )
     book_id: Mapped[uuid6.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -242,6 +287,18 @@ class Order(Base):
     )
 
 
+class OrderReminder(Base):
+    __tablename__ = 'order_reminders'
+
+    order_id: Mapped[uuid6.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("orders.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus, native_enum=False), nullable=False)
+    sent_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+
+
 class City(str, enum.Enum):
     Almaty = 'Almaty'
     Berlin = 'Berlin'
@@ -272,7 +329,6 @@ class Location(Base):
         nullable=False
     )
     room: Mapped[str] = mapped_column(String, nullable=False)
-    qr_code: Mapped[LargeBinary] = mapped_column(LargeBinary, nullable=True)
 
     books: Mapped[list["Book"]] = relationship(back_populates="location")
     orders_taken: Mapped[list["Order"]] = relationship(
@@ -281,3 +337,28 @@ class Location(Base):
     orders_returned: Mapped[list["Order"]] = relationship(
         foreign_keys=[Order.returned_to_id], back_populates="returned_to"
     )
+
+
+class TelegramFiles(Base):
+    __tablename__ = 'tg_files'
+    __table_args__ = (
+        UniqueConstraint('entity_id', 'payload_hash', name='uq_tg_files_entity_payload'),
+    )
+
+    id: Mapped[uuid6.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid6.uuid7)
+    entity_id: Mapped[uuid6.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    payload_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    file_id: Mapped[str] = mapped_column(String, nullable=False)
+
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class FsmStates(Base):
+    __tablename__ = 'fsm_states'
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    data: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), index=True)
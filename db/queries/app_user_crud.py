@@ -1,19 +1,54 @@
 import logging
+import os
 
-from sqlalchemy import select
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from sqlalchemy import select, tuple_, func, or_
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import selectinload
 from uuid6 import UUID
 
 from db.database import async_session_factory
-from db.models import AppUsers
-from db.queries.role_crud import RoleObj
-from db.queries.tg_user_crud import TgUserObj
+from db.models import AppUsers, TelegramUsers, Employees, Roles
 from interface import CRUD
+from utils.cache import TTLCache
+
+load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True, slots=True)
+class AppUserIdentity:
+    app_user_id: UUID | None
+    role: str | None = None
+    full_name: str | None = None
+    is_active: bool = False
+
+    @property
+    def is_registered(self) -> bool:
+        return self.app_user_id is not None
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role is not None and self.role.lower() == 'admin'
+
+
+ANONYMOUS = AppUserIdentity(app_user_id=None)
+
+
+@dataclass(frozen=True, slots=True)
+class OwnerOption:
+    app_user_id: UUID
+    full_name: str
+    email: str | None = None
+
+
+identity_cache = TTLCache(
+    maxsize=int(os.getenv('IDENTITY_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('IDENTITY_CACHE_TTL', 300)),
+)
+
+
 class AppUserObj(CRUD):
     async def create(self, session: async_session_factory, telegram_id: str, tg_user_id: UUID, employee_id: UUID,
                      role_id: UUID) -> bool:
@@ -27,6 +62,7 @@ class AppUserObj(CRUD):
             new_user = AppUsers(tg_user_id=tg_user_id, employee_id=employee_id, role_id=role_id)
             session.add(new_user)
             await session.commit()
+            identity_cache.pop(telegram_id)
             return True
         except SQLAlchemyError as e:
             await session.rollback()
@@ -63,23 +99,53 @@ class AppUserObj(CRUD):
             return None
 
     @staticmethod
-    async def is_registered(session: async_session_factory, telegram_id: str) -> bool:
+    async def update_role(session: async_session_factory, app_user_id: UUID, role_id: UUID) -> bool:
         try:
-            if not telegram_id:
+            if not app_user_id or not role_id:
                 return False
 
-            tg_user = await TgUserObj().get_obj_by_telegram_id(session=session, telegram_id=telegram_id)
-            if not tg_user:
+            app_user = await session.get(AppUsers, app_user_id)
+            if not app_user:
                 return False
 
-            query = select(AppUsers).where(AppUsers.tg_user_id == tg_user.id)
+            app_user.role_id = role_id
+            await session.commit()
+            identity_cache.pop_where(lambda _, identity: identity.app_user_id == app_user_id)
+            return True
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.error(f"Error while updating role of AppUser (id={app_user_id}, role_id={role_id}): {e}")
+            return False
+
+    @staticmethod
+    async def resolve_by_telegram_id(session: async_session_factory, telegram_id: str) -> AppUserIdentity | None:
+        try:
+            if not telegram_id:
+                return None
+
+            query = (
+                select(AppUsers.id, Roles.name, Employees.full_name, AppUsers.is_active)
+                .select_from(AppUsers)
+                .join(TelegramUsers, AppUsers.tg_user_id == TelegramUsers.id)
+                .join(Employees, AppUsers.employee_id == Employees.id)
+                .join(Roles, AppUsers.role_id == Roles.id)
+                .where(TelegramUsers.telegram_id == telegram_id)
+            )
             result = await session.execute(query)
-            app_user = result.scalar_one_or_none()
+            row = result.one_or_none()
 
-            return app_user is not None
+            if not row:
+                return None
+            return AppUserIdentity(app_user_id=row.id, role=row.name, full_name=row.full_name,
+                                   is_active=row.is_active)
         except SQLAlchemyError as e:
-            logger.error(f"Error while checking if user is registered (telegram_id={telegram_id}): {e}")
-            return False
+            logger.error(f"Error while resolving AppUser by telegram_id={telegram_id}: {e}")
+            return None
+
+    @staticmethod
+    async def is_registered(session: async_session_factory, telegram_id: str) -> bool:
+        identity = await AppUserObj.resolve_by_telegram_id(session=session, telegram_id=telegram_id)
+        return identity is not None
 
     @staticmethod
     async def is_admin(session: async_session_factory, app_user_id: UUID) -> bool:
@@ -87,39 +153,23 @@ class AppUserObj(CRUD):
             if not app_user_id:
                 return False
 
-            app_user = await AppUserObj().get_obj(session=session, app_user_id=app_user_id)
-            if not app_user:
-                return False
-
-            role = await RoleObj().get_obj(session=session, role_id=app_user.role_id)
-            if not role:
-                return False
+            query = (
+                select(Roles.name)
+                .join(AppUsers, AppUsers.role_id == Roles.id)
+                .where(AppUsers.id == app_user_id)
+            )
+            result = await session.execute(query)
+            role_name = result.scalar_one_or_none()
 
-            return role.name.lower() == 'admin'
+            return role_name is not None and role_name.lower() == 'admin'
         except SQLAlchemyError as e:
             logger.error(f"Error while checking admin status (app_user_id={app_user_id}): {e}")
             return False
 
     @staticmethod
     async def get_app_user_id(session: async_session_factory, telegram_id: str) -> UUID | None:
-        try:
-            if not telegram_id:
-                return None
-
-            tg_user = await TgUserObj().get_obj_by_telegram_id(session=session, telegram_id=telegram_id)
-            if not tg_user:
-                return None
-
-            query = select(AppUsers).where(AppUsers.tg_user_id == tg_user.id)
-            result = await session.execute(query)
-            app_user = result.scalar_one_or_none()
-
-            if not app_user:
-                return None
-            return app_user.id
-        except SQLAlchemyError as e:
-            logger.error(f"Error while getting AppUser id by telegram_id={telegram_id}: {e}")
-            return None
+        identity = await AppUserObj.resolve_by_telegram_id(session=session, telegram_id=telegram_id)
+        return identity.app_user_id if identity else None
 
     @staticmethod
     async def get_employee_fullname(session: async_session_factory, app_user_id: UUID) -> str | None:
@@ -128,21 +178,79 @@ class AppUserObj(CRUD):
                 return None
 
             query = (
-                select(AppUsers)
-                .options(selectinload(AppUsers.employee))
+                select(Employees.full_name)
+                .join(AppUsers, AppUsers.employee_id == Employees.id)
                 .where(AppUsers.id == app_user_id)
             )
             result = await session.execute(query)
-            app_user = result.scalar_one_or_none()
+            return result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logger.error(f"Error while getting employee fullname for AppUser id={app_user_id}: {e}")
+            return None
 
-            if not app_user:
-                return None
+    @staticmethod
+    async def read_owner_page(session: async_session_factory, cursor: UUID | None = None, limit: int = 10,
+                              backward: bool = False) -> tuple[list[OwnerOption], bool, bool]:
+        """(app_user_id, full_name) pairs ordered by name, keyed on (full_name, app_user_id) of the cursor user."""
+        try:
+            if limit < 1:
+                return [], False, False
 
-            if not app_user.employee:
-                return None
+            key = tuple_(Employees.full_name, AppUsers.id)
+            query = select(AppUsers.id, Employees.full_name).join(Employees, Employees.id == AppUsers.employee_id)
+            if cursor:
+                cursor_name = (
+                    select(Employees.full_name)
+                    .join(AppUsers, AppUsers.employee_id == Employees.id)
+                    .where(AppUsers.id == cursor)
+                    .scalar_subquery()
+                )
+                cursor_key = tuple_(cursor_name, cursor)
+                query = query.where(key < cursor_key if backward else key > cursor_key)
 
-            return app_user.employee.full_name
+            if backward:
+                query = query.order_by(Employees.full_name.desc(), AppUsers.id.desc())
+            else:
+                query = query.order_by(Employees.full_name, AppUsers.id)
 
+            result = await session.execute(query.limit(limit + 1))
+            owners = [OwnerOption(app_user_id=app_user_id, full_name=full_name) for app_user_id, full_name in result]
+
+            has_more = len(owners) > limit
+            owners = owners[:limit]
+            if backward:
+                owners.reverse()
+                return owners, has_more, True
+
+            return owners, cursor is not None, has_more
         except SQLAlchemyError as e:
-            logger.error(f"Error while getting employee fullname for AppUser id={app_user_id}: {e}")
-            return None
+            logger.error(f"Error while retrieving owners page (cursor={cursor}, backward={backward}): {e}")
+            return [], False, False
+
+    @staticmethod
+    async def search_owners(session: async_session_factory, prefix: str, limit: int = 10) -> list[OwnerOption]:
+        """Owners whose full name or email starts with prefix (case-insensitive), served by the prefix indexes."""
+        try:
+            prefix = prefix.strip().lower()
+            if not prefix or limit < 1:
+                return []
+
+            pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            query = (
+                select(AppUsers.id, Employees.full_name, Employees.email)
+                .join(Employees, Employees.id == AppUsers.employee_id)
+                .where(or_(
+                    func.lower(Employees.full_name).like(pattern, escape='\\'),
+                    func.lower(Employees.email).like(pattern, escape='\\'),
+                ))
+                .order_by(Employees.full_name, AppUsers.id)
+                .limit(limit)
+            )
+            result = await session.execute(query)
+            return [
+                OwnerOption(app_user_id=app_user_id, full_name=full_name, email=email)
+                for app_user_id, full_name, email in result
+            ]
+        except SQLAlchemyError as e:
+            logger.error(f"Error while searching owners by '{prefix}': {e}")
+            return []
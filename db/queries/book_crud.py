@@ -1,21 +1,49 @@
 import logging
 import os
+import re
 
+from dataclasses import dataclass
+from dotenv import load_dotenv
 from aiogram.types import BufferedInputFile
-from sqlalchemy import select, delete, exists
+from sqlalchemy import select, delete, exists, bindparam, update, func, or_, and_, case, literal, text
 from sqlalchemy.exc import SQLAlchemyError
-from uuid6 import UUID
+from sqlalchemy.orm import load_only, joinedload
+from uuid6 import UUID, uuid7
 
-from QR.create_qr import make_qr
+from QR.qr_cache import get_qr, book_qr_payload
 from db.database import async_session_factory
-from db.models import Book, BookCategory, Category, Order, OrderStatus
+from db.models import Book, BookCategory, Category, Order, TelegramFiles, ACTIVE_ORDER_STATUSES
 from interface import CRUD
-from dotenv import load_dotenv
+from utils.book_index import book_index, IndexedBook
+from utils.cache import TTLCache
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+BOOK_PROFILES = {
+    'list': (load_only(Book.id, Book.title, Book.author),),
+    'detail': (load_only(
+        Book.id, Book.title, Book.author, Book.description, Book.owner_id, Book.location_id, Book.is_available
+    ),),
+    'full': (),
+}
+
+SEARCH_MAX_WORDS = 8
+SEARCH_FUZZY_THRESHOLD = 0.4
+
+_trgm_available: bool | None = None
+
+category_counts_cache = TTLCache(maxsize=1, ttl=float(os.getenv('CATEGORY_COUNTS_CACHE_TTL', 300)))
+
+
+@dataclass(frozen=True, slots=True)
+class BookSearchRow:
+    id: UUID
+    title: str
+    author: str
+    is_available: bool
+
 
 class BookObj(CRUD):
     async def create(self, session: async_session_factory, title: str, author: str, description: str, owner_id: UUID,
@@ -24,29 +52,24 @@ class BookObj(CRUD):
             if not title or not author or not description or not owner_id or not categories or not location_id:
                 return False
 
-            book = Book(
-                title=title, description=description, author=author,
-                owner_id=owner_id, location_id=location_id,
-            )
-
             for category in categories:
                 if category not in Category.__members__.values():
                     logger.error(f"Invalid category: {category}")
                     return False
 
+            book = Book(
+                id=uuid7(), title=title, description=description, author=author,
+                owner_id=owner_id, location_id=location_id,
+            )
+
             for category in categories:
                 book.book_categories.append(BookCategory(category=category))
 
             session.add(book)
-            await session.flush()
-
-            bot = os.getenv('BOT_NAME')
-
-            qr_data = f"https://t.me/{bot}?start=book_{book.id}"
-            qr_code_bytes = make_qr(qr_data)
-            book.qr_code = qr_code_bytes
-
+            indexed = IndexedBook(id=book.id, title=title, author=author)
             await session.commit()
+            book_index.add(indexed)
+            category_counts_cache.clear()
             return True
         except SQLAlchemyError as e:
             await session.rollback()
@@ -54,22 +77,18 @@ class BookObj(CRUD):
                          f"owner_id={owner_id}, location_id='{location_id}'): {e}")
             return False
 
-    async def read(self, session: async_session_factory, available_books: bool = True) -> list[Book]:
+    async def read(self, session: async_session_factory, available_books: bool = True,
+                   profile: str = 'full') -> list[Book]:
         try:
-            if not available_books:
+            if not available_books or profile not in BOOK_PROFILES:
                 return []
 
             if available_books:
                 result = await session.execute(
-                    select(Book).filter(
-                        ~exists().where(
-                            (Order.book_id == Book.id) &
-                            (Order.status.in_([OrderStatus.RESERVED, OrderStatus.IN_PROCESS]))
-                        )
-                    ).order_by(Book.id)
+                    select(Book).options(*BOOK_PROFILES[profile]).filter(Book.is_available).order_by(Book.id)
                 )
             else:
-                result = await session.execute(select(Book).order_by(Book.id))
+                result = await session.execute(select(Book).options(*BOOK_PROFILES[profile]).order_by(Book.id))
 
             books = result.scalars().all()
             return books
@@ -77,6 +96,35 @@ class BookObj(CRUD):
             logger.error(f"Error while retrieving books: {e}")
             return []
 
+    @staticmethod
+    async def read_page(session: async_session_factory, cursor: UUID | None = None, limit: int = 5,
+                        backward: bool = False, available_books: bool = True,
+                        profile: str = 'list') -> tuple[list[Book], bool, bool]:
+        try:
+            if limit < 1 or profile not in BOOK_PROFILES:
+                return [], False, False
+
+            query = select(Book).options(*BOOK_PROFILES[profile])
+            if available_books:
+                query = query.filter(Book.is_available)
+            if cursor:
+                query = query.where(Book.id < cursor if backward else Book.id > cursor)
+
+            query = query.order_by(Book.id.desc() if backward else Book.id).limit(limit + 1)
+            result = await session.execute(query)
+            books = list(result.scalars().all())
+
+            has_more = len(books) > limit
+            books = books[:limit]
+            if backward:
+                books.reverse()
+                return books, has_more, True
+
+            return books, cursor is not None, has_more
+        except SQLAlchemyError as e:
+            logger.error(f"Error while retrieving books page (cursor={cursor}, backward={backward}): {e}")
+            return [], False, False
+
     async def update(self, session: async_session_factory, book_id: UUID, updates: dict) -> bool:
         try:
             if not book_id or not updates:
@@ -124,7 +172,12 @@ class BookObj(CRUD):
                 for category in new_categories:
                     session.add(BookCategory(book_id=book_id, category=category))
 
+            indexed = IndexedBook(id=book_id, title=book.title, author=book.author)
             await session.commit()
+            if "title" in updates or "author" in updates:
+                book_index.add(indexed)
+            if "categories" in updates:
+                category_counts_cache.clear()
             return True
         except SQLAlchemyError as e:
             await session.rollback()
@@ -148,16 +201,24 @@ class BookObj(CRUD):
                 delete(BookCategory)
                 .where(BookCategory.book_id == book_id)
             )
+            await session.execute(
+                delete(TelegramFiles)
+                .where(TelegramFiles.entity_id == book_id)
+            )
             await session.commit()
+            book_index.remove(book_id)
+            category_counts_cache.clear()
             return True
         except SQLAlchemyError as e:
             await session.rollback()
             logger.error(f"Error while removing Book with id={book_id}: {e}")
             return False
 
-    async def get_obj(self, session: async_session_factory, book_id: UUID) -> Book | None:
+    async def get_obj(self, session: async_session_factory, book_id: UUID,
+                      with_categories: bool = False) -> Book | None:
         try:
-            book = await session.get(Book, book_id)
+            options = [joinedload(Book.book_categories)] if with_categories else []
+            book = await session.get(Book, book_id, options=options, populate_existing=with_categories)
             return book
         except SQLAlchemyError as e:
             logger.error(f"Error while retrieving Book with id={book_id}: {e}")
@@ -175,19 +236,89 @@ class BookObj(CRUD):
             logger.error(f"Error while retrieving categories for Book with id={book_id}: {e}")
             return []
 
+    @staticmethod
+    async def get_categories_many(session: async_session_factory, book_ids: list[UUID]) -> dict[UUID, list[str]]:
+        """Category names of several books in one query."""
+        try:
+            if not book_ids:
+                return {}
+
+            result = await session.execute(
+                select(BookCategory.book_id, BookCategory.category)
+                .where(BookCategory.book_id.in_(book_ids))
+                .order_by(BookCategory.book_id, BookCategory.category)
+            )
+            categories = {book_id: [] for book_id in book_ids}
+            for book_id, category in result:
+                categories[book_id].append(category.value)
+            return categories
+        except SQLAlchemyError as e:
+            logger.error(f"Error while retrieving categories for {len(book_ids)} books: {e}")
+            return {}
+
     @staticmethod
     async def get_categories():
         return [cat for cat in Category]
 
+    @staticmethod
+    async def category_counts(session: async_session_factory) -> dict[Category, int]:
+        counts = category_counts_cache.get(None)
+        if counts is not None:
+            return counts
+
+        try:
+            result = await session.execute(
+                select(BookCategory.category, func.count()).group_by(BookCategory.category)
+            )
+            counts = {category: count for category, count in result}
+        except SQLAlchemyError as e:
+            logger.error(f"Error while counting books per category: {e}")
+            return {}
+
+        category_counts_cache.set(None, counts)
+        return counts
+
+    @staticmethod
+    async def read_by_categories(session: async_session_factory, categories: list[Category],
+                                 cursor: UUID | None = None, limit: int = 5, backward: bool = False,
+                                 profile: str = 'list') -> tuple[list[Book], bool, bool]:
+        """Books in any of the categories, paged on Book.id like read_page."""
+        try:
+            if not categories or limit < 1 or profile not in BOOK_PROFILES:
+                return [], False, False
+
+            in_categories = exists().where(BookCategory.book_id == Book.id, BookCategory.category.in_(categories))
+            query = select(Book).options(*BOOK_PROFILES[profile]).where(in_categories)
+            if cursor:
+                query = query.where(Book.id < cursor if backward else Book.id > cursor)
+
+            query = query.order_by(Book.id.desc() if backward else Book.id).limit(limit + 1)
+            result = await session.execute(query)
+            books = list(result.scalars().all())
+
+            has_more = len(books) > limit
+            books = books[:limit]
+            if backward:
+                books.reverse()
+                return books, has_more, True
+
+            return books, cursor is not None, has_more
+        except SQLAlchemyError as e:
+            logger.error(f"Error while retrieving books for categories {categories} (cursor={cursor}): {e}")
+            return [], False, False
+
     @staticmethod
     async def get_book_qr_code(session: async_session_factory, book_id: UUID) -> BufferedInputFile | None:
         try:
-            book = await session.get(Book, book_id)
-            if not book or not book.qr_code:
+            if not book_id:
+                return None
+
+            result = await session.execute(select(Book.id).where(Book.id == book_id))
+            if not result.scalar_one_or_none():
                 return None
 
             input_file = BufferedInputFile(
-                file=book.qr_code,
+                file=await get_qr(book_qr_payload(book_id)),
                 filename="qr.png"
             )
             return input_file
@@ -195,6 +326,49 @@ class BookObj(CRUD):
             logger.error(f"Error while retrieving QR code for Book (id={book_id}): {e}")
             return None
 
+    @staticmethod
+    async def sync_availability(session: async_session_factory, book_id: UUID) -> None:
+        await session.execute(
+            update(Book)
+            .where(Book.id == book_id)
+            .values(is_available=_is_available())
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    async def sync_availability_many(session: async_session_factory, book_ids: list[UUID]) -> None:
+        if not book_ids:
+            return
+        await session.execute(
+            update(Book)
+            .where(Book.id.in_(book_ids))
+            .values(is_available=_is_available())
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    async def check_availability(session: async_session_factory, fix: bool = False) -> list[UUID] | None:
+        try:
+            result = await session.execute(
+                select(Book.id).where(Book.is_available != _is_available()).order_by(Book.id)
+            )
+            mismatched = result.scalars().all()
+
+            if fix and mismatched:
+                await session.execute(
+                    update(Book)
+                    .where(Book.id.in_(mismatched))
+                    .values(is_available=_is_available())
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+
+            return mismatched
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.error(f"Error while checking book availability (fix={fix}): {e}")
+            return None
+
     @staticmethod
     async def get_books_by_location(session: async_session_factory, location_id: UUID) -> list[Book]:
         try:
@@ -205,3 +379,94 @@ class BookObj(CRUD):
         except SQLAlchemyError as e:
             logger.error(f"Error when retrieving books by location (id={location_id}): {e}")
             return []
+
+    @staticmethod
+    async def search(session: async_session_factory, terms: str, cursor: UUID | None = None, limit: int = 10,
+                     backward: bool = False) -> tuple[list[BookSearchRow], bool, bool]:
+        """Books ranked by full-text match on title/author/description, keyed on (score, id) of the cursor book.
+
+        Every word is matched as a prefix. With pg_trgm installed, titles and authors similar to the query
+        (typos) are returned as well, ranked below full-text matches.
+        """
+        try:
+            words = re.findall(r'[^\W_]+', terms.lower())[:SEARCH_MAX_WORDS]
+            if not words or limit < 1:
+                return [], False, False
+
+            ts_query = func.to_tsquery('simple', ' & '.join(f'{word}:*' for word in words))
+            phrase = ' '.join(words) if await _has_trgm(session) else None
+            if phrase:
+                await session.execute(
+                    select(func.set_config('pg_trgm.word_similarity_threshold', str(SEARCH_FUZZY_THRESHOLD), True))
+                )
+
+            match, score = _search_rank(ts_query, phrase)
+            if cursor and await session.scalar(select(Book.id).where(Book.id == cursor, match)) is None:
+                # The cursor book was deleted or no longer matches, so its score is unknown: start over
+                cursor, backward = None, False
+
+            # Materialized so the score is computed once per matching book, not again in the keyset filter
+            ranked = select(Book.id, score.label('score')).where(match).cte('ranked').prefix_with('MATERIALIZED')
+            page = select(ranked.c.id, ranked.c.score)
+            if cursor:
+                cursor_score = select(ranked.c.score).where(ranked.c.id == cursor).scalar_subquery()
+                if backward:
+                    page = page.where(or_(ranked.c.score > cursor_score,
+                                          and_(ranked.c.score == cursor_score, ranked.c.id < cursor)))
+                else:
+                    page = page.where(or_(ranked.c.score < cursor_score,
+                                          and_(ranked.c.score == cursor_score, ranked.c.id > cursor)))
+
+            if backward:
+                page = page.order_by(ranked.c.score, ranked.c.id.desc())
+            else:
+                page = page.order_by(ranked.c.score.desc(), ranked.c.id)
+            page = page.limit(limit + 1).subquery()
+
+            query = (
+                select(Book.id, Book.title, Book.author, Book.is_available)
+                .join(page, page.c.id == Book.id)
+                .order_by(page.c.score if backward else page.c.score.desc(),
+                          Book.id.desc() if backward else Book.id)
+            )
+            result = await session.execute(query)
+            books = [BookSearchRow(*row) for row in result]
+
+            has_more = len(books) > limit
+            books = books[:limit]
+            if backward:
+                books.reverse()
+                return books, has_more, True
+
+            return books, cursor is not None, has_more
+        except SQLAlchemyError as e:
+            logger.error(f"Error while searching books by '{terms}' (cursor={cursor}, backward={backward}): {e}")
+            return [], False, False
+
+
+async def _has_trgm(session: async_session_factory) -> bool:
+    global _trgm_available
+    if _trgm_available is None:
+        _trgm_available = bool(await session.scalar(
+            text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        ))
+    return _trgm_available
+
+
+def _search_rank(ts_query, phrase: str | None):
+    """(filter, score) for a search; full-text matches score above 1, fuzzy-only matches below it."""
+    match = Book.search_vector.op('@@')(ts_query)
+    score = func.ts_rank(Book.search_vector, ts_query)
+    if phrase is None:
+        return match, score
+
+    fuzzy = or_(literal(phrase).op('<%')(Book.title), literal(phrase).op('<%')(Book.author))
+    similarity = func.greatest(func.word_similarity(phrase, Book.title), func.word_similarity(phrase, Book.author))
+    return or_(match, fuzzy), case((match, 1 + score), else_=0) + similarity
+
+
+def _is_available():
+    return ~exists().where(
+        (Order.book_id == Book.id) &
+        Order.status.in_(bindparam('active_statuses', ACTIVE_ORDER_STATUSES, expanding=True, literal_execute=True))
+    )
@@ -1,21 +1,24 @@
 import logging
-import os
 
 from aiogram.types import BufferedInputFile
-from sqlalchemy import select
+from sqlalchemy import select, delete
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
 from uuid6 import UUID
 
-from QR.create_qr import make_qr
+from QR.qr_cache import get_qr, location_qr_payload
 from db.database import async_session_factory
-from db.models import Location, City
+from db.models import Location, City, TelegramFiles
 from interface import CRUD
-from dotenv import load_dotenv
-
-load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+LOCATION_PROFILES = {
+    'list': (load_only(Location.id, Location.city, Location.room),),
+    'detail': (),
+    'full': (),
+}
+
 
 class LocationObj(CRUD):
     async def create(self, session: async_session_factory, city: str, room: str) -> bool:
@@ -31,14 +34,6 @@ class LocationObj(CRUD):
 
             new_location = Location(city=city_enum, room=room)
             session.add(new_location)
-            await session.flush()
-
-            bot = os.getenv('BOT_NAME')
-
-            qr_data = f"https://t.me/{bot}?start=location_{new_location.id}"
-            qr_code_bytes = make_qr(qr_data)
-            new_location.qr_code = qr_code_bytes
-
             await session.commit()
             return True
         except SQLAlchemyError as e:
@@ -46,9 +41,12 @@ class LocationObj(CRUD):
             logger.error(f"Error while creating location (city={city}, room={room}): {e}")
             return False
 
-    async def read(self, session: async_session_factory) -> list[Location]:
+    async def read(self, session: async_session_factory, profile: str = 'full') -> list[Location]:
         try:
-            result = await session.execute(select(Location).order_by(Location.id))
+            if profile not in LOCATION_PROFILES:
+                return []
+
+            result = await session.execute(select(Location).options(*LOCATION_PROFILES[profile]).order_by(Location.id))
             return result.scalars().all()
         except SQLAlchemyError as e:
             logger.error(f"Error while retrieving locations: {e}")
@@ -82,6 +80,7 @@ class LocationObj(CRUD):
                 return False
 
             await session.delete(location)
+            await session.execute(delete(TelegramFiles).where(TelegramFiles.entity_id == location_id))
             await session.commit()
             return True
         except SQLAlchemyError as e:
@@ -125,12 +124,12 @@ class LocationObj(CRUD):
             if not location_id:
                 return None
 
-            location = await session.get(Location, location_id)
-            if not location or not location.qr_code:
+            result = await session.execute(select(Location.id).where(Location.id == location_id))
+            if not result.scalar_one_or_none():
                 return None
 
             input_file = BufferedInputFile(
-                file=location.qr_code,
+                file=await get_qr(location_qr_payload(location_id)),
                 filename="qr.png"
             )
             return input_file
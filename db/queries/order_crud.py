@@ -1,24 +1,109 @@
 import logging
+import os
 
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from dotenv import load_dotenv
 from typing import Optional
-from sqlalchemy import select, case
+from sqlalchemy import select, case, update, func
+from sqlalchemy.dialects.postgresql import array_agg
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, load_only, aliased
 from uuid6 import UUID
 
 from db.database import async_session_factory
-from db.models import Order, OrderStatus, Book
+from db.models import Order, OrderStatus, Book, AppUsers, TelegramUsers, Location, City
 from db.queries.app_user_crud import AppUserObj
+from db.queries.book_crud import BookObj
 from interface import CRUD
+from utils.cache import TTLCache
+
+load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+ORDER_PROFILES = {
+    'list': (
+        load_only(Order.id, Order.status, Order.book_id, Order.taken_from_id, Order.returned_to_id),
+        joinedload(Order.book).load_only(Book.id, Book.title),
+        joinedload(Order.taken_from),
+        joinedload(Order.returned_to),
+    ),
+    'detail': (
+        joinedload(Order.book).load_only(Book.id, Book.title, Book.author, Book.description),
+        joinedload(Order.taken_from),
+        joinedload(Order.returned_to),
+    ),
+    'full': (
+        joinedload(Order.book),
+        joinedload(Order.taken_from),
+        joinedload(Order.returned_to),
+    ),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ExpiredReservations:
+    telegram_id: str | None
+    titles: list[str]
+
+
+@dataclass(frozen=True, slots=True)
+class OrderFilter:
+    status: OrderStatus | None = None
+    city: City | None = None
+    username: str | None = None
+    date_from: date | None = None
+    date_to: date | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class AdminOrderRow:
+    id: UUID
+    title: str
+    status: OrderStatus
+    created_at: datetime
+    city: City | None
+    room: str | None
+    username: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class OrderRow:
+    id: UUID
+    title: str
+    status: OrderStatus
+    taken_from_city: City | None
+    taken_from_room: str | None
+    returned_to_city: City | None
+    returned_to_room: str | None
+
+
+order_view_cache = TTLCache(
+    maxsize=int(os.getenv('ORDER_VIEW_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('ORDER_VIEW_CACHE_TTL', 60)),
+)
+
+
+def invalidate_order_views(app_user_id: UUID | None = None) -> None:
+    if app_user_id is None:
+        order_view_cache.clear()
+    else:
+        order_view_cache.pop(app_user_id)
+
 
 class OrderObj(CRUD):
     async def create(self, session: async_session_factory, app_user_id: UUID, book_id: UUID,
                      taken_from_id: UUID, returned_to_id: Optional[UUID] = None,
                      status: OrderStatus = OrderStatus.RESERVED) -> bool:
         try:
+            is_available = await session.scalar(
+                select(Book.is_available).where(Book.id == book_id).with_for_update()
+            )
+            if not is_available:
+                await session.rollback()
+                return False
+
             new_order = Order(
                 app_user_id=app_user_id,
                 book_id=book_id,
@@ -27,30 +112,23 @@ class OrderObj(CRUD):
                 returned_to_id=returned_to_id
             )
             session.add(new_order)
+            await session.flush()
+            await BookObj.sync_availability(session=session, book_id=book_id)
             await session.commit()
+            invalidate_order_views(app_user_id)
             return True
         except SQLAlchemyError as e:
             await session.rollback()
             logger.error(f"Error when creating order: {e}")
             return False
 
-    async def read(self, session: async_session_factory, app_user_id: UUID) -> list[Order]:
+    async def read(self, session: async_session_factory, app_user_id: UUID, profile: str = 'full') -> list[Order]:
         try:
-            status_order = case(
-                (Order.status == OrderStatus.RESERVED, 0),
-                (Order.status == OrderStatus.IN_PROCESS, 1),
-                (Order.status == OrderStatus.RETURNED, 2),
-                (Order.status == OrderStatus.CANCELLED, 2),
-            )
-
-            options = (
-                joinedload(Order.book),
-                joinedload(Order.taken_from),
-                joinedload(Order.returned_to),
-            )
+            if profile not in ORDER_PROFILES:
+                return []
 
             is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
-            query = select(Order).options(*options).order_by(status_order)
+            query = select(Order).options(*ORDER_PROFILES[profile]).order_by(_status_order())
             if not is_admin:
                 query = query.where(Order.app_user_id == app_user_id)
 
@@ -60,6 +138,74 @@ class OrderObj(CRUD):
             logger.error(f"Error when retrieving orders: {e}")
             return []
 
+    @staticmethod
+    async def read_rows(session: async_session_factory, app_user_id: UUID) -> list[OrderRow] | None:
+        """Columns needed by the order list views, in one query without loading ORM objects."""
+        try:
+            taken_from = aliased(Location)
+            returned_to = aliased(Location)
+            query = (
+                select(Order.id, Book.title, Order.status, taken_from.city, taken_from.room,
+                       returned_to.city, returned_to.room)
+                .join(Book, Book.id == Order.book_id)
+                .outerjoin(taken_from, taken_from.id == Order.taken_from_id)
+                .outerjoin(returned_to, returned_to.id == Order.returned_to_id)
+                .where(Order.app_user_id == app_user_id)
+                .order_by(_status_order(), Order.id)
+            )
+
+            result = await session.execute(query)
+            return [OrderRow(*row) for row in result.all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Error when retrieving order rows (app_user_id={app_user_id}): {e}")
+            return None
+
+    @staticmethod
+    async def read_admin_page(session: async_session_factory, filters: OrderFilter = OrderFilter(),
+                              cursor: UUID | None = None, limit: int = 10,
+                              backward: bool = False) -> tuple[list[AdminOrderRow], bool, bool]:
+        """Newest-first page of all orders matching filters, keyed on Order.id."""
+        try:
+            if limit < 1:
+                return [], False, False
+
+            taken_from = aliased(Location)
+            query = (
+                select(Order.id, Book.title, Order.status, Order.created_at, taken_from.city, taken_from.room,
+                       TelegramUsers.username)
+                .join(Book, Book.id == Order.book_id)
+                .outerjoin(taken_from, taken_from.id == Order.taken_from_id)
+                .join(AppUsers, AppUsers.id == Order.app_user_id)
+                .join(TelegramUsers, TelegramUsers.id == AppUsers.tg_user_id)
+            )
+            if filters.status:
+                query = query.where(Order.status == filters.status)
+            if filters.city:
+                query = query.where(taken_from.city == filters.city)
+            if filters.username:
+                query = query.where(TelegramUsers.username == filters.username)
+            if filters.date_from:
+                query = query.where(Order.created_at >= filters.date_from)
+            if filters.date_to:
+                query = query.where(Order.created_at < filters.date_to + timedelta(days=1))
+            if cursor:
+                query = query.where(Order.id > cursor if backward else Order.id < cursor)
+
+            query = query.order_by(Order.id if backward else Order.id.desc()).limit(limit + 1)
+            result = await session.execute(query)
+            rows = [AdminOrderRow(*row) for row in result.all()]
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            if backward:
+                rows.reverse()
+                return rows, has_more, True
+
+            return rows, cursor is not None, has_more
+        except SQLAlchemyError as e:
+            logger.error(f"Error when retrieving orders page (filters={filters}, cursor={cursor}): {e}")
+            return [], False, False
+
     async def update(self, session: async_session_factory):
         pass
 
@@ -69,8 +215,10 @@ class OrderObj(CRUD):
             if not order:
                 return False
 
+            app_user_id = order.app_user_id
             await session.delete(order)
             await session.commit()
+            invalidate_order_views(app_user_id)
             return True
         except SQLAlchemyError as e:
             await session.rollback()
@@ -98,7 +246,11 @@ class OrderObj(CRUD):
                 return False
 
             order.status = new_status
+            await session.flush()
+            await BookObj.sync_availability(session=session, book_id=order.book_id)
+            app_user_id = order.app_user_id
             await session.commit()
+            invalidate_order_views(app_user_id)
             return True
         except SQLAlchemyError as e:
             await session.rollback()
@@ -121,7 +273,11 @@ class OrderObj(CRUD):
             order.returned_to_id = location_id
             book.location_id = location_id
 
+            await session.flush()
+            await BookObj.sync_availability(session=session, book_id=book.id)
+            app_user_id = order.app_user_id
             await session.commit()
+            invalidate_order_views(app_user_id)
             return True
         except SQLAlchemyError as e:
             await session.rollback()
@@ -145,7 +301,10 @@ class OrderObj(CRUD):
                 return False
 
             order.status = OrderStatus.IN_PROCESS
+            await session.flush()
+            await BookObj.sync_availability(session=session, book_id=book_id)
             await session.commit()
+            invalidate_order_views(app_user_id)
             return True
         except SQLAlchemyError as e:
             await session.rollback()
@@ -167,3 +326,53 @@ class OrderObj(CRUD):
         except SQLAlchemyError as e:
             logger.error(f"Error when checking if book is taken (id={book_id}: {e}")
             return False
+
+    @staticmethod
+    async def expire_reservations(session: async_session_factory, older_than: timedelta,
+                                  limit: int = 500) -> list[ExpiredReservations] | None:
+        """Cancel up to limit reservations older than older_than and free their books, grouped by Telegram user."""
+        try:
+            stale = (
+                select(Order.id)
+                .where(Order.status == OrderStatus.RESERVED, Order.created_at < func.now() - older_than)
+                .order_by(Order.created_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            expired = (
+                update(Order)
+                .where(Order.id.in_(stale.scalar_subquery()))
+                .values(status=OrderStatus.CANCELLED)
+                .returning(Order.book_id, Order.app_user_id)
+                .cte('expired')
+            )
+            query = (
+                select(TelegramUsers.telegram_id, array_agg(Book.title), array_agg(Book.id))
+                .select_from(expired)
+                .join(Book, Book.id == expired.c.book_id)
+                .outerjoin(AppUsers, AppUsers.id == expired.c.app_user_id)
+                .outerjoin(TelegramUsers, TelegramUsers.id == AppUsers.tg_user_id)
+                .group_by(TelegramUsers.telegram_id)
+            )
+            rows = (await session.execute(query)).all()
+
+            await BookObj.sync_availability_many(
+                session=session, book_ids=[book_id for *_, book_ids in rows for book_id in book_ids]
+            )
+            await session.commit()
+            if rows:
+                invalidate_order_views()
+            return [ExpiredReservations(telegram_id=telegram_id, titles=titles) for telegram_id, titles, _ in rows]
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.error(f"Error when expiring reservations older than {older_than}: {e}")
+            return None
+
+
+def _status_order():
+    return case(
+        (Order.status == OrderStatus.RESERVED, 0),
+        (Order.status == OrderStatus.IN_PROCESS, 1),
+        (Order.status == OrderStatus.RETURNED, 2),
+        (Order.status == OrderStatus.CANCELLED, 2),
+    )
@@ -0,0 +1,111 @@
+import logging
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, and_, or_, String, cast
+from sqlalchemy.dialects.postgresql import insert, array_agg, aggregate_order_by
+from sqlalchemy.exc import SQLAlchemyError
+from uuid6 import UUID
+
+from db.database import async_session_factory
+from db.models import Order, OrderStatus, OrderReminder, Book, AppUsers, TelegramUsers
+from interface import CRUD
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class OverdueOrder:
+    order_id: UUID
+    title: str
+    status: OrderStatus
+    created_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class OverdueDigest:
+    telegram_id: str
+    orders: list[OverdueOrder]
+
+
+class OrderReminderObj(CRUD):
+    async def create(self, session: async_session_factory, orders: list[OverdueOrder]) -> bool:
+        try:
+            if not orders:
+                return False
+
+            query = insert(OrderReminder).values([
+                {'order_id': order.order_id, 'status': order.status} for order in orders
+            ])
+            query = query.on_conflict_do_update(
+                index_elements=[OrderReminder.order_id],
+                set_={'status': query.excluded.status, 'sent_at': func.now()},
+            )
+            await session.execute(query)
+            await session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.error(f"Error while recording {len(orders)} order reminders: {e}")
+            return False
+
+    async def read(self):
+        pass
+
+    async def update(self):
+        pass
+
+    async def remove(self):
+        pass
+
+    async def get_obj(self):
+        pass
+
+    @staticmethod
+    async def read_due(session: async_session_factory, reserved_for: timedelta, loan_period: timedelta,
+                       repeat_every: timedelta, limit: int = 500, after: str | None = None) -> list[OverdueDigest]:
+        """Overdue active orders without a recent reminder, one digest per Telegram user, ordered by telegram_id."""
+        try:
+            now = func.now()
+            overdue = or_(
+                and_(Order.status == OrderStatus.RESERVED, Order.created_at < now - reserved_for),
+                and_(Order.status == OrderStatus.IN_PROCESS, Order.created_at < now - loan_period),
+            )
+            not_reminded = or_(
+                OrderReminder.order_id.is_(None),
+                OrderReminder.status != Order.status,
+                OrderReminder.sent_at < now - repeat_every,
+            )
+            query = (
+                select(
+                    TelegramUsers.telegram_id,
+                    array_agg(aggregate_order_by(Order.id, Order.created_at)),
+                    array_agg(aggregate_order_by(Book.title, Order.created_at)),
+                    array_agg(aggregate_order_by(cast(Order.status, String), Order.created_at)),
+                    array_agg(aggregate_order_by(Order.created_at, Order.created_at)),
+                )
+                .join(Book, Book.id == Order.book_id)
+                .join(AppUsers, AppUsers.id == Order.app_user_id)
+                .join(TelegramUsers, TelegramUsers.id == AppUsers.tg_user_id)
+                .outerjoin(OrderReminder, OrderReminder.order_id == Order.id)
+                .where(overdue, not_reminded)
+                .group_by(TelegramUsers.telegram_id)
+                .order_by(TelegramUsers.telegram_id)
+                .limit(limit)
+            )
+            if after is not None:
+                query = query.where(TelegramUsers.telegram_id > after)
+            result = await session.execute(query)
+            return [
+                OverdueDigest(
+                    telegram_id=telegram_id,
+                    orders=[
+                        OverdueOrder(order_id=order_id, title=title, status=OrderStatus[status], created_at=created_at)
+                        for order_id, title, status, created_at in zip(order_ids, titles, statuses, created)
+                    ],
+                )
+                for telegram_id, order_ids, titles, statuses, created in result.all()
+            ]
+        except SQLAlchemyError as e:
+            logger.error(f"Error while retrieving overdue orders: {e}")
+            return []
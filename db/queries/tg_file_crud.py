@@ -0,0 +1,73 @@
+import logging
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from uuid6 import UUID
+
+from db.database import async_session_factory
+from db.models import TelegramFiles
+from interface import CRUD
+
+logger = logging.getLogger(__name__)
+
+
+class TgFileObj(CRUD):
+    async def create(self, session: async_session_factory, entity_id: UUID, payload_hash: str, file_id: str) -> bool:
+        try:
+            if not entity_id or not payload_hash or not file_id:
+                return False
+
+            query = (
+                insert(TelegramFiles)
+                .values(entity_id=entity_id, payload_hash=payload_hash, file_id=file_id)
+                .on_conflict_do_update(
+                    constraint='uq_tg_files_entity_payload',
+                    set_={'file_id': file_id, 'updated_at': func.now()},
+                )
+            )
+            await session.execute(query)
+            await session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.error(f"Error while saving telegram file (entity_id={entity_id}, payload_hash={payload_hash}): {e}")
+            return False
+
+    async def read(self, session: async_session_factory, entity_id: UUID, payload_hash: str) -> str | None:
+        try:
+            if not entity_id or not payload_hash:
+                return None
+
+            query = select(TelegramFiles.file_id).where(
+                TelegramFiles.entity_id == entity_id,
+                TelegramFiles.payload_hash == payload_hash,
+            )
+            result = await session.execute(query)
+            return result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logger.error(f"Error while retrieving telegram file (entity_id={entity_id}, payload_hash={payload_hash}): {e}")
+            return None
+
+    async def update(self):
+        pass
+
+    async def remove(self, session: async_session_factory, entity_id: UUID, payload_hash: str | None = None) -> bool:
+        try:
+            if not entity_id:
+                return False
+
+            query = delete(TelegramFiles).where(TelegramFiles.entity_id == entity_id)
+            if payload_hash:
+                query = query.where(TelegramFiles.payload_hash == payload_hash)
+
+            await session.execute(query)
+            await session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.error(f"Error while removing telegram file (entity_id={entity_id}, payload_hash={payload_hash}): {e}")
+            return False
+
+    async def get_obj(self):
+        pass
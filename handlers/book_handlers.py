@@ -1,29 +1,41 @@
 from aiogram import Router, F
 from aiogram.enums import ParseMode
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove
+from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove, InlineQuery, InlineQueryResultArticle, \
+    InputTextMessageContent
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid6 import UUID
 
-from db.database import async_session_factory
-from db.queries.book_crud import BookObj
+from QR.qr_cache import book_qr_payload
+from QR.send_qr import answer_qr_photo
+from db.models import Category
+from db.queries.book_crud import BookObj, BookSearchRow
 from db.queries.location_crud import LocationObj
-from db.queries.app_user_crud import AppUserObj
+from db.queries.app_user_crud import AppUserObj, AppUserIdentity
 from keyboards import book_kbs as bk_kb
 from keyboards import location_kbs as loc_kb
 from states.main_states import Books, BookUpdate
+from utils.book_index import book_index
+from utils.pagination import parse_page_cursor
 
 book_router = Router()
 
+OWNERS_PAGE_SIZE = 20
+OWNER_SEARCH_LIMIT = 20
+OWNER_SEARCH_CACHE_TIME = 5
+SEARCH_PAGE_SIZE = 5
+SEARCH_INLINE_CACHE_TIME = 30
+SEARCH_USAGE = "🔍 Usage: <code>/search words from the title, author or description</code>"
+OWNER_PROMPT = "👤 Select the owner, or type the first letters of their name or email:"
+
 
 # region Create book
 @book_router.message(Command('books'))
-async def books_command(message: Message):
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(message.from_user.id))
-        books = await BookObj().read(session=session)
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
+async def books_command(message: Message, identity: AppUserIdentity, session: AsyncSession):
+    books = await BookObj().read(session=session, profile='list')
 
+    is_admin = identity.is_admin
     reply_markup = bk_kb.books_kb if is_admin else bk_kb.user_book_kb
     if books:
         text = '📚 Books:\n'
@@ -35,18 +47,17 @@ async def books_command(message: Message):
 
 
 @book_router.callback_query(F.data == 'add_book')
-async def add_book_handler(callback: CallbackQuery, state: FSMContext):
+async def add_book_handler(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
     await state.update_data(prev_callback=callback.data)
-    async with async_session_factory() as session:
-        if await LocationObj().read(session=session):
-            await callback.message.edit_text("📖 Enter the book title:")
-            await state.set_state(Books.author)
-        else:
-            await callback.message.edit_text(
-                'Before adding a book to the library, please create a location first.',
-                reply_markup=bk_kb.create_loc_or_exit()
-            )
+    if await LocationObj().read(session=session, profile='list'):
+        await callback.message.edit_text("📖 Enter the book title:")
+        await state.set_state(Books.author)
+    else:
+        await callback.message.edit_text(
+            'Before adding a book to the library, please create a location first.',
+            reply_markup=bk_kb.create_loc_or_exit()
+        )
 
 
 @book_router.message(Books.author)
@@ -65,41 +76,97 @@ async def show_book_handler_desc(message: Message, state: FSMContext):
 
 
 @book_router.message(Books.owner)
-async def add_book_handler_owner(message: Message, state: FSMContext):
+async def add_book_handler_owner(message: Message, state: FSMContext, session: AsyncSession):
     await state.update_data(description=message.text)
 
-    async with async_session_factory() as session:
-        app_users = await AppUserObj().read(session=session)
+    owners, has_prev, has_next = await AppUserObj.read_owner_page(session=session, limit=OWNERS_PAGE_SIZE)
 
-    kb = await bk_kb.owners_kb(result=app_users, action='create')
-    await message.answer('👤 Select the owner:', reply_markup=kb)
+    kb = bk_kb.owners_kb(owners, action='create', has_prev=has_prev, has_next=has_next)
+    await message.answer(OWNER_PROMPT, reply_markup=kb)
+    await state.set_state(Books.owner_search)
+
+
+@book_router.callback_query(F.data.startswith('owners_'))
+async def owners_page(callback: CallbackQuery, session: AsyncSession):
+    await callback.answer()
+    action = callback.data.split('_')[1]
+    cursor, backward = parse_page_cursor(callback.data)
+
+    owners, has_prev, has_next = await AppUserObj.read_owner_page(
+        session=session, cursor=cursor, limit=OWNERS_PAGE_SIZE, backward=backward
+    )
+    kb = bk_kb.owners_kb(owners, action=action, has_prev=has_prev, has_next=has_next)
+    await callback.message.edit_reply_markup(reply_markup=kb)
+
+
+@book_router.inline_query(F.query.startswith(bk_kb.OWNER_QUERY_PREFIX))
+async def owner_inline_search(inline_query: InlineQuery, identity: AppUserIdentity, session: AsyncSession):
+    owners = []
+    if identity.is_admin:
+        owners = await AppUserObj.search_owners(
+            session=session, prefix=inline_query.query.removeprefix(bk_kb.OWNER_QUERY_PREFIX), limit=OWNER_SEARCH_LIMIT
+        )
+
+    results = [
+        InlineQueryResultArticle(
+            id=str(owner.app_user_id),
+            title=owner.full_name,
+            description=owner.email,
+            input_message_content=InputTextMessageContent(message_text=f"👤 {owner.full_name}\n{owner.email}"),
+        )
+        for owner in owners
+    ]
+    await inline_query.answer(results, cache_time=OWNER_SEARCH_CACHE_TIME, is_personal=True)
+
+
+@book_router.message(Books.owner_search)
+@book_router.message(BookUpdate.owner)
+async def search_owner(message: Message, state: FSMContext, session: AsyncSession):
+    action = 'create' if await state.get_state() == Books.owner_search.state else 'update'
+    lines = (message.text or '').strip().splitlines()
+    # A picked inline result ends with the employee's email
+    query = lines[-1] if message.via_bot and lines else ' '.join(lines)
+
+    owners = await AppUserObj.search_owners(session=session, prefix=query, limit=OWNERS_PAGE_SIZE)
+    exact = [owner for owner in owners if owner.email and owner.email.lower() == query.lower()]
+    if len(exact) == 1:
+        owner = exact[0]
+        if action == 'create':
+            await select_create_owner(message, state, owner.app_user_id, owner.full_name)
+        else:
+            await select_update_owner(message, state, owner.app_user_id, owner.full_name)
+    elif owners:
+        await message.answer(f"🔍 Matches for «{query}»:", reply_markup=bk_kb.owners_kb(owners, action=action))
+    else:
+        await message.answer("Nobody found, try another prefix:", reply_markup=bk_kb.owners_kb([], action=action))
 
 
 @book_router.callback_query(F.data.startswith('select_owner_create:'))
-async def show_books_handler(callback: CallbackQuery, state: FSMContext):
+async def show_books_handler(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
 
     owner_id = UUID(callback.data.split(':')[1])
-    async with async_session_factory() as session:
-        owner_fullname = await AppUserObj().get_employee_fullname(session=session, app_user_id=owner_id)
+    owner_fullname = await AppUserObj().get_employee_fullname(session=session, app_user_id=owner_id)
+    await select_create_owner(callback.message, state, owner_id, owner_fullname)
+
 
+async def select_create_owner(message: Message, state: FSMContext, owner_id: UUID, owner_fullname: str | None):
     await state.update_data(owner_id=owner_id)
     await state.update_data(owner=owner_fullname)
 
     result = await BookObj().get_categories()
     keyboard = bk_kb.category_kb(result=result)
 
-    await callback.message.answer("🏷 Choose categories:", reply_markup=keyboard)
+    await message.answer("🏷 Choose categories:", reply_markup=keyboard)
     await state.set_state(Books.categories)
 
 
 @book_router.message(Books.categories)
-async def add_book(message: Message, state: FSMContext):
+async def add_book(message: Message, state: FSMContext, session: AsyncSession):
     selected_category = message.text
     data = await state.get_data()
     chosen_categories = data.get("chosen_categories", [])
-    async with async_session_factory() as session:
-        locations = await LocationObj().read(session=session)
+    locations = await LocationObj().read(session=session, profile='list')
     keyboard = loc_kb.locations_kb(locations)
 
     if selected_category == "✅ Done":
@@ -155,17 +222,16 @@ async def show_book_handler(message: Message, state: FSMContext):
 
 
 @book_router.callback_query(F.data == 'create_book_confirm')
-async def create_book_handler(callback: CallbackQuery, state: FSMContext):
+async def create_book_handler(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
     data = await state.get_data()
     description = None if data.get('description') == "-" else data.get('description')
 
-    async with async_session_factory() as session:
-        loc_id = await LocationObj().get_location_id(session=session, city=data.get('loc_city'),
-                                                     room=data.get('loc_room'))
-        success = await BookObj().create(session=session, title=data.get('title'), author=data.get('author'),
-                                         description=description, owner_id=data.get('owner_id'),
-                                         categories=data.get('categories'), location_id=loc_id)
+    loc_id = await LocationObj().get_location_id(session=session, city=data.get('loc_city'),
+                                                 room=data.get('loc_room'))
+    success = await BookObj().create(session=session, title=data.get('title'), author=data.get('author'),
+                                     description=description, owner_id=data.get('owner_id'),
+                                     categories=data.get('categories'), location_id=loc_id)
 
     if success:
         await callback.message.answer(
@@ -200,17 +266,15 @@ async def cancel_book_handler(callback: CallbackQuery, state: FSMContext):
 
 # region Remove book
 @book_router.callback_query(F.data == 'remove_book')
-async def delete_book_handler(callback: CallbackQuery, page: int = 1, per_page: int = 5):
+async def delete_book_handler(callback: CallbackQuery, session: AsyncSession, cursor: UUID | None = None,
+                              backward: bool = False, per_page: int = 5):
     await callback.answer()
-    async with async_session_factory() as session:
-        books = await BookObj().read(session=session)
-
-    start_idx = (page - 1) * per_page
-    end_idx = min(start_idx + per_page, len(books))
-    books_page = books[start_idx:end_idx]
+    books, has_prev, has_next = await BookObj().read_page(
+        session=session, cursor=cursor, limit=per_page, backward=backward
+    )
 
-    text = '\n'.join(f"📖 {index + 1}: {book.title} - {book.author}" for index, book in enumerate(books_page))
-    kb = bk_kb.book_list_kb(books=books, action='remove', page=page, per_page=per_page)
+    text = '\n'.join(f"📖 {book.title} - {book.author}" for book in books)
+    kb = bk_kb.book_list_kb(books=books, action='remove', has_prev=has_prev, has_next=has_next)
 
     if callback.message:
         await callback.message.edit_text(text=text, reply_markup=kb)
@@ -219,19 +283,18 @@ async def delete_book_handler(callback: CallbackQuery, page: int = 1, per_page:
 
 
 @book_router.callback_query(F.data.startswith('remove_page_'))
-async def change_page(callback: CallbackQuery):
+async def change_page(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
-    page = int(callback.data.split('_')[-1])
-    await delete_book_handler(callback, page=page)
+    cursor, backward = parse_page_cursor(callback.data)
+    await delete_book_handler(callback, session, cursor=cursor, backward=backward)
 
 
 @book_router.callback_query(F.data.startswith("remove_select_"))
-async def select_book(callback: CallbackQuery, state: FSMContext):
+async def select_book(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
     book_id = UUID(callback.data.split("_")[2])
     await state.update_data(selected_book=book_id)
-    async with async_session_factory() as session:
-        book = await BookObj().get_obj(session=session, book_id=book_id)
+    book = await BookObj().get_obj(session=session, book_id=book_id)
 
     confirm_kb = bk_kb.book_confirmation_kb
 
@@ -242,13 +305,12 @@ async def select_book(callback: CallbackQuery, state: FSMContext):
 
 
 @book_router.callback_query(F.data == 'book_confirm_remove')
-async def delete_book_confirm(callback: CallbackQuery, state: FSMContext):
+async def delete_book_confirm(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
     data = await state.get_data()
     book_id = data.get('selected_book')
 
-    async with async_session_factory() as session:
-        success = await BookObj().remove(session=session, book_id=book_id)
+    success = await BookObj().remove(session=session, book_id=book_id)
     if success:
         await callback.message.edit_text(
             "✅ Book successfully removed!",
@@ -273,16 +335,14 @@ async def delete_book_cancel(callback: CallbackQuery, state: FSMContext):
 
 
 # region Update book
-async def display_books_page(callback: CallbackQuery, page: int = 1, per_page: int = 5):
-    async with async_session_factory() as session:
-        books = await BookObj().read(session=session)
-
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    books_page = books[start_idx:end_idx]
+async def display_books_page(callback: CallbackQuery, session: AsyncSession, cursor: UUID | None = None,
+                             backward: bool = False, per_page: int = 5):
+    books, has_prev, has_next = await BookObj().read_page(
+        session=session, cursor=cursor, limit=per_page, backward=backward
+    )
 
-    text = '\n'.join(f"📖  {index + 1}: {book.title} - {book.author}" for index, book in enumerate(books_page))
-    kb = bk_kb.book_list_kb(books=books, action='update', page=page, per_page=per_page)
+    text = '\n'.join(f"📖 {book.title} - {book.author}" for book in books)
+    kb = bk_kb.book_list_kb(books=books, action='update', has_prev=has_prev, has_next=has_next)
 
     if callback.message:
         await callback.message.edit_text(text=text, reply_markup=kb)
@@ -291,38 +351,35 @@ async def display_books_page(callback: CallbackQuery, page: int = 1, per_page: i
 
 
 @book_router.callback_query(F.data == 'update_book')
-async def update_book_handler(callback: CallbackQuery, page: int = 1, per_page: int = 5):
+async def update_book_handler(callback: CallbackQuery, session: AsyncSession, cursor: UUID | None = None,
+                              backward: bool = False):
     await callback.answer()
-    await display_books_page(callback, page, per_page)
+    await display_books_page(callback, session, cursor, backward)
 
 
 @book_router.callback_query(F.data == "book_update_back")
-async def book_update_back(callback: CallbackQuery, page: int = 1, per_page: int = 5):
+async def book_update_back(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
-    await display_books_page(callback, page, per_page)
+    await display_books_page(callback, session)
 
 
 @book_router.callback_query(F.data.startswith('update_page_'))
-async def change_page(callback: CallbackQuery):
-    page = int(callback.data.split('_')[-1])
-    await update_book_handler(callback, page=page)
+async def change_page(callback: CallbackQuery, session: AsyncSession):
+    cursor, backward = parse_page_cursor(callback.data)
+    await update_book_handler(callback, session, cursor=cursor, backward=backward)
 
 
 @book_router.callback_query(F.data.startswith("update_select_"))
-async def select_book(callback: CallbackQuery, state: FSMContext):
+async def select_book(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity, session: AsyncSession):
     await callback.answer()
     book_id = UUID(callback.data.split("_")[2])
-    async with async_session_factory() as session:
-        book = await BookObj().get_obj(session=session, book_id=book_id)
-        book_categories = await BookObj().get_book_categories(session=session, book_id=book_id)
+    book = await BookObj().get_obj(session=session, book_id=book_id, with_categories=True)
 
-    categories = "\n".join(f"• {cat}" for cat in book_categories)
+    categories = "\n".join(f"• {book_category.category.value}" for book_category in book.book_categories)
     kb = bk_kb.book_update_kb()
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        owner_fullname = await AppUserObj().get_employee_fullname(session=session, app_user_id=app_user_id)
-        location = await LocationObj().get_obj(session=session, location_id=book.location_id)
+    owner_fullname = identity.full_name
+    location = await LocationObj().get_obj(session=session, location_id=book.location_id)
 
     description = book.description or '<i>no description</i>'
     text = (
@@ -387,39 +444,39 @@ async def set_description(message: Message, state: FSMContext):
 
 
 @book_router.callback_query(F.data == "update_owner")
-async def update_owner(callback: CallbackQuery, state: FSMContext):
+async def update_owner(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
-    async with async_session_factory() as session:
-        app_users = await AppUserObj().read(session=session)
+    owners, has_prev, has_next = await AppUserObj.read_owner_page(session=session, limit=OWNERS_PAGE_SIZE)
 
-    kb = await bk_kb.owners_kb(result=app_users, action='update')
+    kb = bk_kb.owners_kb(owners, action='update', has_prev=has_prev, has_next=has_next)
     await callback.message.edit_reply_markup(reply_markup=None)
-    await callback.message.answer("Choose a new owner:", reply_markup=kb)
+    await callback.message.answer(OWNER_PROMPT, reply_markup=kb)
     await state.set_state(BookUpdate.owner)
 
 
 @book_router.callback_query(F.data.startswith('select_owner_update:'))
-async def set_owner(callback: CallbackQuery, state: FSMContext):
+async def set_owner(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
-    owner_id = callback.data.split(':')[1]
-    async with async_session_factory() as session:
-        owner_fullname = await AppUserObj().get_employee_fullname(session=session, app_user_id=UUID(owner_id))
+    owner_id = UUID(callback.data.split(':')[1])
+    owner_fullname = await AppUserObj().get_employee_fullname(session=session, app_user_id=owner_id)
+    await select_update_owner(callback.message, state, owner_id, owner_fullname)
 
+
+async def select_update_owner(message: Message, state: FSMContext, owner_id: UUID, owner_fullname: str | None):
     if owner_fullname:
-        await save_book_update(state, "owner_id", owner_id)
-        await callback.message.answer(f"New owner: {owner_fullname}", reply_markup=ReplyKeyboardRemove())
-        await callback.message.answer(
+        await save_book_update(state, "owner_id", str(owner_id))
+        await message.answer(f"New owner: {owner_fullname}", reply_markup=ReplyKeyboardRemove())
+        await message.answer(
             f"To save all changes, press «💾 Save Changes»", reply_markup=bk_kb.book_update_kb()
         )
     else:
-        await callback.message.answer('User with this ID does not exist', reply_markup=bk_kb.book_update_kb())
+        await message.answer('User with this ID does not exist', reply_markup=bk_kb.book_update_kb())
 
 
 @book_router.callback_query(F.data == 'update_book_location')
-async def update_location(callback: CallbackQuery, state: FSMContext):
+async def update_location(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
-    async with async_session_factory() as session:
-        locations = await LocationObj().read(session=session)
+    locations = await LocationObj().read(session=session, profile='list')
 
     kb = loc_kb.locations_kb(locations)
     await callback.message.edit_reply_markup(reply_markup=None)
@@ -428,11 +485,10 @@ async def update_location(callback: CallbackQuery, state: FSMContext):
 
 
 @book_router.message(BookUpdate.location)
-async def set_location(message: Message, state: FSMContext):
+async def set_location(message: Message, state: FSMContext, session: AsyncSession):
     loc_city = message.text.split(':')[0]
     loc_room = message.text.split(':')[1].strip()
-    async with async_session_factory() as session:
-        location_id = await LocationObj.get_location_id(session=session, city=loc_city, room=loc_room)
+    location_id = await LocationObj.get_location_id(session=session, city=loc_city, room=loc_room)
 
     if location_id is None:
         await message.answer("❌ Location not found. Please try again.", reply_markup=bk_kb.book_update_kb())
@@ -492,7 +548,7 @@ async def update_category(message: Message, state: FSMContext):
 
 
 @book_router.callback_query(F.data == "save_changes")
-async def save_changes(callback: CallbackQuery, state: FSMContext):
+async def save_changes(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
     data = await state.get_data()
     book_id = data.get("selected_book")
@@ -502,8 +558,7 @@ async def save_changes(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❗ No changes to save!", show_alert=True)
         return
 
-    async with async_session_factory() as session:
-        updated_book = await BookObj().update(session=session, book_id=book_id, updates=updates)
+    updated_book = await BookObj().update(session=session, book_id=book_id, updates=updates)
 
     if updated_book:
         await callback.message.edit_text(
@@ -527,42 +582,38 @@ async def cancel_changes(callback: CallbackQuery, state: FSMContext):
 
 # region Read book
 @book_router.callback_query(F.data == "book_detail")
-async def book_detail(callback: CallbackQuery, page=1, per_page=5):
+async def book_detail(callback: CallbackQuery, session: AsyncSession, cursor: UUID | None = None,
+                      backward: bool = False, per_page=5):
     await callback.answer()
-    async with async_session_factory() as session:
-        books = await BookObj().read(session=session)
+    books, has_prev, has_next = await BookObj().read_page(
+        session=session, cursor=cursor, limit=per_page, backward=backward
+    )
 
-    start_idx = (page - 1) * per_page
-    end_idx = min(start_idx + per_page, len(books))
-    books_page = books[start_idx:end_idx]
     text = '📚 Books \n'
-    text += '\n'.join(f"📖 {index + 1}: {book.title} - {book.author}" for index, book in enumerate(books_page))
+    text += '\n'.join(f"📖 {book.title} - {book.author}" for book in books)
 
     await callback.message.edit_text(
-        text, reply_markup=bk_kb.book_list_kb(books=books, action='view', page=page, per_page=per_page))
+        text, reply_markup=bk_kb.book_list_kb(books=books, action='view', has_prev=has_prev, has_next=has_next))
 
 
 @book_router.callback_query(F.data.startswith('view_page_'))
-async def view_page(callback: CallbackQuery):
+async def view_page(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
-    page = int(callback.data.split('_')[-1])
-    await book_detail(callback, page=page)
+    cursor, backward = parse_page_cursor(callback.data)
+    await book_detail(callback, session, cursor=cursor, backward=backward)
 
 
 @book_router.callback_query(F.data.startswith('view_select_'))
-async def book_open(callback: CallbackQuery):
+@book_router.callback_query(F.data.startswith('search_select_'))
+@book_router.callback_query(F.data.startswith('browse_select_'))
+async def book_open(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
     await callback.answer()
     book_id = UUID(callback.data.split('_')[-1])
-    async with async_session_factory() as session:
-        book = await BookObj().get_obj(session=session, book_id=book_id)
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        location = await LocationObj().get_obj(session=session, location_id=book.location_id)
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
-        book_categories = await BookObj().get_book_categories(session=session, book_id=book_id)
-
-    categories = "\n".join(f"• {cat}" for cat in book_categories)
+    book = await BookObj().get_obj(session=session, book_id=book_id, with_categories=True)
 
     if book:
+        location = await LocationObj().get_obj(session=session, location_id=book.location_id)
+        categories = "\n".join(f"• {book_category.category.value}" for book_category in book.book_categories)
         description = book.description or '<i>no description</i>'
         text = (
             f"📚 <b>{book.title}</b>\n"
@@ -575,35 +626,34 @@ async def book_open(callback: CallbackQuery):
             text,
             reply_markup=bk_kb.order_cancel_kb(
                 book_id=book_id,
-                is_admin=is_admin
+                is_admin=identity.is_admin
             ), parse_mode='HTML')
     else:
         await callback.message.edit_text('Book not found')
 
 
 @book_router.callback_query(F.data.startswith("qr_book_"))
-async def get_book_qr(callback: CallbackQuery):
+async def get_book_qr(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
     book_id = UUID(callback.data.split("_")[2])
-    async with async_session_factory() as session:
-        qr_img = await BookObj().get_book_qr_code(session=session, book_id=book_id)
-        if qr_img:
-            await callback.message.answer_photo(photo=qr_img)
-        else:
-            await callback.message.answer("QR has not found ❌")
+    sent = await answer_qr_photo(
+        callback.message, session, entity_id=book_id, payload=book_qr_payload(book_id),
+        qr_file=lambda: BookObj().get_book_qr_code(session=session, book_id=book_id),
+    )
+    if not sent:
+        await callback.message.answer("QR has not found ❌")
 
 
 @book_router.callback_query(F.data == "book_view_back")
-async def book_update_back(callback: CallbackQuery, page: int = 1, per_page: int = 5):
+async def book_update_back(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
-    await book_detail(callback, page, per_page)
+    await book_detail(callback, session)
 
 
 @book_router.callback_query(F.data == 'qrcode_book')
-async def books_qr(callback: CallbackQuery):
+async def books_qr(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
-    async with async_session_factory() as session:
-        books = await BookObj().read(session=session, available_books=False)
+    books = await BookObj().read(session=session, available_books=False, profile='list')
 
     await callback.message.edit_text(
         "Choose a book to view the QR code:",
@@ -612,14 +662,14 @@ async def books_qr(callback: CallbackQuery):
 
 
 @book_router.callback_query(F.data.startswith('qr_book_'))
-async def book_qr_code(callback: CallbackQuery):
+async def book_qr_code(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
     book_id = UUID(callback.data.split("_")[2])
 
-    async with async_session_factory() as session:
-        qr_code = await BookObj().get_book_qr_code(session=session, book_id=book_id)
-
-    await callback.message.answer_photo(qr_code)
+    await answer_qr_photo(
+        callback.message, session, entity_id=book_id, payload=book_qr_payload(book_id),
+        qr_file=lambda: BookObj().get_book_qr_code(session=session, book_id=book_id),
+    )
 
 
 # endregion
@@ -627,10 +677,9 @@ async def book_qr_code(callback: CallbackQuery):
 
 # region Navigating Buttons
 @book_router.callback_query(F.data == 'back_to_list')
-async def back_to_list(callback: CallbackQuery):
+async def back_to_list(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
-    async with async_session_factory() as session:
-        books = await BookObj().read(session=session)
+    books = await BookObj().read(session=session, profile='list')
 
     if books:
         text = '📚 Books:\n'
@@ -643,14 +692,11 @@ async def back_to_list(callback: CallbackQuery):
 
 
 @book_router.callback_query(F.data == 'back_button')
-async def back_button(callback: CallbackQuery, state: FSMContext):
+async def back_button(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity, session: AsyncSession):
     await callback.answer()
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        books = await BookObj().read(session=session)
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
+    books = await BookObj().read(session=session, profile='list')
 
-    reply_markup = bk_kb.books_kb if is_admin else bk_kb.user_book_kb
+    reply_markup = bk_kb.books_kb if identity.is_admin else bk_kb.user_book_kb
 
     if books:
         text = '📚 Books:\n'
@@ -661,3 +707,129 @@ async def back_button(callback: CallbackQuery, state: FSMContext):
 
     await state.clear()
 # endregion
+
+
+# region Search
+def search_results_text(terms: str, books: list[BookSearchRow]) -> str:
+    if not books:
+        return f"🔍 Nothing found for «{terms}»"
+
+    text = f"🔍 Results for «{terms}»:\n"
+    text += '\n'.join(
+        f"📖 {book.title} - {book.author}" + ('' if book.is_available else ' (taken)')
+        for book in books
+    )
+    return text
+
+
+@book_router.message(Command('search'))
+async def search_command(message: Message, command: CommandObject, state: FSMContext, session: AsyncSession):
+    if not command.args:
+        await message.answer(SEARCH_USAGE, parse_mode=ParseMode.HTML)
+        return
+
+    await state.update_data(search_terms=command.args)
+    books, has_prev, has_next = await BookObj.search(session=session, terms=command.args, limit=SEARCH_PAGE_SIZE)
+    await message.answer(
+        search_results_text(command.args, books),
+        reply_markup=bk_kb.book_list_kb(books=books, action='search', has_prev=has_prev, has_next=has_next)
+    )
+
+
+@book_router.callback_query(F.data.startswith('search_page_'))
+async def search_page(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    await callback.answer()
+    terms = await state.get_value('search_terms')
+    if not terms:
+        await callback.message.edit_text(SEARCH_USAGE, parse_mode=ParseMode.HTML)
+        return
+
+    cursor, backward = parse_page_cursor(callback.data)
+    books, has_prev, has_next = await BookObj.search(
+        session=session, terms=terms, cursor=cursor, limit=SEARCH_PAGE_SIZE, backward=backward
+    )
+    await callback.message.edit_text(
+        search_results_text(terms, books),
+        reply_markup=bk_kb.book_list_kb(books=books, action='search', has_prev=has_prev, has_next=has_next)
+    )
+
+
+@book_router.inline_query()
+async def search_inline(inline_query: InlineQuery):
+    results = [
+        InlineQueryResultArticle(
+            id=str(book.id),
+            title=book.title,
+            description=book.author,
+            input_message_content=InputTextMessageContent(message_text=f"📚 {book.title}\n✍️ {book.author}"),
+        )
+        for book in book_index.search(inline_query.query)
+    ]
+    await inline_query.answer(results, cache_time=SEARCH_INLINE_CACHE_TIME)
+# endregion
+
+
+# region Browse by category
+async def browse_text(session: AsyncSession, categories: list[Category], books: list) -> str:
+    names = ', '.join(category.value for category in categories)
+    if not books:
+        return f"🏷 No books in {names}"
+
+    book_categories = await BookObj.get_categories_many(session=session, book_ids=[book.id for book in books])
+    text = f"🏷 Books in {names}:\n"
+    text += '\n'.join(
+        f"📖 {book.title} - {book.author} [{', '.join(book_categories.get(book.id, []))}]"
+        for book in books
+    )
+    return text
+
+
+@book_router.callback_query(F.data == 'browse_categories')
+async def browse_categories(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity,
+                            session: AsyncSession):
+    await callback.answer()
+    await state.update_data(browse_categories=[])
+    counts = await BookObj.category_counts(session=session)
+    if not counts:
+        kb = bk_kb.no_books_kb_admin if identity.is_admin else bk_kb.no_books_kb_user
+        await callback.message.edit_text('🏷 No books have categories yet', reply_markup=kb)
+        return
+
+    await callback.message.edit_text(
+        '🏷 Choose one or more categories:', reply_markup=bk_kb.browse_categories_kb(counts, selected=[])
+    )
+
+
+@book_router.callback_query(F.data.startswith('browse_cat_'))
+async def toggle_browse_category(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    await callback.answer()
+    category = Category[callback.data.removeprefix('browse_cat_')]
+    selected = [Category[name] for name in await state.get_value('browse_categories', [])]
+    if category in selected:
+        selected.remove(category)
+    else:
+        selected.append(category)
+
+    await state.update_data(browse_categories=[category.name for category in selected])
+    counts = await BookObj.category_counts(session=session)
+    await callback.message.edit_reply_markup(reply_markup=bk_kb.browse_categories_kb(counts, selected=selected))
+
+
+@book_router.callback_query(F.data == 'browse_show')
+@book_router.callback_query(F.data.startswith('browse_page_'))
+async def browse_books(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    categories = [Category[name] for name in await state.get_value('browse_categories', [])]
+    if not categories:
+        await callback.answer('Choose at least one category', show_alert=True)
+        return
+
+    await callback.answer()
+    cursor, backward = parse_page_cursor(callback.data) if callback.data != 'browse_show' else (None, False)
+    books, has_prev, has_next = await BookObj.read_by_categories(
+        session=session, categories=categories, cursor=cursor, backward=backward
+    )
+    await callback.message.edit_text(
+        await browse_text(session, categories, books),
+        reply_markup=bk_kb.book_list_kb(books=books, action='browse', has_prev=has_prev, has_next=has_next)
+    )
+# endregion
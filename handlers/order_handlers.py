@@ -1,62 +1,116 @@
+from dataclasses import replace
 from datetime import timedelta
 
 from aiogram import Router, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid6 import UUID
 
-from db.database import async_session_factory
-from db.models import OrderStatus
-from db.queries.app_user_crud import AppUserObj
+from db.models import Order, OrderStatus
+from db.queries.app_user_crud import AppUserIdentity
 from db.queries.book_crud import BookObj
 from db.queries.order_crud import OrderObj
 from keyboards import order_kbs
+from utils.order_view import get_order_view, get_admin_order_page, parse_order_filter, filter_to_data, \
+    filter_from_data, FILTER_USAGE
+from utils.pagination import parse_page_cursor
 
 router = Router()
 
 
 @router.message(Command("orders"))
-async def order_handler(message: Message):
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(message.from_user.id))
-        orders = await OrderObj().read(session=session, app_user_id=app_user_id)
+async def order_handler(message: Message, command: CommandObject, state: FSMContext, identity: AppUserIdentity,
+                        session: AsyncSession):
+    if identity.is_admin:
+        filters = parse_order_filter(command.args)
+        if filters is None:
+            await message.answer(FILTER_USAGE, parse_mode='HTML')
+            return
+
+        await state.update_data(order_filter=filter_to_data(filters), order_page=None)
+        text, keyboard = await get_admin_order_page(session=session, filters=filters)
+        await message.answer(text, reply_markup=keyboard, parse_mode='HTML')
+        return
+
+    view = await get_order_view(session=session, identity=identity)
+    await message.answer(view.text, reply_markup=view.keyboard, parse_mode='HTML')
+
+
+@router.callback_query(F.data.startswith("admin_orders_page_"))
+async def admin_orders_page(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity,
+                            session: AsyncSession):
+    await callback.answer()
+    if not identity.is_admin:
+        return
+
+    cursor, backward = parse_page_cursor(callback.data)
+    filters = filter_from_data(await state.get_value('order_filter'))
+    # Remembered so that "Go back" from an order returns to this page
+    await state.update_data(order_page=callback.data)
+    text, keyboard = await get_admin_order_page(session=session, filters=filters, cursor=cursor, backward=backward)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode='HTML')
+
+
+@router.callback_query(F.data == "admin_orders_back")
+async def admin_orders_back(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity,
+                            session: AsyncSession):
+    await callback.answer()
+    if not identity.is_admin:
+        return
 
-    if not orders:
-        await message.answer("📋 You don't have any orders yet", reply_markup=order_kbs.no_order_kb)
+    filters = filter_from_data(await state.get_value('order_filter'))
+    page = await state.get_value('order_page')
+    cursor, backward = parse_page_cursor(page) if page else (None, False)
+    text, keyboard = await get_admin_order_page(session=session, filters=filters, cursor=cursor, backward=backward)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode='HTML')
+
+
+@router.callback_query(F.data.startswith("admin_order_cancel_"))
+async def admin_cancel_order(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
+    await callback.answer()
+    if not identity.is_admin:
         return
 
-    messages = ["📋 <b>Orders:</b>"]
+    order_id = UUID(callback.data.removeprefix("admin_order_cancel_"))
+    order = await OrderObj().get_obj(session=session, order_id=order_id)
 
-    for idx, order in enumerate(orders, 1):
-        text = f"📖 {idx}. <b>{order.book.title}</b>\n"
+    if order is None or order.status != OrderStatus.RESERVED:
+        message_text = "⚠️ Only reserved orders can be cancelled"
+    elif await OrderObj().update_status(session=session, order_id=order_id, new_status=OrderStatus.CANCELLED):
+        message_text = f"🚫 The reservation of <b>\"{order.book.title}\"</b> has been cancelled"
+    else:
+        message_text = "❌ Oops! Failed to cancel the order\n\n<i>🔄 Please try again later</i>"
 
-        if order.status.value == 'Reserved':
-            text += f"📍 <b>Location:</b> {order.taken_from.city.value}: Room #{order.taken_from.room}\n"
-        elif order.status.value == 'Returned' and order.returned_to:
-            text += f"📍 <b>Returned to:</b> {order.returned_to.city.value}: Room #{order.returned_to.room}\n"
+    await callback.message.edit_text(message_text, reply_markup=order_kbs.back_to_admin_orders_kb, parse_mode='HTML')
 
-        text += f"ℹ️ {order.status.value}"
 
-        messages.append(text)
+@router.callback_query(F.data.startswith("admin_orders_status_"))
+async def admin_orders_status(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity,
+                              session: AsyncSession):
+    await callback.answer()
+    if not identity.is_admin:
+        return
 
-    has_reserved = any(order.status.value == "Reserved" for order in orders)
+    status = callback.data.removeprefix("admin_orders_status_")
+    filters = filter_from_data(await state.get_value('order_filter'))
+    filters = replace(filters, status=None if status == 'ALL' else OrderStatus[status])
 
-    await message.answer("\n\n".join(messages), reply_markup=await order_kbs.get_order_kb(has_reserved),
-                         parse_mode='HTML')
+    await state.update_data(order_filter=filter_to_data(filters), order_page=None)
+    text, keyboard = await get_admin_order_page(session=session, filters=filters)
+    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode='HTML')
 
 
 @router.callback_query(F.data.startswith("order-book_"))
-async def create_order(callback: CallbackQuery):
+async def create_order(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
     await callback.answer()
 
     book_id = UUID(callback.data.split("_")[1])
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        book = await BookObj().get_obj(session=session, book_id=book_id)
-        success = await OrderObj().create(session=session, app_user_id=app_user_id,
-                                          book_id=book_id, taken_from_id=book.location_id)
+    book = await BookObj().get_obj(session=session, book_id=book_id)
+    success = await OrderObj().create(session=session, app_user_id=identity.app_user_id,
+                                      book_id=book_id, taken_from_id=book.location_id)
 
     if success:
         await callback.message.edit_text(
@@ -71,31 +125,22 @@ async def create_order(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("order-"))
-async def action_order(callback: CallbackQuery):
+async def action_order(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
     await callback.answer()
     action = callback.data.split("-")[1]
     message_text = ""
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        orders = await OrderObj().read(session=session, app_user_id=app_user_id)
+    view = await get_order_view(session=session, identity=identity)
 
     if action == 'cancel':
         message_text = "🚫 Choose an order to cancel:"
     elif action == 'detail':
         message_text = "ℹ️ Choose an order to view details:"
 
-    await callback.message.edit_text(message_text, reply_markup=await order_kbs.action_order_kb(action, orders))
-
-
-@router.callback_query(F.data.startswith("order_detail_"))
-async def detail_order(callback: CallbackQuery):
-    await callback.answer()
-    order_id = UUID(callback.data.split("_")[2])
+    await callback.message.edit_text(message_text, reply_markup=await order_kbs.action_order_kb(action, view.rows))
 
-    async with async_session_factory() as session:
-        order = await OrderObj().get_obj(session=session, order_id=order_id)
 
+def order_detail_text(order: Order) -> str:
     description = order.book.description or '<i>no description</i>'
     message_text = (
         f"📚 <b>{order.book.title}</b>\n"
@@ -114,41 +159,59 @@ async def detail_order(callback: CallbackQuery):
         f"\n📅 <b>Order date:</b> {(order.created_at + timedelta(hours=5)).strftime('%Y-%m-%d %H:%M')}\n"
         f"ℹ️ <b>Status:</b> {order.status.value}\n\n"
     )
+    return message_text
 
-    keyboard = order_kbs.back_to_detail_order_kb
 
-    await callback.message.edit_text(message_text, reply_markup=keyboard, parse_mode='HTML')
+@router.callback_query(F.data.startswith("order_detail_"))
+async def detail_order(callback: CallbackQuery, session: AsyncSession):
+    await callback.answer()
+    order_id = UUID(callback.data.split("_")[2])
+
+    order = await OrderObj().get_obj(session=session, order_id=order_id)
+    await callback.message.edit_text(
+        order_detail_text(order), reply_markup=order_kbs.back_to_detail_order_kb, parse_mode='HTML'
+    )
+
+
+@router.callback_query(F.data.startswith("admin_order_detail_"))
+async def admin_detail_order(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
+    await callback.answer()
+    if not identity.is_admin:
+        return
+
+    order_id = UUID(callback.data.removeprefix("admin_order_detail_"))
+    order = await OrderObj().get_obj(session=session, order_id=order_id)
+    keyboard = await order_kbs.admin_order_detail_kb(order.id, order.status)
+    await callback.message.edit_text(order_detail_text(order), reply_markup=keyboard, parse_mode='HTML')
 
 
 @router.callback_query(F.data.startswith("return_book_"))
-async def confirm_return_order(callback: CallbackQuery, state: FSMContext):
+async def confirm_return_order(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity,
+                               session: AsyncSession):
     await callback.answer()
     location_id = UUID(callback.data.split("_")[2])
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        orders = await OrderObj().read(session=session, app_user_id=app_user_id)
+    view = await get_order_view(session=session, identity=identity)
 
     await state.update_data(location_id=location_id)
     await callback.message.edit_text("↩️ Choose a book to return:",
-                                     reply_markup=await order_kbs.return_order_kb(orders))
+                                     reply_markup=await order_kbs.return_order_kb(view.rows))
 
 
 @router.callback_query(F.data.startswith("order_return_"))
-async def return_order(callback: CallbackQuery, state: FSMContext):
+async def return_order(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await callback.answer()
     order_id = UUID(callback.data.split("_")[2])
     data = await state.get_data()
     location_id = data.get("location_id")
 
-    async with async_session_factory() as session:
-        success = await OrderObj().update_status_and_location(
-            session=session,
-            order_id=order_id,
-            new_status=OrderStatus.RETURNED,
-            location_id=location_id
-        )
-        order = await OrderObj().get_obj(session=session, order_id=order_id)
+    success = await OrderObj().update_status_and_location(
+        session=session,
+        order_id=order_id,
+        new_status=OrderStatus.RETURNED,
+        location_id=location_id
+    )
+    order = await OrderObj().get_obj(session=session, order_id=order_id)
 
     message_text = (
         f"✅ The book <b>\"{order.book.title}\"</b> has been returned to <b>{order.returned_to.city.value}: "
@@ -161,13 +224,12 @@ async def return_order(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("order_cancel_"))
-async def cancel_order(callback: CallbackQuery):
+async def cancel_order(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
     order_id = UUID(callback.data.split("_")[2])
 
-    async with async_session_factory() as session:
-        success = await OrderObj().update_status(session=session, order_id=order_id, new_status=OrderStatus.CANCELLED)
-        order = await OrderObj().get_obj(session=session, order_id=order_id)
+    success = await OrderObj().update_status(session=session, order_id=order_id, new_status=OrderStatus.CANCELLED)
+    order = await OrderObj().get_obj(session=session, order_id=order_id)
 
     message_text = (
         f"🚫 The order for <b>\"{order.book.title}\"</b> has been successfully cancelled"
@@ -178,33 +240,9 @@ async def cancel_order(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "back_to_order")
-async def back_to_order(callback: CallbackQuery):
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        orders = await OrderObj().read(session=session, app_user_id=app_user_id)
-
-    if not orders:
-        await callback.message.edit_text("📋 You don't have any orders yet", reply_markup=order_kbs.no_order_kb)
-        return
-
-    messages = ["📋 <b>Orders:</b>"]
-
-    for idx, order in enumerate(orders, 1):
-        text = f"📖 {idx}. <b>{order.book.title}</b>\n"
-
-        if order.status.value == 'Reserved':
-            text += f"📍 <b>Location</b> {order.taken_from.city.value}: Room #{order.taken_from.room}\n"
-        elif order.status.value == 'Returned' and order.returned_to:
-            text += f"📍 <b>Returned to:</b> {order.returned_to.city.value}: Room #{order.returned_to.room}\n"
-
-        text += f"ℹ️ {order.status.value}"
-
-        messages.append(text)
-
-    has_reserved = any(order.status.value == "Reserved" for order in orders)
-
-    await callback.message.edit_text("\n\n".join(messages), reply_markup=await order_kbs.get_order_kb(has_reserved),
-                                     parse_mode='HTML')
+async def back_to_order(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
+    view = await get_order_view(session=session, identity=identity)
+    await callback.message.edit_text(view.text, reply_markup=view.keyboard, parse_mode='HTML')
 
 
 @router.callback_query(F.data == "close_order")
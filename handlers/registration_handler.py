@@ -2,72 +2,68 @@ from aiogram import Router
 from aiogram.filters import CommandStart, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid6 import UUID
 
-from db.database import async_session_factory
 from db.models import OrderStatus
 from db.queries.book_crud import BookObj
 from db.queries.employee_crud import EmployeeObj
 from db.queries.order_crud import OrderObj
 from db.queries.role_crud import RoleObj
 from db.queries.tg_user_crud import TgUserObj
-from db.queries.app_user_crud import AppUserObj
+from db.queries.app_user_crud import AppUserObj, AppUserIdentity
 from states.main_states import Reg
 from keyboards import order_kbs
+from utils.order_view import get_order_view
 
 router = Router()
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message, command: CommandObject, state: FSMContext):
+async def cmd_start(message: Message, command: CommandObject, state: FSMContext, identity: AppUserIdentity,
+                    session: AsyncSession):
     args = command.args
-    telegram_id = message.from_user.id
 
-    async with async_session_factory() as session:
-        is_registered = await AppUserObj().is_registered(session=session, telegram_id=str(telegram_id))
-
-        if not is_registered:
-            await message.answer(
-                "Welcome! 👋 To get started, please enter your email address. We'll use it to verify your identity."
-            )
-            await state.set_state(Reg.email)
-            return
-
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(telegram_id))
-
-        if args:
-            if args.startswith("location_"):
-                location_id = UUID(args.split("_")[1])
-                orders = await OrderObj().read(session=session, app_user_id=app_user_id)
+    if not identity.is_registered:
+        await message.answer(
+            "Welcome! 👋 To get started, please enter your email address. We'll use it to verify your identity."
+        )
+        await state.set_state(Reg.email)
+        return
 
-                await state.update_data(location_id=location_id)
-                await message.answer("↩️ Choose a book to return:",
-                                     reply_markup=await order_kbs.return_order_kb(orders))
-                return
+    app_user_id = identity.app_user_id
 
-            elif args.startswith("book_"):
-                book_id = UUID(args.split("_")[1])
+    if args:
+        if args.startswith("location_"):
+            location_id = UUID(args.split("_")[1])
+            view = await get_order_view(session=session, identity=identity)
 
-                is_order = await OrderObj.is_order_exist(session=session, app_user_id=app_user_id, book_id=book_id)
+            await state.update_data(location_id=location_id)
+            await message.answer("↩️ Choose a book to return:",
+                                 reply_markup=await order_kbs.return_order_kb(view.rows))
+            return
 
-                if is_order:
-                    await message.answer("✅ Reservation confirmed! Feel free to pick up your book 📚")
+        elif args.startswith("book_"):
+            book_id = UUID(args.split("_")[1])
+
+            is_order = await OrderObj.is_order_exist(session=session, app_user_id=app_user_id, book_id=book_id)
+
+            if is_order:
+                await message.answer("✅ Reservation confirmed! Feel free to pick up your book 📚")
+            else:
+                book_loc = await BookObj().get_obj(session=session, book_id=book_id)
+                new_order = book_loc and await OrderObj().create(
+                    session=session,
+                    app_user_id=app_user_id,
+                    book_id=book_id,
+                    status=OrderStatus.IN_PROCESS,
+                    taken_from_id=book_loc.location_id,
+                )
+                if new_order:
+                    await message.answer("📚 You have successfully taken the book. Enjoy your reading!")
                 else:
-                    is_taken = await OrderObj.is_book_taken(session=session, book_id=book_id)
-                    if is_taken:
-                        await message.answer("❌Unfortunately, this book has been taken already!")
-                    else:
-                        book_loc = await BookObj().get_obj(session=session, book_id=book_id)
-                        new_order = await OrderObj().create(
-                            session=session,
-                            app_user_id=app_user_id,
-                            book_id=book_id,
-                            status=OrderStatus.IN_PROCESS,
-                            taken_from_id=book_loc.location_id,
-                        )
-                        if new_order:
-                            await message.answer("📚 You have successfully taken the book. Enjoy your reading!")
-                return
+                    await message.answer("❌Unfortunately, this book has been taken already!")
+            return
 
     await message.answer(
         "You are already registered. Feel free to take advantage of all the features! 🚀"
@@ -85,25 +81,24 @@ async def send_verification_code(message: Message, state: FSMContext):
 
 
 @router.message(Reg.code)
-async def reg_code(message: Message, state: FSMContext):
+async def reg_code(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
 
-    async with async_session_factory() as session:
-        tg_user = await TgUserObj().get_obj_by_telegram_id(session=session, telegram_id=str(message.from_user.id))
-        employee = await EmployeeObj().get_obj_by_email(session=session, email=data.get('email'))
-        role = await RoleObj().get_obj_by_name(session=session, name='user')
+    tg_user = await TgUserObj().get_obj_by_telegram_id(session=session, telegram_id=str(message.from_user.id))
+    employee = await EmployeeObj().get_obj_by_email(session=session, email=data.get('email'))
+    role = await RoleObj().get_obj_by_name(session=session, name='user')
 
-        if not tg_user or not employee or not role:
-            await message.answer("❌ Registration failed. Some data is missing or incorrect.")
-            return
+    if not tg_user or not employee or not role:
+        await message.answer("❌ Registration failed. Some data is missing or incorrect.")
+        return
 
-        success = await AppUserObj().create(
-            session=session,
-            telegram_id=str(message.from_user.id),
-            tg_user_id=tg_user.id,
-            employee_id=employee.id,
-            role_id=role.id
-        )
+    success = await AppUserObj().create(
+        session=session,
+        telegram_id=str(message.from_user.id),
+        tg_user_id=tg_user.id,
+        employee_id=employee.id,
+        role_id=role.id
+    )
 
     if success:
         await message.answer(
@@ -111,6 +106,7 @@ async def reg_code(message: Message, state: FSMContext):
             f"👤 You are now registered!</b>\n\n"
             f"🚀 Enjoy using the bot! Here are some useful commands to get started:\n\n"
             f"📚 /books – Explore our full book collection\n"
+            f"🔍 /search – Find books by title, author or description\n"
             f"📍 /locations – Discover available pickup locations\n"
             f"📋 /orders – View and manage your orders\n"
             f"⭐ /wishlists – View and manage your wishlists",
@@ -3,10 +3,10 @@ from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid6 import UUID
 
-from db.database import async_session_factory
-from db.queries.app_user_crud import AppUserObj
+from db.queries.app_user_crud import AppUserIdentity
 from db.queries.wishlist_crud import WishlistObj
 from handlers.registration_handler import cmd_start
 from states.main_states import Wish, WishUpdBookTitle, WishUpdAuthor, WishUpdComment
@@ -16,32 +16,26 @@ router = Router()
 
 
 @router.message(Command("wishlists"))
-async def wishlist_handler(message: Message):
-    telegram_id = message.from_user.id
-
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(telegram_id))
-        wishlist_items = await WishlistObj().read(session=session, app_user_id=app_user_id)
-        is_registered = await AppUserObj().is_registered(session=session, telegram_id=str(telegram_id))
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
-
-        if is_registered:
-            if is_admin:
-                message_text = "⭐ List of all wishlists:\n\n" if wishlist_items else ("📭 The wishlist is "
-                                                                                      "currently empty!")
-                keyboard = wish_kbs.admin_wishlist_kb if wishlist_items else None
-            else:
-                message_text = "⭐ Your wishlist:\n\n" if wishlist_items else ("Your wishlist is empty. "
-                                                                              "Add a book you'd like to read! 📘")
-                keyboard = wish_kbs.wishlist_kb if wishlist_items else wish_kbs.add_wishlist_kb
-
-            if wishlist_items:
-                message_text += "\n".join(
-                    [f"📖 {i + 1}. {item.book_title} — {item.author}" for i, item in enumerate(wishlist_items)])
-
-            await message.answer(message_text, reply_markup=keyboard)
+async def wishlist_handler(message: Message, identity: AppUserIdentity, session: AsyncSession):
+    wishlist_items = await WishlistObj().read(session=session, app_user_id=identity.app_user_id)
+
+    if identity.is_registered:
+        if identity.is_admin:
+            message_text = "⭐ List of all wishlists:\n\n" if wishlist_items else ("📭 The wishlist is "
+                                                                                  "currently empty!")
+            keyboard = wish_kbs.admin_wishlist_kb if wishlist_items else None
         else:
-            await cmd_start(message)
+            message_text = "⭐ Your wishlist:\n\n" if wishlist_items else ("Your wishlist is empty. "
+                                                                          "Add a book you'd like to read! 📘")
+            keyboard = wish_kbs.wishlist_kb if wishlist_items else wish_kbs.add_wishlist_kb
+
+        if wishlist_items:
+            message_text += "\n".join(
+                [f"📖 {i + 1}. {item.book_title} — {item.author}" for i, item in enumerate(wishlist_items)])
+
+        await message.answer(message_text, reply_markup=keyboard)
+    else:
+        await cmd_start(message)
 
 
 # region Create Wishlist Logic
@@ -67,20 +61,18 @@ async def wish_author(message: Message, state: FSMContext):
 
 
 @router.message(Wish.comment)
-async def wish_comment(message: Message, state: FSMContext):
+async def wish_comment(message: Message, state: FSMContext, identity: AppUserIdentity, session: AsyncSession):
     data = await state.get_data()
 
     comment = None if message.text == "-" else message.text
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(message.from_user.id))
-        success = await WishlistObj().create(
-            session=session,
-            app_user_id=app_user_id,
-            book_title=data.get('book_title'),
-            author=data.get('author'),
-            comment=comment
-        )
+    success = await WishlistObj().create(
+        session=session,
+        app_user_id=identity.app_user_id,
+        book_title=data.get('book_title'),
+        author=data.get('author'),
+        comment=comment
+    )
     
     if success:
         await message.answer(
@@ -99,13 +91,11 @@ async def wish_comment(message: Message, state: FSMContext):
 
 # region Common Read, Update, Delete Logic
 @router.callback_query(F.data.startswith("wishlist-"))
-async def action_wishlist(callback: CallbackQuery):
+async def action_wishlist(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
     await callback.answer()
+    is_admin = identity.is_admin
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        wishlist_items = await WishlistObj().read(session=session, app_user_id=app_user_id)
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
+    wishlist_items = await WishlistObj().read(session=session, app_user_id=identity.app_user_id)
 
     action = callback.data.split("-")[1]
     message_text = ""
@@ -125,21 +115,19 @@ async def action_wishlist(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("wishlist_"))
-async def action_wish_id(callback: CallbackQuery, state: FSMContext):
+async def action_wish_id(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity, session: AsyncSession):
     await callback.answer()
 
     _, action, wish_id = callback.data.split("_")
+    is_admin = identity.is_admin
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
+    wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
 
-        if wishlist_item:
-            comment, book_title, author = wishlist_item.comment, wishlist_item.book_title, wishlist_item.author
-            created_at = wishlist_item.created_at
+    if wishlist_item:
+        comment, book_title, author = wishlist_item.comment, wishlist_item.book_title, wishlist_item.author
+        created_at = wishlist_item.created_at
 
-        app_user_full_name = await AppUserObj().get_employee_fullname(session=session, app_user_id=app_user_id)
+    app_user_full_name = identity.full_name
 
     message_text = ""
     keyboard = None
@@ -186,16 +174,15 @@ async def wish_book_title(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(WishUpdBookTitle.book_title)
-async def upd_wish_book_title(message: Message, state: FSMContext):
+async def upd_wish_book_title(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
     wish_id = data.get('wish_id')
 
-    async with async_session_factory() as session:
-        wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
-        if wishlist_item:
-            book_title = wishlist_item.book_title
-        success = await WishlistObj().update(session=session, field="book_title",
-                                             wish_id=wish_id, new_value=message.text)
+    wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
+    if wishlist_item:
+        book_title = wishlist_item.book_title
+    success = await WishlistObj().update(session=session, field="book_title",
+                                         wish_id=wish_id, new_value=message.text)
 
     keyboard = await wish_kbs.back_to_wishlist_upd_kb(wish_id)
     
@@ -219,16 +206,15 @@ async def wish_author(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(WishUpdAuthor.author)
-async def upd_wish_author(message: Message, state: FSMContext):
+async def upd_wish_author(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
     wish_id = data.get('wish_id')
 
-    async with async_session_factory() as session:
-        wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
-        if wishlist_item:
-            book_title = wishlist_item.book_title
-        success = await WishlistObj().update(session=session, field="author",
-                                             wish_id=wish_id, new_value=message.text)
+    wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
+    if wishlist_item:
+        book_title = wishlist_item.book_title
+    success = await WishlistObj().update(session=session, field="author",
+                                         wish_id=wish_id, new_value=message.text)
 
     keyboard = await wish_kbs.back_to_wishlist_upd_kb(wish_id)
     
@@ -252,19 +238,18 @@ async def wish_comment(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(WishUpdComment.comment)
-async def upd_wish_comment(message: Message, state: FSMContext):
+async def upd_wish_comment(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
     wish_id = data.get('wish_id')
 
     new_comment = None if message.text == '-' else message.text
     keyboard = await wish_kbs.back_to_wishlist_upd_kb(wish_id)
 
-    async with async_session_factory() as session:
-        wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
-        if wishlist_item:
-            book_title = wishlist_item.book_title
-        success = await WishlistObj().update(session=session, field="comment",
-                                             wish_id=wish_id, new_value=new_comment)
+    wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
+    if wishlist_item:
+        book_title = wishlist_item.book_title
+    success = await WishlistObj().update(session=session, field="comment",
+                                         wish_id=wish_id, new_value=new_comment)
     
     if success:
         if new_comment is None:
@@ -289,17 +274,15 @@ async def upd_wish_comment(message: Message, state: FSMContext):
 
 # region Delete Logic
 @router.callback_query(F.data.startswith("wish_confirm_"))
-async def remove_wish_id(callback: CallbackQuery):
+async def remove_wish_id(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
     await callback.answer()
     wish_id = UUID(callback.data.split("_")[2])
+    is_admin = identity.is_admin
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
-        if wishlist_item:
-            book_title = wishlist_item.book_title
-        success = await WishlistObj().remove(session=session, wish_id=wish_id)
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
+    wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
+    if wishlist_item:
+        book_title = wishlist_item.book_title
+    success = await WishlistObj().remove(session=session, wish_id=wish_id)
 
     message_text = (
         f"🗑 <b>\"{book_title}\"</b> has been deleted from "
@@ -313,15 +296,13 @@ async def remove_wish_id(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("wish_cancel_"))
-async def remove_wish_id(callback: CallbackQuery):
+async def remove_wish_id(callback: CallbackQuery, identity: AppUserIdentity, session: AsyncSession):
     wish_id = UUID(callback.data.split("_")[2])
+    is_admin = identity.is_admin
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
-        if wishlist_item:
-            book_title = wishlist_item.book_title
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
+    wishlist_item = await WishlistObj().get_obj(session=session, wish_id=wish_id)
+    if wishlist_item:
+        book_title = wishlist_item.book_title
 
     await callback.message.edit_text(
         f"❌ Action canceled. The <b>\"{book_title}\"</b> remains in "
@@ -332,28 +313,26 @@ async def remove_wish_id(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "back_to_wishlist")
-async def back_to_wishlist(callback: CallbackQuery, state: FSMContext):
+async def back_to_wishlist(callback: CallbackQuery, state: FSMContext, identity: AppUserIdentity,
+                           session: AsyncSession):
     await callback.answer()
     await state.clear()
 
-    async with async_session_factory() as session:
-        app_user_id = await AppUserObj().get_app_user_id(session=session, telegram_id=str(callback.from_user.id))
-        wishlist_items = await WishlistObj().read(session=session, app_user_id=app_user_id)
-        is_admin = await AppUserObj().is_admin(session=session, app_user_id=app_user_id)
+    wishlist_items = await WishlistObj().read(session=session, app_user_id=identity.app_user_id)
 
-        if is_admin:
-            text = "⭐ List of all wishlists:\n\n" if wishlist_items else "📭 The wishlist is currently empty!"
-            keyboard = wish_kbs.admin_wishlist_kb if wishlist_items else None
-        else:
-            text = "⭐ Your wishlist:\n\n" if wishlist_items else ("Your wishlist is empty. "
-                                                                  "Add a book you'd like to read! 📘")
-            keyboard = wish_kbs.wishlist_kb if wishlist_items else wish_kbs.add_wishlist_kb
+    if identity.is_admin:
+        text = "⭐ List of all wishlists:\n\n" if wishlist_items else "📭 The wishlist is currently empty!"
+        keyboard = wish_kbs.admin_wishlist_kb if wishlist_items else None
+    else:
+        text = "⭐ Your wishlist:\n\n" if wishlist_items else ("Your wishlist is empty. "
+                                                              "Add a book you'd like to read! 📘")
+        keyboard = wish_kbs.wishlist_kb if wishlist_items else wish_kbs.add_wishlist_kb
 
-        if wishlist_items:
-            text += "\n".join([f"📖 {i + 1}. {item.book_title} — "
-                               f"{item.author}" for i, item in enumerate(wishlist_items)])
+    if wishlist_items:
+        text += "\n".join([f"📖 {i + 1}. {item.book_title} — "
+                           f"{item.author}" for i, item in enumerate(wishlist_items)])
 
-        await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.message.edit_text(text, reply_markup=keyboard)
 
 
 @router.callback_query(F.data == "close_menu")
@@ -0,0 +1,20 @@
+import zlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+
+@asynccontextmanager
+async def job_lock(session_factory: async_sessionmaker, name: str) -> AsyncIterator[bool]:
+    """Transaction-scoped advisory lock so a job runs on one replica at a time.
+
+    Yields False when another replica holds the lock. The lock is released when the block exits.
+    """
+    async with session_factory() as session:
+        acquired = await session.scalar(select(func.pg_try_advisory_xact_lock(zlib.crc32(name.encode()))))
+        try:
+            yield bool(acquired)
+        finally:
+            await session.rollback()
@@ -0,0 +1,83 @@
+import logging
+from datetime import timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.models import OrderStatus
+from db.queries.order_reminder_crud import OrderReminderObj, OverdueDigest
+from jobs.locks import job_lock
+from middlewares.rate_limit import bulk_sending
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096
+MORE_LINE_ROOM = 32
+
+
+def format_digest(digest: OverdueDigest) -> str:
+    lines = ["⏰ Reminder about your books:"]
+    length = _message_length(lines[0])
+    for index, order in enumerate(digest.orders):
+        date = order.created_at.strftime('%d.%m.%Y')
+        if order.status == OrderStatus.RESERVED:
+            line = f"📌 {order.title} — reserved on {date}, please pick it up or cancel the reservation"
+        else:
+            line = f"📖 {order.title} — taken on {date}, please return it"
+
+        length += _message_length(line) + 2
+        if length > MESSAGE_LIMIT - MORE_LINE_ROOM:
+            lines.append(f"➕ {len(digest.orders) - index} more")
+            break
+        lines.append(line)
+    return "\n\n".join(lines)
+
+
+def _message_length(text: str) -> int:
+    # Telegram counts message length in UTF-16 code units
+    return len(text.encode('utf-16-le')) // 2
+
+
+async def send_overdue_reminders(bot: Bot, session_factory: async_sessionmaker, reserved_for: timedelta,
+                                 loan_period: timedelta, repeat_every: timedelta, batch_size: int = 500) -> int:
+    async with job_lock(session_factory, 'overdue_reminders') as acquired:
+        if not acquired:
+            return 0
+
+        sent = 0
+        after = None
+        while True:
+            # No connection is held while the messages are sent
+            async with session_factory() as session:
+                digests = await OrderReminderObj.read_due(
+                    session=session, reserved_for=reserved_for, loan_period=loan_period,
+                    repeat_every=repeat_every, limit=batch_size, after=after,
+                )
+            if not digests:
+                break
+            # Users whose digest failed stay due for the next run but are skipped for the rest of this one
+            after = digests[-1].telegram_id
+
+            orders = []
+            with bulk_sending():
+                for digest in digests:
+                    try:
+                        await bot.send_message(chat_id=digest.telegram_id, text=format_digest(digest))
+                        sent += 1
+                    except (TelegramBadRequest, TelegramForbiddenError) as e:
+                        logger.warning(f"Could not send overdue reminder to {digest.telegram_id}: {e}")
+                    except TelegramAPIError as e:
+                        logger.error(f"Error while sending overdue reminder to {digest.telegram_id}: {e}")
+                        continue
+                    # Undeliverable digests are recorded too, so they are not retried until repeat_every passes
+                    orders.extend(digest.orders)
+
+            if orders:
+                async with session_factory() as session:
+                    if not await OrderReminderObj().create(session=session, orders=orders):
+                        break
+
+        if sent:
+            logger.info(f"Sent {sent} overdue reminders")
+        return sent
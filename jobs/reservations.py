@@ -0,0 +1,53 @@
+import logging
+from datetime import timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.queries.order_crud import OrderObj, ExpiredReservations
+from jobs.locks import job_lock
+from middlewares.rate_limit import bulk_sending
+
+logger = logging.getLogger(__name__)
+
+
+def format_expired(expired: ExpiredReservations) -> str:
+    titles = "\n".join(f"📕 {title}" for title in expired.titles)
+    return f"⌛ Your reservation has expired and was cancelled:\n\n{titles}"
+
+
+async def expire_stale_reservations(bot: Bot, session_factory: async_sessionmaker, ttl: timedelta,
+                                    batch_size: int = 500) -> int:
+    async with job_lock(session_factory, 'expire_reservations') as acquired:
+        if not acquired:
+            return 0
+
+        cancelled = 0
+        async with session_factory() as session:
+            while True:
+                batch = await OrderObj.expire_reservations(session=session, older_than=ttl, limit=batch_size)
+                if not batch:
+                    break
+
+                count = sum(len(expired.titles) for expired in batch)
+                cancelled += count
+
+                with bulk_sending():
+                    for expired in batch:
+                        if expired.telegram_id is None:
+                            continue
+                        try:
+                            await bot.send_message(chat_id=expired.telegram_id, text=format_expired(expired))
+                        except (TelegramBadRequest, TelegramForbiddenError) as e:
+                            logger.warning(f"Could not notify {expired.telegram_id} about expired reservations: {e}")
+                        except TelegramAPIError as e:
+                            # The reservations are already cancelled, so the rest of the batch is still notified
+                            logger.error(f"Error while notifying {expired.telegram_id} about expired reservations: {e}")
+
+                if count < batch_size:
+                    break
+
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} expired reservations")
+        return cancelled
@@ -0,0 +1,46 @@
+import os
+from datetime import timedelta
+
+from aiogram import Bot
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from jobs.reminders import send_overdue_reminders
+from jobs.reservations import expire_stale_reservations
+
+load_dotenv()
+
+
+def create_scheduler(bot: Bot, session_factory: async_sessionmaker) -> AsyncIOScheduler:
+    scheduler = AsyncIOScheduler()
+
+    reminder_interval = float(os.getenv('REMINDER_INTERVAL_MINUTES', 60))
+    if reminder_interval > 0:
+        scheduler.add_job(
+            send_overdue_reminders, 'interval', minutes=reminder_interval,
+            id='overdue_reminders', max_instances=1, coalesce=True,
+            kwargs={
+                'bot': bot,
+                'session_factory': session_factory,
+                'reserved_for': timedelta(hours=float(os.getenv('RESERVATION_REMINDER_HOURS', 24))),
+                'loan_period': timedelta(days=float(os.getenv('LOAN_PERIOD_DAYS', 14))),
+                'repeat_every': timedelta(days=float(os.getenv('REMINDER_REPEAT_DAYS', 3))),
+                'batch_size': int(os.getenv('REMINDER_BATCH_SIZE', 500)),
+            },
+        )
+
+    expiry_interval = float(os.getenv('RESERVATION_EXPIRY_INTERVAL_MINUTES', 15))
+    if expiry_interval > 0:
+        scheduler.add_job(
+            expire_stale_reservations, 'interval', minutes=expiry_interval,
+            id='expire_reservations', max_instances=1, coalesce=True,
+            kwargs={
+                'bot': bot,
+                'session_factory': session_factory,
+                'ttl': timedelta(hours=float(os.getenv('RESERVATION_TTL_HOURS', 72))),
+                'batch_size': int(os.getenv('RESERVATION_EXPIRY_BATCH_SIZE', 500)),
+            },
+        )
+
+    return scheduler
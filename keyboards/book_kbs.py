@@ -1,10 +1,11 @@
-from math import ceil
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, KeyboardButton, ReplyKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from uuid6 import UUID
 
-from db.database import async_session_factory
-from db.queries.app_user_crud import AppUserObj
+from db.models import Category
+from db.queries.app_user_crud import OwnerOption
+
+OWNER_QUERY_PREFIX = "owner "
 
 book_confirmation_kb = InlineKeyboardMarkup(
     inline_keyboard=[
@@ -22,7 +23,8 @@ books_kb = InlineKeyboardMarkup(
         [InlineKeyboardButton(text="✏️ Update a book", callback_data="update_book"),
          InlineKeyboardButton(text="🗑 Remove a book", callback_data="remove_book")],
         [InlineKeyboardButton(text="🔳 Show QR", callback_data="qrcode_book"),
-         InlineKeyboardButton(text="❌ Close Menu", callback_data="close_menu")]
+         InlineKeyboardButton(text="🏷 Categories", callback_data="browse_categories")],
+        [InlineKeyboardButton(text="❌ Close Menu", callback_data="close_menu")]
     ]
 )
 
@@ -45,6 +47,9 @@ user_book_kb = InlineKeyboardMarkup(
     inline_keyboard=[
         [
             InlineKeyboardButton(text="ℹ️ Show details", callback_data="book_detail"),
+            InlineKeyboardButton(text="🏷 Categories", callback_data="browse_categories"),
+        ],
+        [
             InlineKeyboardButton(text="❌ Close Menu", callback_data="close_menu"),
         ]
     ]
@@ -60,25 +65,36 @@ def category_kb(result: list) -> ReplyKeyboardMarkup:
     return keyboard
 
 
-def book_list_kb(books: list, action: str, page: int = 1, per_page: int = 5) -> InlineKeyboardMarkup:
-    total_pages = ceil(len(books) / per_page)
-    start_idx = (page - 1) * per_page
-    end_idx = min(start_idx + per_page, len(books))
-    books_page = books[start_idx:end_idx]
+def browse_categories_kb(counts: dict[Category, int], selected: list[Category]) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+
+    for category in Category:
+        if counts.get(category):
+            mark = "✅ " if category in selected else ""
+            builder.button(
+                text=f"{mark}{category.value} ({counts[category]})", callback_data=f"browse_cat_{category.name}"
+            )
+    builder.adjust(2)
+
+    builder.row(
+        InlineKeyboardButton(text="📚 Show books", callback_data="browse_show"),
+        InlineKeyboardButton(text="⬅️ Go back", callback_data="back_button"),
+    )
+    return builder.as_markup()
 
+
+def book_list_kb(books: list, action: str, has_prev: bool = False, has_next: bool = False) -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(
-                text=f'{index + 1}: {book.title}', callback_data=f"{action}_select_{book.id}"
-            )] for index, book in enumerate(books_page)
+            [InlineKeyboardButton(text=book.title, callback_data=f"{action}_select_{book.id}")] for book in books
         ]
     )
 
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(text="⬅ Previous", callback_data=f"{action}_page_{page - 1}"))
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(text="Next ➡", callback_data=f"{action}_page_{page + 1}"))
+    if has_prev and books:
+        nav_buttons.append(InlineKeyboardButton(text="⬅ Previous", callback_data=f"{action}_page_p_{books[0].id}"))
+    if has_next and books:
+        nav_buttons.append(InlineKeyboardButton(text="Next ➡", callback_data=f"{action}_page_n_{books[-1].id}"))
 
     if nav_buttons:
         keyboard.inline_keyboard.append(nav_buttons)
@@ -132,18 +148,31 @@ def order_cancel_kb(book_id: UUID, is_admin: False) -> InlineKeyboardMarkup:
     return keyboard
 
 
-async def owners_kb(result: list, action: str) -> InlineKeyboardMarkup:
+def owners_kb(owners: list[OwnerOption], action: str, has_prev: bool = False,
+              has_next: bool = False) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    async with async_session_factory() as session:
-        for user in result:
-            fullname = await AppUserObj().get_employee_fullname(session=session, app_user_id=user.id)
-            builder.button(
-                text=fullname,
-                callback_data=f"select_owner_{action}:{user.id}"
-            )
+    for owner in owners:
+        builder.button(
+            text=owner.full_name,
+            callback_data=f"select_owner_{action}:{owner.app_user_id}"
+        )
+    builder.adjust(2)
+
+    nav_buttons = []
+    if has_prev and owners:
+        nav_buttons.append(InlineKeyboardButton(
+            text="⬅ Previous", callback_data=f"owners_{action}_page_p_{owners[0].app_user_id}"
+        ))
+    if has_next and owners:
+        nav_buttons.append(InlineKeyboardButton(
+            text="Next ➡", callback_data=f"owners_{action}_page_n_{owners[-1].app_user_id}"
+        ))
+    if nav_buttons:
+        builder.row(*nav_buttons)
+    builder.row(InlineKeyboardButton(text="🔍 Search", switch_inline_query_current_chat=OWNER_QUERY_PREFIX))
 
-    return builder.adjust(2).as_markup()
+    return builder.as_markup()
 
 
 def create_book_kb() -> InlineKeyboardMarkup:
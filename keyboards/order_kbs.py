@@ -1,7 +1,9 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from uuid6 import UUID
 
 from db.models import OrderStatus
+from db.queries.order_crud import OrderRow, AdminOrderRow
 
 no_order_kb = InlineKeyboardMarkup(
     inline_keyboard=[
@@ -21,6 +23,12 @@ back_to_order_kb = InlineKeyboardMarkup(
     ]
 )
 
+back_to_admin_orders_kb = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="⬅️ Go back", callback_data="admin_orders_back")]
+    ]
+)
+
 
 async def get_order_kb(has_reserved_orders: bool) -> InlineKeyboardMarkup:
     if has_reserved_orders:
@@ -40,20 +48,20 @@ async def get_order_kb(has_reserved_orders: bool) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-async def action_order_kb(action: str, orders: list) -> InlineKeyboardMarkup:
+async def action_order_kb(action: str, orders: list[OrderRow]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     if action == 'cancel':
         for order in orders:
             if order.status == OrderStatus.RESERVED:
                 builder.add(InlineKeyboardButton(
-                    text=f"{order.book.title}",
+                    text=f"{order.title}",
                     callback_data=f"order_{action}_{order.id}"
                 ))
     elif action == 'detail':
         for order in orders:
             builder.add(InlineKeyboardButton(
-                text=f"{order.book.title}",
+                text=f"{order.title}",
                 callback_data=f"order_{action}_{order.id}"
             ))
 
@@ -61,13 +69,13 @@ async def action_order_kb(action: str, orders: list) -> InlineKeyboardMarkup:
     return builder.adjust(1).as_markup()
 
 
-async def return_order_kb(orders: list):
+async def return_order_kb(orders: list[OrderRow]):
     builder = InlineKeyboardBuilder()
 
     for order in orders:
         if order.status == OrderStatus.IN_PROCESS:
             builder.add(InlineKeyboardButton(
-                text=f"{order.book.title}",
+                text=f"{order.title}",
                 callback_data=f"order_return_{order.id}"
             ))
 
@@ -79,3 +87,43 @@ async def confirm_return_kb(location_id: int):
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="↩️ Return a book", callback_data=f"return_book_{location_id}")]
     ])
+
+
+async def admin_orders_kb(orders: list[AdminOrderRow], status: OrderStatus | None = None, has_prev: bool = False,
+                          has_next: bool = False) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+
+    for order in orders:
+        builder.row(InlineKeyboardButton(text=f"{order.title}", callback_data=f"admin_order_detail_{order.id}"))
+
+    nav_buttons = []
+    if has_prev and orders:
+        nav_buttons.append(
+            InlineKeyboardButton(text="⬅ Previous", callback_data=f"admin_orders_page_p_{orders[0].id}")
+        )
+    if has_next and orders:
+        nav_buttons.append(
+            InlineKeyboardButton(text="Next ➡", callback_data=f"admin_orders_page_n_{orders[-1].id}")
+        )
+    if nav_buttons:
+        builder.row(*nav_buttons)
+
+    builder.row(*(
+        InlineKeyboardButton(
+            text=f"{'• ' if option == status else ''}{option.value if option else 'All'}",
+            callback_data=f"admin_orders_status_{option.name if option else 'ALL'}"
+        )
+        for option in (None, *OrderStatus)
+    ), width=3)
+
+    builder.row(InlineKeyboardButton(text="👤 My orders", callback_data="back_to_order"))
+    builder.row(InlineKeyboardButton(text="❌ Close Menu", callback_data="close_menu"))
+    return builder.as_markup()
+
+
+async def admin_order_detail_kb(order_id: UUID, status: OrderStatus) -> InlineKeyboardMarkup:
+    buttons = []
+    if status == OrderStatus.RESERVED:
+        buttons.append([InlineKeyboardButton(text="🚫 Cancel order", callback_data=f"admin_order_cancel_{order_id}")])
+    buttons.append([InlineKeyboardButton(text="⬅️ Go back", callback_data="admin_orders_back")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -0,0 +1,39 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import async_session_factory
+from db.queries.app_user_crud import AppUserObj, AppUserIdentity, ANONYMOUS, identity_cache
+
+
+class IdentityMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        data['identity'] = await self.resolve(str(user.id), data.get('session')) if user else ANONYMOUS
+        return await handler(event, data)
+
+    @staticmethod
+    async def resolve(telegram_id: str, session: AsyncSession | None = None) -> AppUserIdentity:
+        identity = identity_cache.get(telegram_id)
+        if identity is not None:
+            return identity
+
+        if session is None:
+            async with async_session_factory() as session:
+                identity = await AppUserObj.resolve_by_telegram_id(session=session, telegram_id=telegram_id)
+        else:
+            identity = await AppUserObj.resolve_by_telegram_id(session=session, telegram_id=telegram_id)
+
+        if identity is None:
+            return ANONYMOUS
+
+        identity_cache.set(telegram_id, identity)
+        return identity
+
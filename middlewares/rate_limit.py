@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+
+_priority: ContextVar[int] = ContextVar('outbound_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_sending() -> Iterator[None]:
+    """Send everything inside the block through the bulk lane, behind interactive replies."""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, timer: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.timer = timer
+        self.tokens = capacity
+        self.updated = timer()
+
+    def _refill(self) -> None:
+        now = self.timer()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self) -> float:
+        """Take a token, possibly borrowing from the future, and return how long to wait before using it."""
+        wait = self.wait_time()
+        self.tokens -= 1
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class LimiterStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.sent = 0
+        self.throttled = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.sent += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+        if seconds > 0.001:
+            self.throttled += 1
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Bot session middleware keeping outgoing chat requests under Telegram's global and per-chat limits.
+
+    Requests without a chat_id (getUpdates, answerCallbackQuery, ...) pass through untouched.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        max_retries: int = 3,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate, timer)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.timer = timer
+        self.stats = LimiterStats()
+        self._chat_buckets: dict[int | str, TokenBucket] = {}
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump_task: asyncio.Task | None = None
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.stats.retries += 1
+                logger.warning(f"Telegram flood control on {type(method).__name__} in chat {chat_id}, "
+                               f"retrying in {e.retry_after}s")
+                self._chat_bucket(chat_id).pause(e.retry_after)
+
+    async def acquire(self, chat_id: int | str) -> None:
+        started = self.timer()
+
+        wait = self._chat_bucket(chat_id).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (_priority.get(), next(self._sequence), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+        self.stats.record_wait(self.timer() - started)
+
+    async def _pump(self) -> None:
+        while self._waiters:
+            wait = self.global_bucket.wait_time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.global_bucket.reserve()
+            future.set_result(None)
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= 10000:
+                self._chat_buckets = {key: value for key, value in self._chat_buckets.items() if not value.is_full()}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, self.timer)
+        return bucket
+
+    def status(self) -> dict:
+        stats = self.stats
+        return {
+            'queued_interactive': sum(1 for waiter in self._waiters if waiter[0] == INTERACTIVE),
+            'queued_bulk': sum(1 for waiter in self._waiters if waiter[0] == BULK),
+            'sent': stats.sent,
+            'throttled': stats.throttled,
+            'retries': stats.retries,
+            'avg_wait_ms': stats.total_wait / stats.sent * 1000 if stats.sent else 0.0,
+            'max_wait_ms': stats.max_wait * 1000,
+        }
+
+
+async def log_rate_limit_stats(middleware: RateLimitMiddleware, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        status = middleware.status()
+        logger.info(
+            f"Outbound: sent={status['sent']} throttled={status['throttled']} retries={status['retries']} "
+            f"queued_interactive={status['queued_interactive']} queued_bulk={status['queued_bulk']} "
+            f"avg_wait={status['avg_wait_ms']:.1f}ms max_wait={status['max_wait_ms']:.1f}ms"
+        )
+        middleware.stats.reset()
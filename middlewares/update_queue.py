@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class QueueStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.processed = 0
+        self.dropped = 0
+        self.superseded = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_depth = 0
+
+    def record_wait(self, seconds: float) -> None:
+        self.processed += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+
+class _UserQueue:
+    __slots__ = ('lock', 'depth', 'latest_inline')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+        self.latest_inline: int | None = None
+
+
+class UpdateQueueMiddleware(BaseMiddleware):
+    """Caps in-flight updates globally and runs each user's updates one at a time, in arrival order.
+
+    Inline queries are debounced: a queued inline query is skipped once a newer one from the same user arrives.
+    """
+
+    def __init__(self, max_concurrency: int, max_user_queue: int = 10):
+        self.max_concurrency = max_concurrency
+        self.max_user_queue = max_user_queue
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.stats = QueueStats()
+        self.in_flight = 0
+        self.waiting = 0
+        self._queues: dict[int, _UserQueue] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        chat = data.get('event_chat')
+        key = user.id if user else chat.id if chat else None
+        if key is None:
+            return await self._run(handler, event, data, time.perf_counter())
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _UserQueue()
+        if queue.depth >= self.max_user_queue:
+            self.stats.dropped += 1
+            logger.warning(f"Dropped update for {key}: {queue.depth} updates already queued")
+            return None
+
+        inline = getattr(event, 'inline_query', None) is not None
+        if inline:
+            queue.latest_inline = event.update_id
+
+        queue.depth += 1
+        self.stats.max_depth = max(self.stats.max_depth, queue.depth)
+        started = time.perf_counter()
+        try:
+            async with queue.lock:
+                if inline and queue.latest_inline != event.update_id:
+                    self.stats.superseded += 1
+                    return None
+                return await self._run(handler, event, data, started)
+        finally:
+            queue.depth -= 1
+            if not queue.depth:
+                del self._queues[key]
+
+    async def _run(self, handler, event: TelegramObject, data: dict[str, Any], started: float) -> Any:
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.stats.record_wait(time.perf_counter() - started)
+        self.in_flight += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def status(self) -> dict:
+        stats = self.stats
+        return {
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'queued_users': len(self._queues),
+            'queued_updates': sum(queue.depth for queue in self._queues.values()),
+            'processed': stats.processed,
+            'dropped': stats.dropped,
+            'superseded': stats.superseded,
+            'max_user_depth': stats.max_depth,
+            'avg_wait_ms': stats.total_wait / stats.processed * 1000 if stats.processed else 0.0,
+            'max_wait_ms': stats.max_wait * 1000,
+        }
+
+
+async def log_queue_stats(middleware: UpdateQueueMiddleware, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        status = middleware.status()
+        logger.info(
+            f"Updates: in_flight={status['in_flight']} waiting={status['waiting']} "
+            f"queued_updates={status['queued_updates']} processed={status['processed']} "
+            f"dropped={status['dropped']} superseded={status['superseded']} max_user_depth={status['max_user_depth']} "
+            f"avg_wait={status['avg_wait_ms']:.1f}ms max_wait={status['max_wait_ms']:.1f}ms"
+        )
+        middleware.stats.reset()
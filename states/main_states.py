@@ -41,6 +41,7 @@ class Books(StatesGroup):
     waiting_for_confirmation = State()
     location = State()
     owner = State()
+    owner_search = State()
     save_book = State()
     delete_book = State()
 
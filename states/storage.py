@@ -0,0 +1,222 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import timedelta
+from typing import Any, Callable
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType, DEFAULT_DESTINY
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from uuid6 import UUID
+
+from db.database import current_session
+from db.models import FsmStates
+
+logger = logging.getLogger(__name__)
+
+Record = tuple[str | None, dict[str, Any]]
+
+
+def storage_key(key: StorageKey) -> str:
+    parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+    if key.thread_id or key.business_connection_id or key.destiny != DEFAULT_DESTINY:
+        parts += [str(key.thread_id or ''), key.business_connection_id or '', key.destiny]
+    return ':'.join(parts)
+
+
+def encode_data(data: dict[str, Any]) -> bytes | None:
+    if not data:
+        return None
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_encode_value).encode()
+
+
+def decode_data(raw: bytes | None) -> dict[str, Any]:
+    if not raw:
+        return {}
+    return json.loads(raw, object_hook=_decode_object)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return {'$u': value.hex}
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not FSM data serializable")
+
+
+def _decode_object(obj: dict[str, Any]) -> Any:
+    if len(obj) == 1 and '$u' in obj:
+        return UUID(hex=obj['$u'])
+    return obj
+
+
+class PostgresStateBackend:
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def load(self, key: str, ttl: float) -> Record | None:
+        query = select(FsmStates.state, FsmStates.data).where(
+            FsmStates.key == key,
+            FsmStates.updated_at > func.now() - timedelta(seconds=ttl),
+        )
+        # Within an update, read through its session instead of checking out a second connection
+        session = current_session.get()
+        if session is None:
+            async with self.session_factory() as session:
+                row = (await session.execute(query)).one_or_none()
+        else:
+            row = (await session.execute(query)).one_or_none()
+        if row is None:
+            return None
+        return row.state, decode_data(row.data)
+
+    async def save(self, records: dict[str, Record]) -> None:
+        rows = [
+            {'key': key, 'state': state, 'data': encode_data(data)}
+            for key, (state, data) in records.items() if state is not None or data
+        ]
+        empty = [key for key, (state, data) in records.items() if state is None and not data]
+
+        async with self.session_factory() as session:
+            if rows:
+                query = insert(FsmStates).values(rows)
+                query = query.on_conflict_do_update(
+                    index_elements=[FsmStates.key],
+                    set_={'state': query.excluded.state, 'data': query.excluded.data, 'updated_at': func.now()},
+                )
+                await session.execute(query)
+            if empty:
+                await session.execute(delete(FsmStates).where(FsmStates.key.in_(empty)))
+            await session.commit()
+
+    async def delete_expired(self, ttl: float) -> int:
+        query = delete(FsmStates).where(
+            FsmStates.updated_at <= func.now() - timedelta(seconds=ttl)
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(query)
+            await session.commit()
+        return result.rowcount
+
+
+class MemoryStateBackend:
+    """In-process stand-in for PostgresStateBackend, used by tests and local runs."""
+
+    def __init__(self, timer: Callable[[], float] = time.monotonic):
+        self.timer = timer
+        self.rows: dict[str, tuple[str | None, bytes | None, float]] = {}
+        self.writes = 0
+
+    async def load(self, key: str, ttl: float) -> Record | None:
+        row = self.rows.get(key)
+        if row is None or row[2] <= self.timer() - ttl:
+            return None
+        return row[0], decode_data(row[1])
+
+    async def save(self, records: dict[str, Record]) -> None:
+        self.writes += 1
+        for key, (state, data) in records.items():
+            if state is None and not data:
+                self.rows.pop(key, None)
+            else:
+                self.rows[key] = (state, encode_data(data), self.timer())
+
+    async def delete_expired(self, ttl: float) -> int:
+        expired = [key for key, row in self.rows.items() if row[2] <= self.timer() - ttl]
+        for key in expired:
+            del self.rows[key]
+        return len(expired)
+
+
+class BufferedStorage(BaseStorage):
+    """FSM storage that coalesces writes made within flush_delay into one backend round trip.
+
+    Pending writes are served from memory, so the replica that made them always reads its own writes.
+    """
+
+    def __init__(self, backend, flush_delay: float = 0.05, ttl: float = 86400):
+        self.backend = backend
+        self.flush_delay = flush_delay
+        self.ttl = ttl
+        self._pending: dict[str, Record] = {}
+        self._flushing: dict[str, Record] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_task: asyncio.Task | None = None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data = await self._read(storage_key(key))
+        await self._write(storage_key(key), state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = await self._read(storage_key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        state, _ = await self._read(storage_key(key))
+        await self._write(storage_key(key), state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = await self._read(storage_key(key))
+        return dict(data)
+
+    async def flush(self) -> None:
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            try:
+                await self.backend.save(self._flushing)
+            except SQLAlchemyError as e:
+                logger.error(f"Error while saving {len(self._flushing)} FSM states: {e}")
+                self._pending = {**self._flushing, **self._pending}
+                self._schedule_flush(max(self.flush_delay, 1))
+            finally:
+                self._flushing = {}
+
+    async def cleanup(self) -> int:
+        try:
+            return await self.backend.delete_expired(self.ttl)
+        except SQLAlchemyError as e:
+            logger.error(f"Error while deleting expired FSM states: {e}")
+            return 0
+
+    async def run_cleanup(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            removed = await self.cleanup()
+            if removed:
+                logger.info(f"Deleted {removed} expired FSM states")
+
+    async def close(self) -> None:
+        await self.flush()
+
+    async def _read(self, key: str) -> Record:
+        for records in (self._pending, self._flushing):
+            if key in records:
+                return records[key]
+        return await self.backend.load(key, self.ttl) or (None, {})
+
+    async def _write(self, key: str, state: str | None, data: dict[str, Any]) -> None:
+        self._pending[key] = (state, data)
+        if self.flush_delay <= 0:
+            await self.flush()
+        else:
+            self._schedule_flush(self.flush_delay)
+
+    def _schedule_flush(self, delay: float) -> None:
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        self._flush_task = asyncio.create_task(self.flush())
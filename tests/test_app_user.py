@@ -5,7 +5,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from uuid6 import uuid7
 
 from db.models import AppUsers, TelegramUsers, Employees, Roles
-from db.queries.app_user_crud import AppUserObj
+from db.queries.app_user_crud import AppUserObj, AppUserIdentity, identity_cache
 
 
 @pytest.mark.asyncio
@@ -221,11 +221,42 @@ async def test_app_user_is_admin(db_session, sample_app_users, mocker):
     invalid_app_user_2 = await AppUserObj().is_admin(session=db_session, app_user_id="")
     assert invalid_app_user_2 is False
 
-    mocker.patch.object(db_session, 'get', side_effect=SQLAlchemyError("DB error"))
-    db_error_app_user = await AppUserObj().is_admin(session=db_session, app_user_id=app_users[0].id)
+    mocker.patch.object(db_session, 'execute', side_effect=SQLAlchemyError("DB error"))
+    db_error_app_user = await AppUserObj().is_admin(session=db_session, app_user_id=app_users[1].id)
     assert db_error_app_user is False
 
 
+@pytest.mark.asyncio
+async def test_app_user_resolve_by_telegram_id(db_session, sample_app_users, mocker):
+    result = await db_session.execute(select(AppUsers).order_by(AppUsers.id))
+    app_users = result.scalars().all()
+    result = await db_session.execute(select(TelegramUsers).order_by(TelegramUsers.id))
+    tg_users = result.scalars().all()
+
+    app_user_1 = await AppUserObj().resolve_by_telegram_id(session=db_session, telegram_id=tg_users[0].telegram_id)
+    app_user_2 = await AppUserObj().resolve_by_telegram_id(session=db_session, telegram_id=tg_users[1].telegram_id)
+    app_user_3 = await AppUserObj().resolve_by_telegram_id(session=db_session, telegram_id="11111")
+
+    assert app_user_1 == AppUserIdentity(app_user_id=app_users[0].id, role="User", full_name="User A",
+                                         is_active=False)
+    assert app_user_2 == AppUserIdentity(app_user_id=app_users[1].id, role="Admin", full_name="Admin",
+                                         is_active=True)
+    assert app_user_1.is_admin is False and app_user_2.is_admin is True
+    assert app_user_3 is None
+
+    # Invalid data
+    invalid_app_user_1 = await AppUserObj().resolve_by_telegram_id(session=db_session, telegram_id=None)
+    assert invalid_app_user_1 is None
+
+    invalid_app_user_2 = await AppUserObj().resolve_by_telegram_id(session=db_session, telegram_id="")
+    assert invalid_app_user_2 is None
+
+    mocker.patch.object(db_session, 'execute', side_effect=SQLAlchemyError("DB error"))
+    db_error_app_user = await AppUserObj().resolve_by_telegram_id(session=db_session,
+                                                                  telegram_id=tg_users[0].telegram_id)
+    assert db_error_app_user is None
+
+
 @pytest.mark.asyncio
 async def test_app_user_get_app_user_id(db_session, sample_app_users, mocker):
     result = await db_session.execute(select(AppUsers).order_by(AppUsers.id))
@@ -283,6 +314,59 @@ async def test_app_user_get_employee_fullname(db_session, sample_app_users, mock
     assert db_error_app_user is None
 
 
+@pytest.mark.asyncio
+async def test_app_user_create_invalidates_identity_cache(db_session, sample_tg_users, sample_employees,
+                                                         sample_roles):
+    result = await db_session.execute(select(TelegramUsers).order_by(TelegramUsers.id))
+    tg_users = result.scalars().all()
+    result = await db_session.execute(select(Employees).order_by(Employees.id))
+    employees = result.scalars().all()
+    result = await db_session.execute(select(Roles).order_by(Roles.id))
+    roles = result.scalars().all()
+
+    telegram_id = tg_users[0].telegram_id
+
+    identity_cache.set(telegram_id, AppUserIdentity(app_user_id=None))
+    await AppUserObj().create(session=db_session, telegram_id=telegram_id,
+                              tg_user_id=tg_users[0].id, employee_id=employees[0].id, role_id=roles[0].id)
+
+    assert telegram_id not in identity_cache
+
+
+@pytest.mark.asyncio
+async def test_app_user_update_role(db_session, sample_app_users, mocker):
+    result = await db_session.execute(select(AppUsers).order_by(AppUsers.id))
+    app_users = result.scalars().all()
+    result = await db_session.execute(select(Roles).order_by(Roles.id))
+    roles = result.scalars().all()
+    app_user_1_id, app_user_2_id = app_users[0].id, app_users[1].id
+    user_role_id, admin_role_id = roles[0].id, roles[1].id
+
+    identity_cache.set("12345", AppUserIdentity(app_user_id=app_user_1_id, role="User"))
+    identity_cache.set("54321", AppUserIdentity(app_user_id=app_user_2_id, role="Admin"))
+
+    app_user_1 = await AppUserObj().update_role(session=db_session, app_user_id=app_user_1_id, role_id=admin_role_id)
+    app_user_2 = await AppUserObj().update_role(session=db_session, app_user_id=uuid7(), role_id=admin_role_id)
+
+    assert app_user_1 is True and app_user_2 is False
+    assert await AppUserObj().is_admin(session=db_session, app_user_id=app_user_1_id) is True
+    assert "12345" not in identity_cache and "54321" in identity_cache
+
+    # Invalid data
+    invalid_app_user_1 = await AppUserObj().update_role(session=db_session, app_user_id=None, role_id=admin_role_id)
+    assert invalid_app_user_1 is False
+
+    invalid_app_user_2 = await AppUserObj().update_role(session=db_session, app_user_id=app_user_1_id, role_id=None)
+    assert invalid_app_user_2 is False
+
+    mocker.patch.object(db_session, 'commit', side_effect=SQLAlchemyError("DB error"))
+    db_error_app_user = await AppUserObj().update_role(session=db_session, app_user_id=app_user_1_id,
+                                                       role_id=user_role_id)
+    assert db_error_app_user is False
+
+    identity_cache.clear()
+
+
 @pytest.mark.asyncio
 async def test_app_user_update():
     app_user = await AppUserObj().update()
@@ -293,3 +377,71 @@ async def test_app_user_update():
 async def test_app_user_remove():
     app_user = await AppUserObj().remove()
     assert app_user is None
+
+
+@pytest.mark.asyncio
+async def test_app_user_read_owner_page(db_session, sample_roles):
+    role_id = await db_session.scalar(select(Roles.id).limit(1))
+    names = ["Dana", "Alex", "Chris", "Alex", "Bea"]
+    for index, name in enumerate(names):
+        tg_user = TelegramUsers(telegram_id=str(index), username=f"user_{index}")
+        employee = Employees(full_name=name, email=f"{index}@example.com")
+        db_session.add_all([tg_user, employee])
+        await db_session.flush()
+        db_session.add(AppUsers(tg_user_id=tg_user.id, employee_id=employee.id, role_id=role_id))
+    await db_session.commit()
+
+    owners, has_prev, has_next = await AppUserObj.read_owner_page(session=db_session, limit=2)
+    assert [owner.full_name for owner in owners] == ["Alex", "Alex"]
+    assert (has_prev, has_next) == (False, True)
+
+    # Owners sharing a name are split across pages without skipping anyone
+    owners, _, _ = await AppUserObj.read_owner_page(session=db_session, limit=1)
+    owners, has_prev, has_next = await AppUserObj.read_owner_page(
+        session=db_session, cursor=owners[-1].app_user_id, limit=3
+    )
+    assert [owner.full_name for owner in owners] == ["Alex", "Bea", "Chris"]
+    assert (has_prev, has_next) == (True, True)
+
+    last_page, has_prev, has_next = await AppUserObj.read_owner_page(
+        session=db_session, cursor=owners[-1].app_user_id, limit=3
+    )
+    assert [owner.full_name for owner in last_page] == ["Dana"]
+    assert (has_prev, has_next) == (True, False)
+
+    owners, has_prev, has_next = await AppUserObj.read_owner_page(
+        session=db_session, cursor=last_page[0].app_user_id, limit=3, backward=True
+    )
+    assert [owner.full_name for owner in owners] == ["Alex", "Bea", "Chris"]
+    assert (has_prev, has_next) == (True, True)
+
+    assert await AppUserObj.read_owner_page(session=db_session, limit=0) == ([], False, False)
+
+
+@pytest.mark.asyncio
+async def test_app_user_search_owners(db_session, sample_roles):
+    role_id = await db_session.scalar(select(Roles.id).limit(1))
+    people = [("Dana Smith", "dana@example.com"), ("alex_b", "bravo@example.com"), ("Alexa", "a100%@example.com"),
+              ("Chris", "alpha@example.com")]
+    for index, (name, email) in enumerate(people):
+        tg_user = TelegramUsers(telegram_id=str(index), username=f"user_{index}")
+        employee = Employees(full_name=name, email=email)
+        db_session.add_all([tg_user, employee])
+        await db_session.flush()
+        db_session.add(AppUsers(tg_user_id=tg_user.id, employee_id=employee.id, role_id=role_id))
+    await db_session.commit()
+
+    owners = await AppUserObj.search_owners(session=db_session, prefix="  AL")
+    assert {(owner.full_name, owner.email) for owner in owners} == {
+        ("Alexa", "a100%@example.com"), ("alex_b", "bravo@example.com"), ("Chris", "alpha@example.com")
+    }
+    assert len(await AppUserObj.search_owners(session=db_session, prefix="al", limit=1)) == 1
+
+    # LIKE wildcards in the prefix are matched literally
+    assert [owner.full_name for owner in await AppUserObj.search_owners(session=db_session, prefix="alex_")] \
+        == ["alex_b"]
+    assert [owner.full_name for owner in await AppUserObj.search_owners(session=db_session, prefix="a100%")] \
+        == ["Alexa"]
+    assert await AppUserObj.search_owners(session=db_session, prefix="%") == []
+    assert await AppUserObj.search_owners(session=db_session, prefix="smith") == []
+    assert await AppUserObj.search_owners(session=db_session, prefix=" ") == []
@@ -1,12 +1,19 @@
 import pytest
+from aiogram.types import BufferedInputFile
 
-from sqlalchemy import select
+from sqlalchemy import select, inspect, event, text, update
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from uuid6 import uuid7
 
-from db.models import Book, Category, City, BookCategory, AppUsers, Location
-from db.queries.book_crud import BookObj
+from QR import qr_cache
+from QR.create_qr import make_qr
+from QR.qr_cache import book_qr_payload
+from db.models import Book, Category, City, BookCategory, AppUsers, Location, Order, OrderStatus
+from db.queries.book_crud import BookObj, category_counts_cache
 from db.queries.location_crud import LocationObj
+from db.queries.order_crud import OrderObj
+from utils.book_index import BookPrefixIndex, IndexedBook, book_index
 
 
 @pytest.mark.asyncio
@@ -227,6 +234,346 @@ async def test_book_read(db_session, sample_books, mocker):
     assert len(db_error_books) == 0
 
 
+@pytest.mark.asyncio
+async def test_book_read_profiles(db_session, sample_books):
+    list_books = await BookObj().read(db_session, profile='list')
+    assert [book.title for book in list_books] == ["Python", "Java"]
+    assert [book.author for book in list_books] == ["Someone", "Someone 2"]
+    assert {'description', 'owner_id', 'location_id', 'created'} <= inspect(list_books[0]).unloaded
+    db_session.expunge_all()
+
+    detail_books = await BookObj().read(db_session, profile='detail')
+    assert detail_books[0].description == "Python description"
+    assert inspect(detail_books[0]).unloaded == {
+        'created', 'search_vector', 'owner', 'location', 'orders', 'book_categories'
+    }
+
+    # Invalid data
+    assert await BookObj().read(db_session, profile='unknown') == []
+
+
+@pytest.mark.asyncio
+async def test_book_read_page(db_session, sample_books, mocker):
+    result = await db_session.execute(select(Book.owner_id, Book.location_id).limit(1))
+    owner_id, location_id = result.one()
+    db_session.add_all([
+        Book(title=f"Book {i}", author="Author", owner_id=owner_id, location_id=location_id) for i in range(5)
+    ])
+    await db_session.commit()
+    result = await db_session.execute(select(Book.id).order_by(Book.id))
+    book_ids = result.scalars().all()
+
+    page_1, has_prev, has_next = await BookObj().read_page(db_session, limit=3)
+    assert [book.id for book in page_1] == book_ids[:3]
+    assert (has_prev, has_next) == (False, True)
+
+    page_2, has_prev, has_next = await BookObj().read_page(db_session, cursor=book_ids[2], limit=3)
+    assert [book.id for book in page_2] == book_ids[3:6]
+    assert (has_prev, has_next) == (True, True)
+
+    page_3, has_prev, has_next = await BookObj().read_page(db_session, cursor=book_ids[5], limit=3)
+    assert [book.id for book in page_3] == book_ids[6:]
+    assert (has_prev, has_next) == (True, False)
+
+    # Going back from the last page
+    back, has_prev, has_next = await BookObj().read_page(db_session, cursor=book_ids[6], limit=3, backward=True)
+    assert [book.id for book in back] == book_ids[3:6]
+    assert (has_prev, has_next) == (True, True)
+
+    back, has_prev, has_next = await BookObj().read_page(db_session, cursor=book_ids[3], limit=3, backward=True)
+    assert [book.id for book in back] == book_ids[:3]
+    assert (has_prev, has_next) == (False, True)
+
+    # Invalid data
+    assert await BookObj().read_page(db_session, limit=0) == ([], False, False)
+
+    mocker.patch.object(db_session, 'execute', side_effect=SQLAlchemyError("DB error"))
+    assert await BookObj().read_page(db_session) == ([], False, False)
+
+
+@pytest.mark.asyncio
+async def test_book_search(db_session, sample_books, mocker):
+    result = await db_session.execute(select(Book.owner_id, Book.location_id).limit(1))
+    owner_id, location_id = result.one()
+    db_session.add_all([
+        Book(title="Fluent Python", author="Luciano Ramalho", description="Idiomatic code",
+             owner_id=owner_id, location_id=location_id),
+        Book(title="Designing Data-Intensive Applications", author="Martin Kleppmann",
+             description="Reliable, scalable and maintainable systems, with Python examples",
+             owner_id=owner_id, location_id=location_id, is_available=False),
+    ] + [
+        Book(title=f"Clean Code {i}", author="Robert Martin", owner_id=owner_id, location_id=location_id)
+        for i in range(4)
+    ])
+    await db_session.commit()
+
+    # Title matches rank above description matches, words are matched as prefixes
+    books, has_prev, has_next = await BookObj.search(db_session, terms="pyth")
+    assert [book.title for book in books][-1] == "Designing Data-Intensive Applications"
+    assert {book.title for book in books[:-1]} == {"Python", "Fluent Python"}
+    assert books[-1].is_available is False
+    assert (has_prev, has_next) == (False, False)
+
+    books, _, _ = await BookObj.search(db_session, terms="  Martin  clean!")
+    assert len(books) == 4
+
+    # Pages follow (score, id) without skipping or repeating books
+    page_1, has_prev, has_next = await BookObj.search(db_session, terms="martin", limit=2)
+    assert (has_prev, has_next) == (False, True)
+    page_2, has_prev, has_next = await BookObj.search(db_session, terms="martin", cursor=page_1[-1].id, limit=2)
+    assert (has_prev, has_next) == (True, True)
+    page_3, has_prev, has_next = await BookObj.search(db_session, terms="martin", cursor=page_2[-1].id, limit=2)
+    assert (has_prev, has_next) == (True, False)
+    assert len({book.id for book in page_1 + page_2 + page_3}) == 5
+
+    back, has_prev, has_next = await BookObj.search(
+        db_session, terms="martin", cursor=page_3[0].id, limit=2, backward=True
+    )
+    assert back == page_2
+    assert (has_prev, has_next) == (True, True)
+
+    # A cursor book that no longer matches falls back to the first page
+    assert await BookObj().remove(session=db_session, book_id=page_2[-1].id)
+    for backward in (False, True):
+        books, has_prev, has_next = await BookObj.search(
+            db_session, terms="martin", cursor=page_2[-1].id, limit=2, backward=backward
+        )
+        assert (books, has_prev, has_next) == (page_1, False, True)
+
+    # Invalid data
+    assert await BookObj.search(db_session, terms="%_!") == ([], False, False)
+    assert await BookObj.search(db_session, terms="python", limit=0) == ([], False, False)
+
+    mocker.patch.object(db_session, 'execute', side_effect=SQLAlchemyError("DB error"))
+    assert await BookObj.search(db_session, terms="python") == ([], False, False)
+
+
+def test_book_prefix_index():
+    index = BookPrefixIndex(limit=2)
+    fluent, think, clean = (IndexedBook(id=uuid7(), title=title, author=author) for title, author in [
+        ("Fluent Python", "Luciano Ramalho"), ("Think Python", "Allen Downey"), ("Clean Code", "Robert Martin")
+    ])
+    index.replace_all([fluent, think, clean])
+
+    # Every word is a prefix of a title or author word; titles starting with the query come first
+    assert index.search("PY") == [fluent, think]
+    assert index.search("think py") == [think]
+    assert index.search("ramal fluent") == [fluent]
+    assert index.search("python martin") == []
+    assert index.search("  !") == []
+
+    # Results are cached per query until the index changes
+    assert index.results.get("py") == [fluent, think]
+    index.add(IndexedBook(id=clean.id, title="Clean Python", author="Robert Martin"))
+    assert "py" not in index.results
+    assert index.search("clean") == [IndexedBook(id=clean.id, title="Clean Python", author="Robert Martin")]
+    assert index.search("code") == []
+
+    index.remove(think.id)
+    assert index.search("think") == []
+    assert index.search("python") == [IndexedBook(id=clean.id, title="Clean Python", author="Robert Martin"), fluent]
+    assert len(index) == 2
+
+
+@pytest.mark.asyncio
+async def test_book_index_follows_book_changes(db_engine, db_session, sample_books):
+    assert await book_index.load(async_sessionmaker(db_engine))
+    assert [book.title for book in book_index.search("some")] == ["Java", "Python"]
+
+    result = await db_session.execute(select(Book.owner_id, Book.location_id).limit(1))
+    owner_id, location_id = result.one()
+    assert await BookObj().create(
+        session=db_session, title="Rust in Action", author="Tim McNamara", description="Systems programming",
+        owner_id=owner_id, location_id=location_id, categories=[Category.ALGORITHMS],
+    )
+    [rust] = book_index.search("rust")
+    assert rust.author == "Tim McNamara"
+
+    assert await BookObj().update(session=db_session, book_id=rust.id, updates={'title': "Programming Rust"})
+    assert [book.title for book in book_index.search("rust")] == ["Programming Rust"]
+
+    assert await BookObj().remove(session=db_session, book_id=rust.id)
+    assert book_index.search("rust") == []
+
+
+@pytest.mark.asyncio
+async def test_book_index_load_keeps_concurrent_changes(db_engine, sample_books, mocker):
+    index = BookPrefixIndex()
+    session_factory = async_sessionmaker(db_engine)
+    assert await index.load(session_factory)
+    [python] = index.search("python")
+    rust = IndexedBook(id=uuid7(), title="Rust in Action", author="Tim McNamara")
+
+    # Books changed through the CRUD hooks while the snapshot query runs survive the reload
+    execute = AsyncSession.execute
+
+    async def execute_with_changes(session, *args, **kwargs):
+        result = await execute(session, *args, **kwargs)
+        index.add(rust)
+        index.remove(python.id)
+        return result
+
+    mocker.patch.object(AsyncSession, 'execute', execute_with_changes)
+    assert await index.load(session_factory)
+    assert index.search("rust") == [rust]
+    assert index.search("python") == []
+
+
+@pytest.mark.asyncio
+async def test_book_read_by_categories(db_session, sample_books_categories, mocker):
+    category_counts_cache.clear()
+    result = await db_session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+    (python_id, owner_id, location_id), (java_id, _, _) = result.all()
+    for i in range(3):
+        assert await BookObj().create(
+            session=db_session, title=f"SQL {i}", author="Author", description="SQL description",
+            owner_id=owner_id, location_id=location_id, categories=[Category.DATABASES],
+        )
+
+    books, has_prev, has_next = await BookObj.read_by_categories(db_session, categories=[Category.DATABASES], limit=2)
+    assert [book.title for book in books] == ["Python", "SQL 0"]
+    assert (has_prev, has_next) == (False, True)
+
+    books, has_prev, has_next = await BookObj.read_by_categories(
+        db_session, categories=[Category.DATABASES], cursor=books[-1].id, limit=2
+    )
+    assert [book.title for book in books] == ["SQL 1", "SQL 2"]
+    assert (has_prev, has_next) == (True, False)
+
+    books, has_prev, has_next = await BookObj.read_by_categories(
+        db_session, categories=[Category.DATABASES], cursor=books[0].id, limit=2, backward=True
+    )
+    assert [book.title for book in books] == ["Python", "SQL 0"]
+    assert (has_prev, has_next) == (False, True)
+
+    # A book in several of the requested categories is listed once
+    books, _, _ = await BookObj.read_by_categories(
+        db_session, categories=[Category.ALGORITHMS, Category.DATABASES, Category.MACHINE_LEARNING], limit=10
+    )
+    assert [book.title for book in books] == ["Python", "Java", "SQL 0", "SQL 1", "SQL 2"]
+
+    # Categories of a whole page come from one query
+    categories = await BookObj.get_categories_many(db_session, book_ids=[python_id, java_id, uuid7()])
+    assert categories[python_id] == ["Algorithms", "Databases"]
+    assert categories[java_id] == ["Data Science", "Machine Learning"]
+    assert await BookObj.get_categories_many(db_session, book_ids=[]) == {}
+
+    book = await BookObj().get_obj(db_session, book_id=java_id, with_categories=True)
+    assert 'book_categories' not in inspect(book).unloaded
+    assert {book_category.category for book_category in book.book_categories} == {
+        Category.DATA_SCIENCE, Category.MACHINE_LEARNING
+    }
+
+    # Invalid data
+    assert await BookObj.read_by_categories(db_session, categories=[]) == ([], False, False)
+    assert await BookObj.read_by_categories(db_session, categories=[Category.DEVOPS], limit=0) == ([], False, False)
+
+    mocker.patch.object(db_session, 'execute', side_effect=SQLAlchemyError("DB error"))
+    assert await BookObj.read_by_categories(db_session, categories=[Category.DEVOPS]) == ([], False, False)
+    assert await BookObj.get_categories_many(db_session, book_ids=[java_id]) == {}
+
+
+@pytest.mark.asyncio
+async def test_book_category_counts(db_engine, db_session, sample_books_categories):
+    category_counts_cache.clear()
+    counts = await BookObj.category_counts(db_session)
+    assert counts == {
+        Category.DATABASES: 1, Category.ALGORITHMS: 1, Category.DATA_SCIENCE: 1, Category.MACHINE_LEARNING: 1
+    }
+
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        assert await BookObj.category_counts(db_session) == counts
+    finally:
+        event.remove(db_engine.sync_engine, 'before_cursor_execute', capture)
+    assert statements == []
+
+    # Changing categories invalidates the cached counts
+    book_id = await db_session.scalar(select(Book.id).where(Book.title == "Java"))
+    assert await BookObj().update(db_session, book_id=book_id, updates={'categories': "Databases, DevOps"})
+    assert await BookObj.category_counts(db_session) == {
+        Category.DATABASES: 2, Category.ALGORITHMS: 1, Category.DEVOPS: 1
+    }
+
+    assert await BookObj().remove(db_session, book_id=book_id)
+    assert await BookObj.category_counts(db_session) == {Category.DATABASES: 1, Category.ALGORITHMS: 1}
+
+    await db_session.execute(text("SET enable_seqscan = off"))
+    result = await db_session.execute(text(
+        "EXPLAIN SELECT book_id FROM books_categories WHERE category IN ('DATABASES', 'DEVOPS')"
+    ))
+    assert 'ix_books_categories_category_book_id' in "\n".join(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_book_read_available_uses_indexes(db_engine, db_session, sample_books):
+    result = await db_session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+    books = result.all()
+    await OrderObj().create(session=db_session, app_user_id=books[0].owner_id, book_id=books[0].id,
+                            taken_from_id=books[0].location_id)
+    await OrderObj().create(session=db_session, app_user_id=books[1].owner_id, book_id=books[1].id,
+                            taken_from_id=books[1].location_id)
+    result = await db_session.execute(select(Order.id).where(Order.book_id == books[1].id))
+    await OrderObj.update_status(session=db_session, order_id=result.scalar_one(), new_status=OrderStatus.CANCELLED)
+
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        available = await BookObj().read(db_session, profile='list')
+        assert await BookObj.check_availability(session=db_session) == []
+    finally:
+        event.remove(db_engine.sync_engine, 'before_cursor_execute', capture)
+
+    assert [book.id for book in available] == [books[1].id]
+
+    await db_session.execute(text("SET enable_seqscan = off"))
+    result = await db_session.execute(text(f"EXPLAIN {statements[0]}"))
+    assert 'ix_books_available_id' in "\n".join(result.scalars().all())
+
+    result = await db_session.execute(text(f"EXPLAIN {statements[1]}"))
+    assert 'ix_orders_active_book_id' in "\n".join(result.scalars().all())
+
+    result = await db_session.execute(
+        text("EXPLAIN SELECT id FROM books WHERE owner_id = :owner_id"), {'owner_id': books[0].owner_id}
+    )
+    assert 'ix_books_owner_id' in "\n".join(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_book_check_availability(db_session, sample_books, mocker):
+    result = await db_session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+    books = result.all()
+    await OrderObj().create(session=db_session, app_user_id=books[0].owner_id, book_id=books[0].id,
+                            taken_from_id=books[0].location_id)
+
+    result = await db_session.execute(select(Book.id).where(Book.is_available).order_by(Book.id))
+    assert result.scalars().all() == [books[1].id]
+
+    # Order rows changed behind the CRUD layer
+    await db_session.execute(update(Order).values(status=OrderStatus.RETURNED))
+    await db_session.execute(update(Book).where(Book.id == books[1].id).values(is_available=False))
+    await db_session.commit()
+
+    assert await BookObj.check_availability(session=db_session) == [books[0].id, books[1].id]
+    assert await BookObj.check_availability(session=db_session, fix=True) == [books[0].id, books[1].id]
+    assert await BookObj.check_availability(session=db_session) == []
+
+    result = await db_session.execute(select(Book.id).where(Book.is_available).order_by(Book.id))
+    assert result.scalars().all() == [books[0].id, books[1].id]
+
+    mocker.patch.object(db_session, 'execute', side_effect=SQLAlchemyError("DB error"))
+    assert await BookObj.check_availability(session=db_session) is None
+
+
 @pytest.mark.asyncio
 async def test_book_update(db_session, sample_books_categories, mocker):
     result = await db_session.execute(select(Book).order_by(Book.id))
@@ -392,6 +739,37 @@ async def test_book_get_object(db_session, sample_books, mocker):
     assert db_error_book is None
 
 
+@pytest.mark.asyncio
+async def test_book_get_book_qr_code(db_session, sample_books, mocker, tmp_path):
+    result = await db_session.execute(select(Book).order_by(Book.id))
+    books = result.scalars().all()
+    book_id = books[0].id
+
+    mocker.patch.object(qr_cache, 'QR_CACHE_DIR', str(tmp_path))
+    qr_cache.clear_memory_cache()
+    make_qr_async = mocker.spy(qr_cache, 'make_qr_async')
+
+    qr_1 = await BookObj().get_book_qr_code(session=db_session, book_id=book_id)
+    qr_2 = await BookObj().get_book_qr_code(session=db_session, book_id=book_id)
+
+    assert isinstance(qr_1, BufferedInputFile) and qr_1.filename == "qr.png"
+    assert qr_1.data == qr_2.data == make_qr(book_qr_payload(book_id))
+    assert make_qr_async.call_count == 1
+    assert (tmp_path / f"{qr_cache.payload_hash(book_qr_payload(book_id))}.png").read_bytes() == qr_1.data
+
+    # Rendered image survives a restart through the disk cache
+    qr_cache.clear_memory_cache()
+    qr_3 = await BookObj().get_book_qr_code(session=db_session, book_id=book_id)
+    assert qr_3.data == qr_1.data
+    assert make_qr_async.call_count == 1
+
+    assert await BookObj().get_book_qr_code(session=db_session, book_id=uuid7()) is None
+    assert await BookObj().get_book_qr_code(session=db_session, book_id=None) is None
+
+    mocker.patch.object(db_session, 'execute', side_effect=SQLAlchemyError("DB error"))
+    assert await BookObj().get_book_qr_code(session=db_session, book_id=book_id) is None
+    qr_cache.clear_memory_cache()
+
 # TODO: Finish after main CRUD functions tests
 # @pytest.mark.asyncio
 # async def test_book_get_book_categories(
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from db.database import TimedQueuePool, pool_status
+from tests.conftest import TEST_DATABASE_URL
+
+
+@pytest.mark.asyncio
+async def test_pool_status_reports_checkouts_and_waits():
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+    try:
+        async def query():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT pg_sleep(0.05)"))
+
+        async with engine.connect():
+            status = pool_status(engine)
+            assert status['size'] == 1 and status['checked_out'] == 1
+
+        await asyncio.gather(query(), query())
+
+        status = pool_status(engine)
+        assert status['checked_out'] == 0 and status['idle'] == 1
+        assert status['checkouts'] == 3
+        assert status['max_wait_ms'] >= 40
+    finally:
+        await engine.dispose()
@@ -0,0 +1,139 @@
+import pytest
+
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import select, update, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from uuid6 import uuid7, UUID
+
+from db.models import FsmStates
+from middlewares.db_session import DbSessionMiddleware
+from states.main_states import Books
+from states.storage import BufferedStorage, MemoryStateBackend, PostgresStateBackend, encode_data, decode_data
+
+KEY = StorageKey(bot_id=1, chat_id=100, user_id=100)
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fsm_data_roundtrip():
+    data = {'title': "Книга", 'location_id': uuid7(), 'chosen_categories': ["DATABASES"], 'page': 2}
+
+    raw = encode_data(data)
+    assert b' ' not in raw
+    assert decode_data(raw) == data
+    assert isinstance(decode_data(raw)['location_id'], UUID)
+
+    assert encode_data({}) is None
+    assert decode_data(None) == {}
+
+    with pytest.raises(TypeError):
+        encode_data({'obj': object()})
+
+
+@pytest.mark.asyncio
+async def test_buffered_storage_coalesces_writes():
+    backend = MemoryStateBackend()
+    storage = BufferedStorage(backend, flush_delay=60)
+
+    await storage.set_state(KEY, Books.author)
+    await storage.update_data(KEY, {'title': "Python"})
+    await storage.update_data(KEY, {'author': "Someone"})
+
+    # Pending writes are visible before they reach the backend
+    assert backend.writes == 0
+    assert await storage.get_state(KEY) == Books.author.state
+    assert await storage.get_data(KEY) == {'title': "Python", 'author': "Someone"}
+
+    await storage.close()
+    assert backend.writes == 1
+
+    fresh = BufferedStorage(backend)
+    assert await fresh.get_state(KEY) == Books.author.state
+    assert await fresh.get_data(KEY) == {'title': "Python", 'author': "Someone"}
+
+    # Clearing the flow removes the row instead of storing an empty one
+    await storage.set_state(KEY, None)
+    await storage.set_data(KEY, {})
+    await storage.close()
+    assert backend.rows == {}
+
+
+@pytest.mark.asyncio
+async def test_buffered_storage_expires_abandoned_flows():
+    timer = FakeTimer()
+    backend = MemoryStateBackend(timer=timer)
+    storage = BufferedStorage(backend, flush_delay=0, ttl=60)
+
+    await storage.set_state(KEY, Books.author)
+    other = StorageKey(bot_id=1, chat_id=200, user_id=200)
+    timer.now = 30
+    await storage.set_state(other, Books.description)
+
+    timer.now = 61
+    assert await storage.get_state(KEY) is None
+    assert await storage.get_state(other) == Books.description.state
+
+    assert await storage.cleanup() == 1
+    assert list(backend.rows) == ["1:200:200"]
+
+
+@pytest.mark.asyncio
+async def test_postgres_state_backend(db_engine, clear_all_tables):
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+    storage = BufferedStorage(PostgresStateBackend(session_factory), flush_delay=0, ttl=3600)
+    book_id = uuid7()
+
+    await storage.set_state(KEY, Books.author)
+    await storage.update_data(KEY, {'selected_book': book_id})
+
+    fresh = BufferedStorage(PostgresStateBackend(session_factory), ttl=3600)
+    assert await fresh.get_state(KEY) == Books.author.state
+    assert await fresh.get_data(KEY) == {'selected_book': book_id}
+
+    other = StorageKey(bot_id=1, chat_id=200, user_id=200)
+    await storage.set_state(other, Books.description)
+    async with session_factory() as session:
+        await session.execute(
+            update(FsmStates).where(FsmStates.key == "1:200:200")
+            .values(updated_at=text("now() - interval '2 hours'"))
+        )
+        await session.commit()
+
+    assert await fresh.get_state(other) is None
+    assert await storage.cleanup() == 1
+
+    await storage.set_state(KEY, None)
+    await storage.set_data(KEY, {})
+    async with session_factory() as session:
+        result = await session.execute(select(FsmStates.key))
+        assert result.scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_postgres_state_backend_reads_through_update_session(db_engine, clear_all_tables):
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+    await BufferedStorage(PostgresStateBackend(session_factory), flush_delay=0).set_state(KEY, Books.author)
+
+    opened = []
+
+    def backend_factory():
+        opened.append(True)
+        return session_factory()
+
+    storage = BufferedStorage(PostgresStateBackend(backend_factory))
+
+    async def handler(event, data):
+        return await storage.get_state(KEY)
+
+    # Inside an update the state is read on the update's own connection
+    assert await DbSessionMiddleware(session_factory)(handler, object(), {}) == Books.author.state
+    assert opened == []
+
+    assert await storage.get_state(KEY) == Books.author.state
+    assert opened == [True]
@@ -6,6 +6,8 @@ from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from uuid6 import uuid7
 
+from QR.create_qr import make_qr
+from QR.qr_cache import location_qr_payload
 from db.models import City, Location
 from db.queries.location_crud import LocationObj
 
@@ -71,6 +73,16 @@ async def test_location_read(db_session, sample_locations, mocker):
     assert len(db_error_locations) == 0
 
 
+@pytest.mark.asyncio
+async def test_location_read_list_profile(db_session, sample_locations):
+    locations = await LocationObj().read(session=db_session, profile='list')
+
+    assert [(location.city, location.room) for location in locations] == [
+        (City.Almaty, "Room 22"), (City.Berlin, "Room 33")
+    ]
+    assert await LocationObj().read(session=db_session, profile='unknown') == []
+
+
 @pytest.mark.asyncio
 async def test_location_update(db_session, sample_locations, mocker):
     result = await db_session.execute(select(Location).order_by(Location.id))
@@ -231,8 +243,8 @@ async def test_location_get_location_qr_code(db_session):
 
     assert isinstance(location_1, BufferedInputFile)
     assert location_1.filename == "qr.png"
-    assert location_1.data == locations[0].qr_code
+    assert location_1.data == make_qr(location_qr_payload(locations[0].id))
 
     assert isinstance(location_2, BufferedInputFile)
     assert location_2.filename == "qr.png"
-    assert location_2.data == locations[1].qr_code
+    assert location_2.data == make_qr(location_qr_payload(locations[1].id))
@@ -0,0 +1,201 @@
+import asyncio
+import pytest
+
+from datetime import datetime
+from types import SimpleNamespace
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.filters import StateFilter
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message, Update, User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.models import TelegramUsers
+from middlewares.db_session import DbSessionMiddleware
+from middlewares.rate_limit import RateLimitMiddleware, TokenBucket, bulk_sending
+from middlewares.update_queue import UpdateQueueMiddleware
+from states.main_states import Books
+
+
+@pytest.mark.asyncio
+async def test_db_session_middleware_one_session_per_update(db_engine, clear_all_tables):
+    middleware = DbSessionMiddleware(async_sessionmaker(db_engine, expire_on_commit=False))
+    sessions = []
+
+    async def handler(event, data):
+        sessions.append(data['session'])
+        data['session'].add(TelegramUsers(telegram_id="12345", username="user_a"))
+        return "handled"
+
+    assert await middleware(handler, object(), {}) == "handled"
+
+    async def failing_handler(event, data):
+        sessions.append(data['session'])
+        data['session'].add(TelegramUsers(telegram_id="54321", username="user_b"))
+        await data['session'].flush()
+        raise RuntimeError("handler failed")
+
+    with pytest.raises(RuntimeError):
+        await middleware(failing_handler, object(), {})
+
+    assert sessions[0] is not sessions[1]
+
+    async with async_sessionmaker(db_engine)() as session:
+        result = await session.execute(select(TelegramUsers.telegram_id))
+        assert result.scalars().all() == ["12345"]
+
+
+@pytest.mark.asyncio
+async def test_update_queue_orders_per_user_and_caps_concurrency():
+    middleware = UpdateQueueMiddleware(max_concurrency=2, max_user_queue=3)
+    events = []
+    running = 0
+    peak = 0
+
+    async def handler(event, data):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        events.append(('start', event))
+        await asyncio.sleep(0.01)
+        events.append(('end', event))
+        running -= 1
+        return event
+
+    def user_data(user_id):
+        return {'event_from_user': SimpleNamespace(id=user_id)}
+
+    updates = [('a', 1), ('b', 1), ('c', 1), ('x', 2), ('y', 3), ('z', 4)]
+    results = await asyncio.gather(*(middleware(handler, event, user_data(user_id)) for event, user_id in updates))
+    assert results == ['a', 'b', 'c', 'x', 'y', 'z']
+
+    # One user's updates never overlap and keep arrival order
+    user_1 = [entry for entry in events if entry[1] in 'abc']
+    assert user_1 == [('start', 'a'), ('end', 'a'), ('start', 'b'), ('end', 'b'), ('start', 'c'), ('end', 'c')]
+    # Different users run in parallel, bounded by the semaphore
+    assert peak == 2
+
+    status = middleware.status()
+    assert status['processed'] == 6
+    assert status['in_flight'] == status['waiting'] == status['queued_users'] == 0
+    assert status['max_user_depth'] == 3
+    assert status['max_wait_ms'] > 0
+
+    # A user over the queue bound has the extra update dropped
+    results = await asyncio.gather(*(middleware(handler, event, user_data(1)) for event in 'defg'))
+    assert results == ['d', 'e', 'f', None]
+    assert middleware.status()['dropped'] == 1
+
+
+@pytest.mark.asyncio
+async def test_update_queue_skips_superseded_inline_queries():
+    middleware = UpdateQueueMiddleware(max_concurrency=1)
+    handled = []
+
+    async def handler(event, data):
+        await asyncio.sleep(0.01)
+        handled.append(event.update_id)
+        return event.update_id
+
+    def update(update_id, inline=True):
+        return SimpleNamespace(update_id=update_id, inline_query=object() if inline else None)
+
+    data = {'event_from_user': SimpleNamespace(id=1)}
+    updates = [update(1, inline=False), update(2), update(3), update(4), update(5, inline=False)]
+    results = await asyncio.gather(*(middleware(handler, event, data) for event in updates))
+
+    # Only the newest of the queued inline queries is answered, other updates are kept
+    assert results == [1, None, None, 4, 5]
+    assert handled == [1, 4, 5]
+    assert middleware.status()['superseded'] == 2
+    assert middleware.status()['queued_users'] == 0
+
+
+@pytest.mark.asyncio
+async def test_update_queue_resolves_fsm_state_in_order():
+    # Wired as in bot.py: FSM state is resolved inside the per-user queue
+    dispatcher = Dispatcher(storage=MemoryStorage(), disable_fsm=True)
+    dispatcher.update.outer_middleware(UpdateQueueMiddleware(max_concurrency=2))
+    dispatcher.update.outer_middleware(dispatcher.fsm)
+    seen = []
+
+    @dispatcher.message(StateFilter(None))
+    async def start(message, state):
+        seen.append(None)
+        await asyncio.sleep(0.01)
+        await state.set_state(Books.author)
+
+    @dispatcher.message(Books.author)
+    async def author(message, state):
+        seen.append(await state.get_state())
+
+    def update(update_id):
+        return Update(update_id=update_id, message=Message(
+            message_id=update_id, date=datetime.now(), text="tap",
+            chat=Chat(id=1, type='private'), from_user=User(id=1, is_bot=False, first_name="User"),
+        ))
+
+    bot = Bot(token="42:TEST")
+    await asyncio.gather(dispatcher.feed_update(bot, update(1)), dispatcher.feed_update(bot, update(2)))
+    await bot.session.close()
+
+    # The second tap sees the state set by the first one instead of starting the flow again
+    assert seen == [None, Books.author.state]
+
+
+def test_token_bucket():
+    now = 0.0
+    bucket = TokenBucket(rate=1, capacity=3, timer=lambda: now)
+
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 0, 1]
+    now = 3.0
+    assert bucket.wait_time() == 0
+    assert not bucket.is_full()
+
+    bucket.pause(5)
+    assert bucket.wait_time() == 6
+    now = 11.0
+    assert bucket.is_full()
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_prioritizes_interactive_and_retries(mocker):
+    limiter = RateLimitMiddleware(global_rate=50, chat_rate=100, chat_burst=100)
+    limiter.global_bucket.tokens = 0
+    order = []
+
+    async def make_request(bot, method):
+        order.append(method.text)
+        return method.text
+
+    async def send(text, bulk=False):
+        method = SendMessage(chat_id=hash(text), text=text)
+        if bulk:
+            with bulk_sending():
+                return await limiter(make_request, None, method)
+        return await limiter(make_request, None, method)
+
+    bulk = [asyncio.create_task(send(f"bulk {i}", bulk=True)) for i in range(3)]
+    await asyncio.sleep(0)
+    assert limiter.status()['queued_bulk'] == 3
+    await send("reply")
+    await asyncio.gather(*bulk)
+    assert order == ["reply", "bulk 0", "bulk 1", "bulk 2"]
+
+    # Requests without chat_id skip the limiter
+    assert await limiter(make_request, None, SimpleNamespace(text="getUpdates")) == "getUpdates"
+    assert limiter.status()['sent'] == 4
+
+    # Flood control is retried after retry_after, up to max_retries
+    method = SendMessage(chat_id=1, text="retry")
+    flood = TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+    make_request = mocker.AsyncMock(side_effect=[flood, "sent"])
+    assert await limiter(make_request, None, method) == "sent"
+    assert limiter.status()['retries'] == 1
+
+    make_request = mocker.AsyncMock(side_effect=flood)
+    with pytest.raises(TelegramRetryAfter):
+        await limiter(make_request, None, method)
+    assert make_request.call_count == limiter.max_retries + 1
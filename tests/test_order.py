@@ -1,3 +1,19 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import SendMessage
+from sqlalchemy import select, update, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.models import Book, Order, OrderStatus, City
+from db.queries.app_user_crud import AppUserIdentity
+from db.queries.order_crud import OrderObj, OrderFilter, invalidate_order_views
+from jobs.reservations import expire_stale_reservations
+from utils.order_view import get_order_view, parse_order_filter, filter_to_data, filter_from_data, EMPTY_TEXT
+
+
 # import pytest
 # from sqlalchemy import select
 # from sqlalchemy.exc import SQLAlchemyError
@@ -135,3 +151,194 @@
 #     order_1 = await OrderObj().is_book_taken(session=db_session,book_id=1)
 #
 #     assert order_1 is True
+
+
+@pytest.mark.asyncio
+async def test_order_create_reserves_book_once(db_session, sample_books, mocker):
+    result = await db_session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+    book = result.first()
+
+    first = await OrderObj().create(session=db_session, app_user_id=book.owner_id, book_id=book.id,
+                                    taken_from_id=book.location_id)
+    second = await OrderObj().create(session=db_session, app_user_id=book.owner_id, book_id=book.id,
+                                     taken_from_id=book.location_id, status=OrderStatus.IN_PROCESS)
+
+    assert first is True and second is False
+
+    result = await db_session.execute(select(Order.status).where(Order.book_id == book.id))
+    assert result.scalars().all() == [OrderStatus.RESERVED]
+
+    # Unique partial index still guards inserts that skip the row lock
+    mocker.patch.object(db_session, 'scalar', return_value=True)
+    third = await OrderObj().create(session=db_session, app_user_id=book.owner_id, book_id=book.id,
+                                    taken_from_id=book.location_id)
+    assert third is False
+
+
+@pytest.mark.asyncio
+async def test_order_create_concurrent_reservations(db_engine, sample_books):
+    async with AsyncSession(db_engine) as session:
+        result = await session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+        book = result.first()
+
+    async def reserve():
+        async with AsyncSession(db_engine) as session:
+            return await OrderObj().create(session=session, app_user_id=book.owner_id, book_id=book.id,
+                                           taken_from_id=book.location_id)
+
+    results = await asyncio.gather(*(reserve() for _ in range(10)))
+
+    assert results.count(True) == 1
+
+    async with AsyncSession(db_engine) as session:
+        result = await session.execute(select(Order.id).where(Order.book_id == book.id))
+        assert len(result.scalars().all()) == 1
+        assert await session.scalar(select(Book.is_available).where(Book.id == book.id)) is False
+
+
+@pytest.mark.asyncio
+async def test_expire_reservations(db_engine, db_session, sample_books, mocker):
+    result = await db_session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+    books = result.all()
+    for book in books:
+        await OrderObj().create(session=db_session, app_user_id=books[0].owner_id, book_id=book.id,
+                                taken_from_id=book.location_id)
+
+    await db_session.execute(
+        update(Order).where(Order.book_id == books[0].id).values(created_at=text("now() - interval '4 days'"))
+    )
+    await db_session.commit()
+
+    expired = await OrderObj.expire_reservations(session=db_session, older_than=timedelta(days=3))
+    assert [(item.telegram_id, item.titles) for item in expired] == [("12345", ["Python"])]
+
+    result = await db_session.execute(select(Book.id, Book.is_available).order_by(Book.id))
+    assert result.all() == [(books[0].id, True), (books[1].id, False)]
+    result = await db_session.execute(select(Order.status).order_by(Order.book_id))
+    assert result.scalars().all() == [OrderStatus.CANCELLED, OrderStatus.RESERVED]
+
+    assert await OrderObj.expire_reservations(session=db_session, older_than=timedelta(days=3)) == []
+
+    # The job notifies each user once per batch of cancelled reservations
+    await db_session.execute(update(Order).values(created_at=text("now() - interval '4 days'")))
+    await db_session.commit()
+    bot = mocker.Mock()
+    bot.send_message = mocker.AsyncMock()
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+
+    assert await expire_stale_reservations(bot, session_factory, ttl=timedelta(days=3)) == 1
+    bot.send_message.assert_awaited_once()
+    assert "Java" in bot.send_message.call_args.kwargs['text']
+    assert await db_session.scalar(select(Book.is_available).where(Book.id == books[1].id)) is True
+
+
+@pytest.mark.asyncio
+async def test_expire_reservations_notifies_after_send_error(db_engine, db_session, sample_books, mocker):
+    result = await db_session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+    books = result.all()
+    for book in books:
+        await OrderObj().create(session=db_session, app_user_id=book.owner_id, book_id=book.id,
+                                taken_from_id=book.location_id)
+    await db_session.execute(update(Order).values(created_at=text("now() - interval '4 days'")))
+    await db_session.commit()
+
+    bot = mocker.Mock()
+    bot.send_message = mocker.AsyncMock(side_effect=[
+        TelegramNetworkError(method=SendMessage(chat_id=1, text="expired"), message="timeout"), None,
+    ])
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+
+    # A failed notice does not stop the job from notifying the next user
+    assert await expire_stale_reservations(bot, session_factory, ttl=timedelta(days=3)) == 2
+    assert bot.send_message.await_count == 2
+    assert {call.kwargs['chat_id'] for call in bot.send_message.call_args_list} == {"12345", "54321"}
+
+
+@pytest.mark.asyncio
+async def test_order_view_cached_until_order_changes(db_session, sample_books, mocker):
+    result = await db_session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+    books = result.all()
+    user = AppUserIdentity(app_user_id=books[0].owner_id, role="User")
+    other = AppUserIdentity(app_user_id=books[1].owner_id, role="User")
+    invalidate_order_views()
+
+    view = await get_order_view(session=db_session, identity=user)
+    assert view.rows == [] and view.text == EMPTY_TEXT
+
+    await OrderObj().create(session=db_session, app_user_id=user.app_user_id, book_id=books[0].id,
+                            taken_from_id=books[0].location_id)
+    await OrderObj().create(session=db_session, app_user_id=other.app_user_id, book_id=books[1].id,
+                            taken_from_id=books[1].location_id, status=OrderStatus.IN_PROCESS)
+
+    view = await get_order_view(session=db_session, identity=user)
+    assert [(row.title, row.status) for row in view.rows] == [("Python", OrderStatus.RESERVED)]
+    assert "📍 <b>Location:</b> Almaty: Room #Room 22" in view.text
+    other_view = await get_order_view(session=db_session, identity=other)
+    assert [row.title for row in other_view.rows] == ["Java"]
+
+    # Navigation taps are served from the cache
+    read_rows = mocker.spy(OrderObj, 'read_rows')
+    assert await get_order_view(session=db_session, identity=user) is view
+    assert await get_order_view(session=db_session, identity=other) is other_view
+    assert read_rows.call_count == 0
+
+    # A mutation drops only the owner's view
+    await OrderObj.update_status(session=db_session, order_id=view.rows[0].id, new_status=OrderStatus.CANCELLED)
+    view = await get_order_view(session=db_session, identity=user)
+    assert view.rows[0].status == OrderStatus.CANCELLED
+    assert await get_order_view(session=db_session, identity=other) is other_view
+    assert read_rows.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_read_admin_page(db_session, sample_books):
+    result = await db_session.execute(select(Book.id, Book.owner_id, Book.location_id).order_by(Book.id))
+    books = result.all()
+    statuses = [OrderStatus.CANCELLED, OrderStatus.RETURNED] * 5 + [OrderStatus.RESERVED]
+    created_at = datetime(2026, 1, 15, 12, 0)
+    orders = [
+        Order(app_user_id=books[i % 2].owner_id, book_id=books[0].id, status=status,
+              taken_from_id=books[i % 2].location_id, created_at=created_at)
+        for i, status in enumerate(statuses)
+    ]
+    db_session.add_all(orders)
+    await db_session.flush()
+    order_ids = sorted((order.id for order in orders), reverse=True)
+    await db_session.commit()
+
+    page, has_prev, has_next = await OrderObj.read_admin_page(session=db_session, limit=4)
+    assert [row.id for row in page] == order_ids[:4]
+    assert (has_prev, has_next) == (False, True)
+
+    page, has_prev, has_next = await OrderObj.read_admin_page(session=db_session, cursor=page[-1].id, limit=4)
+    assert [row.id for row in page] == order_ids[4:8]
+    assert (has_prev, has_next) == (True, True)
+
+    page, has_prev, has_next = await OrderObj.read_admin_page(session=db_session, cursor=page[0].id, limit=4,
+                                                              backward=True)
+    assert [row.id for row in page] == order_ids[:4]
+    assert (has_prev, has_next) == (False, True)
+
+    filters = OrderFilter(status=OrderStatus.RETURNED, city=City.Berlin, username="admin_user")
+    page, _, has_next = await OrderObj.read_admin_page(session=db_session, filters=filters)
+    assert len(page) == 5 and has_next is False
+    assert {(row.status, row.city, row.username) for row in page} == {(OrderStatus.RETURNED, City.Berlin, "admin_user")}
+
+    day = created_at.date()
+    filters = OrderFilter(date_from=day + timedelta(days=1))
+    assert await OrderObj.read_admin_page(session=db_session, filters=filters) == ([], False, False)
+    filters = OrderFilter(date_to=day - timedelta(days=1))
+    assert await OrderObj.read_admin_page(session=db_session, filters=filters) == ([], False, False)
+    filters = OrderFilter(date_from=day, date_to=day)
+    page, _, _ = await OrderObj.read_admin_page(session=db_session, filters=filters, limit=20)
+    assert len(page) == len(orders)
+
+
+def test_parse_order_filter():
+    filters = parse_order_filter("status=in_process city=new_york user=@user_a from=2026-10-01 to=2026-10-18")
+    assert filters == OrderFilter(status=OrderStatus.IN_PROCESS, city=City.New_York, username="user_a",
+                                  date_from=date(2026, 10, 1), date_to=date(2026, 10, 18))
+    assert filter_from_data(filter_to_data(filters)) == filters
+    assert parse_order_filter(None) == OrderFilter()
+    assert parse_order_filter("status=lost") is None
+    assert parse_order_filter("colour=red") is None
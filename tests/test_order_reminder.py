@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+
+import pytest
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import SendMessage
+from sqlalchemy import select, update, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from uuid6 import uuid7
+
+from db.models import Book, AppUsers, Location, Order, OrderStatus, OrderReminder
+from db.queries.order_reminder_crud import OrderReminderObj, OverdueDigest, OverdueOrder
+from jobs.locks import job_lock
+from jobs.reminders import format_digest, send_overdue_reminders
+
+PERIODS = {'reserved_for': timedelta(days=1), 'loan_period': timedelta(days=14), 'repeat_every': timedelta(days=3)}
+
+
+async def add_orders(db_session, sample_books):
+    result = await db_session.execute(select(AppUsers.id).order_by(AppUsers.id))
+    user_1, user_2 = result.scalars().all()
+    result = await db_session.execute(select(Book.id).order_by(Book.id))
+    book_1, book_2 = result.scalars().all()
+    location_id = await db_session.scalar(select(Location.id).limit(1))
+
+    db_session.add_all([
+        Order(app_user_id=user_1, book_id=book_1, status=OrderStatus.IN_PROCESS, taken_from_id=location_id,
+              created_at=text("now() - interval '20 days'")),
+        Order(app_user_id=user_1, book_id=book_2, status=OrderStatus.RESERVED, taken_from_id=location_id,
+              created_at=text("now() - interval '2 days'")),
+        Order(app_user_id=user_2, book_id=book_1, status=OrderStatus.RETURNED, taken_from_id=location_id,
+              created_at=text("now() - interval '30 days'")),
+        Order(app_user_id=user_2, book_id=book_2, status=OrderStatus.CANCELLED, taken_from_id=location_id,
+              created_at=text("now() - interval '30 days'")),
+    ])
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_read_due_groups_overdue_orders_by_user(db_session, sample_books):
+    await add_orders(db_session, sample_books)
+
+    digests = await OrderReminderObj.read_due(session=db_session, **PERIODS)
+    assert len(digests) == 1
+    assert digests[0].telegram_id == "12345"
+    assert [(order.title, order.status) for order in digests[0].orders] == [
+        ("Python", OrderStatus.IN_PROCESS),
+        ("Java", OrderStatus.RESERVED),
+    ]
+
+    # Reminded orders are skipped until repeat_every passes
+    assert await OrderReminderObj().create(session=db_session, orders=digests[0].orders)
+    assert await OrderReminderObj.read_due(session=db_session, **PERIODS) == []
+
+    await db_session.execute(update(OrderReminder).values(sent_at=text("now() - interval '4 days'")))
+    await db_session.commit()
+    digests = await OrderReminderObj.read_due(session=db_session, **PERIODS)
+    assert len(digests[0].orders) == 2
+
+    # A status change makes the order due again
+    await OrderReminderObj().create(session=db_session, orders=digests[0].orders)
+    await db_session.execute(
+        update(Order).where(Order.status == OrderStatus.RESERVED).values(status=OrderStatus.IN_PROCESS,
+                                                                       created_at=text("now() - interval '15 days'"))
+    )
+    await db_session.commit()
+    digests = await OrderReminderObj.read_due(session=db_session, **PERIODS)
+    assert [order.title for order in digests[0].orders] == ["Java"]
+
+    assert await OrderReminderObj().create(session=db_session, orders=[]) is False
+
+
+@pytest.mark.asyncio
+async def test_send_overdue_reminders(db_engine, db_session, sample_books, mocker):
+    await add_orders(db_session, sample_books)
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+    bot = mocker.Mock()
+    bot.send_message = mocker.AsyncMock()
+
+    # Another replica holding the lock makes this run a no-op
+    async with job_lock(session_factory, 'overdue_reminders') as acquired:
+        assert acquired
+        assert await send_overdue_reminders(bot, session_factory, batch_size=1, **PERIODS) == 0
+
+    assert await send_overdue_reminders(bot, session_factory, batch_size=1, **PERIODS) == 1
+    bot.send_message.assert_awaited_once()
+    assert bot.send_message.call_args.kwargs['chat_id'] == "12345"
+    assert "Python" in bot.send_message.call_args.kwargs['text']
+    assert "Java" in bot.send_message.call_args.kwargs['text']
+
+    # Reminders survive restarts because they are recorded in the database
+    assert await send_overdue_reminders(bot, session_factory, **PERIODS) == 0
+    result = await db_session.execute(select(OrderReminder))
+    assert len(result.scalars().all()) == 2
+
+
+@pytest.mark.asyncio
+async def test_send_overdue_reminders_skips_failed_sends(db_engine, db_session, sample_books, mocker):
+    await add_orders(db_session, sample_books)
+    # Move the reservation to the second user, so two users are due
+    result = await db_session.execute(select(AppUsers.id).order_by(AppUsers.id))
+    _, user_2 = result.scalars().all()
+    await db_session.execute(
+        update(Order).where(Order.status == OrderStatus.RESERVED).values(app_user_id=user_2)
+    )
+    await db_session.commit()
+
+    session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
+    digests = await OrderReminderObj.read_due(session=db_session, **PERIODS)
+    failing = digests[0].telegram_id
+
+    async def send_message(chat_id, text):
+        if chat_id == failing:
+            raise TelegramNetworkError(method=SendMessage(chat_id=chat_id, text=text), message="timeout")
+
+    bot = mocker.Mock()
+    bot.send_message = mocker.AsyncMock(side_effect=send_message)
+
+    # A recipient failing on a transient error does not stop the later batches, and stays due
+    assert await send_overdue_reminders(bot, session_factory, batch_size=1, **PERIODS) == 1
+    assert bot.send_message.await_count == 2
+    due = await OrderReminderObj.read_due(session=db_session, **PERIODS)
+    assert [digest.telegram_id for digest in due] == [failing]
+
+    bot.send_message.side_effect = None
+    assert await send_overdue_reminders(bot, session_factory, **PERIODS) == 1
+    result = await db_session.execute(select(OrderReminder))
+    assert len(result.scalars().all()) == 2
+
+
+def test_format_digest_fits_telegram_limit():
+    orders = [
+        OverdueOrder(order_id=uuid7(), title=f"Book {index} " + "📚" * 20, status=OrderStatus.IN_PROCESS,
+                     created_at=datetime(2026, 1, 1))
+        for index in range(200)
+    ]
+    text = format_digest(OverdueDigest(telegram_id="12345", orders=orders))
+
+    assert len(text.encode('utf-16-le')) // 2 <= 4096
+    shown = text.count("📖")
+    assert shown > 0
+    assert text.endswith(f"➕ {200 - shown} more")
+    assert len(format_digest(OverdueDigest(telegram_id="12345", orders=orders[:2])).split("\n\n")) == 3
@@ -0,0 +1,89 @@
+import pytest
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendPhoto
+from aiogram.types import BufferedInputFile
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from uuid6 import uuid7
+
+from QR.qr_cache import payload_hash
+from QR.send_qr import answer_qr_photo
+from db.models import Book, TelegramFiles
+from db.queries.book_crud import BookObj
+from db.queries.tg_file_crud import TgFileObj
+
+
+@pytest.mark.asyncio
+async def test_tg_file_create_and_read(db_session, mocker):
+    entity_id = uuid7()
+    key = payload_hash("https://t.me/testbot?start=book_1")
+
+    assert await TgFileObj().read(session=db_session, entity_id=entity_id, payload_hash=key) is None
+
+    assert await TgFileObj().create(session=db_session, entity_id=entity_id, payload_hash=key, file_id="file_1")
+    assert await TgFileObj().read(session=db_session, entity_id=entity_id, payload_hash=key) == "file_1"
+
+    # Upload of the same payload replaces the stored file_id
+    assert await TgFileObj().create(session=db_session, entity_id=entity_id, payload_hash=key, file_id="file_2")
+    assert await TgFileObj().read(session=db_session, entity_id=entity_id, payload_hash=key) == "file_2"
+
+    result = await db_session.execute(select(TelegramFiles))
+    assert len(result.scalars().all()) == 1
+
+    # Invalid data
+    assert await TgFileObj().create(session=db_session, entity_id=entity_id, payload_hash=key, file_id=None) is False
+    assert await TgFileObj().read(session=db_session, entity_id=None, payload_hash=key) is None
+
+    mocker.patch.object(db_session, 'execute', side_effect=SQLAlchemyError("DB error"))
+    assert await TgFileObj().read(session=db_session, entity_id=entity_id, payload_hash=key) is None
+    assert await TgFileObj().create(session=db_session, entity_id=entity_id, payload_hash=key, file_id="x") is False
+
+
+@pytest.mark.asyncio
+async def test_tg_file_removed_with_book(db_session, sample_books):
+    result = await db_session.execute(select(Book.id).order_by(Book.id))
+    book_id_1, book_id_2 = result.scalars().all()
+
+    await TgFileObj().create(session=db_session, entity_id=book_id_1, payload_hash="a" * 64, file_id="file_1")
+    await TgFileObj().create(session=db_session, entity_id=book_id_2, payload_hash="b" * 64, file_id="file_2")
+
+    assert await BookObj().remove(session=db_session, book_id=book_id_1)
+
+    result = await db_session.execute(select(TelegramFiles.entity_id))
+    assert result.scalars().all() == [book_id_2]
+
+
+@pytest.mark.asyncio
+async def test_answer_qr_photo_reuses_file_id(db_session, mocker):
+    entity_id = uuid7()
+    payload = f"https://t.me/testbot?start=book_{entity_id}"
+    qr_file = mocker.AsyncMock(return_value=BufferedInputFile(b"png", filename="qr.png"))
+
+    sent = mocker.Mock()
+    sent.photo = [mocker.Mock(file_id="small"), mocker.Mock(file_id="large")]
+    message = mocker.Mock()
+    message.answer_photo = mocker.AsyncMock(return_value=sent)
+
+    # First send uploads the PNG and stores the largest size's file_id
+    assert await answer_qr_photo(message, db_session, entity_id=entity_id, payload=payload, qr_file=qr_file)
+    assert isinstance(message.answer_photo.call_args.kwargs['photo'], BufferedInputFile)
+    assert await TgFileObj().read(session=db_session, entity_id=entity_id, payload_hash=payload_hash(payload)) == "large"
+
+    # Next send goes by file_id without rendering
+    assert await answer_qr_photo(message, db_session, entity_id=entity_id, payload=payload, qr_file=qr_file)
+    assert message.answer_photo.call_args.kwargs['photo'] == "large"
+    assert qr_file.call_count == 1
+
+    # A rejected file_id falls back to upload
+    message.answer_photo.side_effect = [
+        TelegramBadRequest(method=SendPhoto(chat_id=1, photo="large"), message="wrong file identifier"),
+        sent,
+    ]
+    assert await answer_qr_photo(message, db_session, entity_id=entity_id, payload=payload, qr_file=qr_file)
+    assert qr_file.call_count == 2
+    assert isinstance(message.answer_photo.call_args.kwargs['photo'], BufferedInputFile)
+
+    # Unknown entity
+    missing = mocker.AsyncMock(return_value=None)
+    assert await answer_qr_photo(message, db_session, entity_id=uuid7(), payload="other", qr_file=missing) is False
@@ -0,0 +1,157 @@
+import asyncio
+import heapq
+import logging
+import os
+import re
+
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from uuid6 import UUID
+
+from db.models import Book
+from utils.cache import TTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedBook:
+    id: UUID
+    title: str
+    author: str
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r'[^\W_]+', text.lower())
+
+
+class BookPrefixIndex:
+    """In-memory word-prefix index over book titles and authors, used to answer inline queries without the DB.
+
+    Every query word must be a prefix of some word of the book's title or author.
+    """
+
+    def __init__(self, cache_size: int = 1000, cache_ttl: float = 30, limit: int = 50):
+        self.limit = limit
+        self.results = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._books: dict[UUID, IndexedBook] = {}
+        self._postings: dict[str, set[UUID]] = {}
+        self._words: list[str] = []
+        # Books added (or removed, as None) while load() runs, re-applied on top of its snapshot
+        self._changes: dict[UUID, IndexedBook | None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def replace_all(self, books: list[IndexedBook]) -> None:
+        postings: dict[str, set[UUID]] = {}
+        for book in books:
+            for word in _words(f"{book.title} {book.author}"):
+                postings.setdefault(word, set()).add(book.id)
+
+        self._books = {book.id: book for book in books}
+        self._postings = postings
+        self._words = sorted(postings)
+        self.results.clear()
+
+    def add(self, book: IndexedBook) -> None:
+        if self._changes is not None:
+            self._changes[book.id] = book
+        self._discard(book.id)
+        self._books[book.id] = book
+        for word in set(_words(f"{book.title} {book.author}")):
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                insort(self._words, word)
+            ids.add(book.id)
+        self.results.clear()
+
+    def remove(self, book_id: UUID) -> None:
+        if self._changes is not None:
+            self._changes[book_id] = None
+        if self._discard(book_id):
+            self.results.clear()
+
+    def _discard(self, book_id: UUID) -> bool:
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return False
+
+        for word in set(_words(f"{book.title} {book.author}")):
+            ids = self._postings[word]
+            ids.discard(book_id)
+            if not ids:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+        return True
+
+    def search(self, query: str) -> list[IndexedBook]:
+        words = _words(query)
+        key = ' '.join(words)
+        if not key:
+            return []
+
+        cached = self.results.get(key)
+        if cached is not None:
+            return cached
+
+        ids = None
+        for word in sorted(set(words), key=len, reverse=True):
+            matched = set()
+            for token in self._words[bisect_left(self._words, word):]:
+                if not token.startswith(word):
+                    break
+                matched |= self._postings[token]
+            ids = matched if ids is None else ids & matched
+            if not ids:
+                break
+
+        # Titles starting with the query first, then alphabetically
+        books = heapq.nsmallest(
+            self.limit,
+            (self._books[book_id] for book_id in ids or ()),
+            key=lambda book: (not book.title.lower().startswith(key), book.title.lower(), book.id),
+        )
+        self.results.set(key, books)
+        return books
+
+    async def load(self, session_factory: async_sessionmaker) -> bool:
+        self._changes = {}
+        try:
+            async with session_factory() as session:
+                result = await session.execute(select(Book.id, Book.title, Book.author))
+                books = [IndexedBook(id=book_id, title=title, author=author) for book_id, title, author in result]
+        except SQLAlchemyError as e:
+            logger.error(f"Error while loading the book index: {e}")
+            return False
+        finally:
+            changes, self._changes = self._changes, None
+
+        self.replace_all(books)
+        for book_id, book in changes.items():
+            if book is None:
+                self.remove(book_id)
+            else:
+                self.add(book)
+        return True
+
+
+book_index = BookPrefixIndex(
+    cache_size=int(os.getenv('BOOK_INDEX_CACHE_SIZE', 1000)),
+    cache_ttl=float(os.getenv('BOOK_INDEX_CACHE_TTL', 30)),
+)
+
+
+async def refresh_book_index(index: BookPrefixIndex, session_factory: async_sessionmaker, interval: float) -> None:
+    """Reload the index periodically to pick up books changed by other bot instances."""
+    while True:
+        await asyncio.sleep(interval)
+        if await index.load(session_factory):
+            logger.info(f"Book index refreshed: {len(index)} books")
@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+from datetime import date
+
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import OrderStatus, City
+from db.queries.app_user_crud import AppUserIdentity
+from db.queries.order_crud import OrderObj, OrderRow, OrderFilter, order_view_cache
+from keyboards import order_kbs
+
+EMPTY_TEXT = "📋 You don't have any orders yet"
+ADMIN_PAGE_SIZE = 10
+FILTER_USAGE = (
+    "⚠️ Unknown filter. Usage:\n"
+    "<code>/orders status=reserved city=Almaty user=username from=2026-01-01 to=2026-01-31</code>"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class OrderView:
+    rows: list[OrderRow]
+    text: str
+    keyboard: InlineKeyboardMarkup
+
+
+async def render_order_list(rows: list[OrderRow]) -> tuple[str, InlineKeyboardMarkup]:
+    if not rows:
+        return EMPTY_TEXT, order_kbs.no_order_kb
+
+    messages = ["📋 <b>Orders:</b>"]
+
+    for idx, row in enumerate(rows, 1):
+        text = f"📖 {idx}. <b>{row.title}</b>\n"
+
+        if row.status == OrderStatus.RESERVED and row.taken_from_city:
+            text += f"📍 <b>Location:</b> {row.taken_from_city.value}: Room #{row.taken_from_room}\n"
+        elif row.status == OrderStatus.RETURNED and row.returned_to_city:
+            text += f"📍 <b>Returned to:</b> {row.returned_to_city.value}: Room #{row.returned_to_room}\n"
+
+        text += f"ℹ️ {row.status.value}"
+
+        messages.append(text)
+
+    has_reserved = any(row.status == OrderStatus.RESERVED for row in rows)
+    return "\n\n".join(messages), await order_kbs.get_order_kb(has_reserved)
+
+
+async def get_order_view(session: AsyncSession, identity: AppUserIdentity) -> OrderView:
+    view = order_view_cache.get(identity.app_user_id)
+    if view is not None:
+        return view
+
+    rows = await OrderObj.read_rows(session=session, app_user_id=identity.app_user_id)
+    text, keyboard = await render_order_list(rows or [])
+    view = OrderView(rows=rows or [], text=text, keyboard=keyboard)
+    if rows is not None:
+        order_view_cache.set(identity.app_user_id, view)
+    return view
+
+
+def parse_order_filter(args: str | None) -> OrderFilter | None:
+    """Parse "/orders key=value ..." arguments; None when any of them is invalid."""
+    values = {}
+    try:
+        for arg in (args or '').split():
+            key, _, value = arg.partition('=')
+            if key == 'status':
+                values['status'] = OrderStatus[value.upper()]
+            elif key == 'city':
+                values['city'] = {city.name.lower(): city for city in City}[value.lower()]
+            elif key == 'user':
+                values['username'] = value.lstrip('@')
+            elif key in ('from', 'to'):
+                values['date_from' if key == 'from' else 'date_to'] = date.fromisoformat(value)
+            else:
+                return None
+    except (KeyError, ValueError):
+        return None
+    return OrderFilter(**values)
+
+
+def filter_to_data(filters: OrderFilter) -> dict:
+    return {
+        'status': filters.status.name if filters.status else None,
+        'city': filters.city.value if filters.city else None,
+        'username': filters.username,
+        'date_from': filters.date_from.isoformat() if filters.date_from else None,
+        'date_to': filters.date_to.isoformat() if filters.date_to else None,
+    }
+
+
+def filter_from_data(data: dict | None) -> OrderFilter:
+    data = data or {}
+    return OrderFilter(
+        status=OrderStatus[data['status']] if data.get('status') else None,
+        city=City(data['city']) if data.get('city') else None,
+        username=data.get('username'),
+        date_from=date.fromisoformat(data['date_from']) if data.get('date_from') else None,
+        date_to=date.fromisoformat(data['date_to']) if data.get('date_to') else None,
+    )
+
+
+async def get_admin_order_page(session: AsyncSession, filters: OrderFilter, cursor=None,
+                               backward: bool = False) -> tuple[str, InlineKeyboardMarkup]:
+    rows, has_prev, has_next = await OrderObj.read_admin_page(
+        session=session, filters=filters, cursor=cursor, limit=ADMIN_PAGE_SIZE, backward=backward
+    )
+
+    applied = [
+        filters.status.value if filters.status else None,
+        filters.city.value if filters.city else None,
+        f"@{filters.username}" if filters.username else None,
+        f"from {filters.date_from}" if filters.date_from else None,
+        f"to {filters.date_to}" if filters.date_to else None,
+    ]
+    applied = [value for value in applied if value]
+    messages = ["📋 <b>All orders</b>" + (f" ({', '.join(applied)})" if applied else "") + ":"]
+
+    if not rows:
+        messages.append("No orders match these filters")
+
+    for row in rows:
+        text = f"📖 <b>{row.title}</b>\n👤 @{row.username or 'unknown'}"
+        if row.city:
+            text += f" · 📍 {row.city.value}: Room #{row.room}"
+        text += f"\n📅 {row.created_at.strftime('%Y-%m-%d')} · ℹ️ {row.status.value}"
+        messages.append(text)
+
+    keyboard = await order_kbs.admin_orders_kb(rows, filters.status, has_prev=has_prev, has_next=has_next)
+    return "\n\n".join(messages), keyboard
@@ -0,0 +1,6 @@
+from uuid6 import UUID
+
+
+def parse_page_cursor(callback_data: str) -> tuple[UUID, bool]:
+    direction, cursor = callback_data.split('_')[-2:]
+    return UUID(cursor), direction == 'p'